@@ -0,0 +1,282 @@
+import multiprocessing
+import os
+import sys
+import types
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from threading import Lock
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+from planrehidro_flu.app.processamento_multicriterio import (
+    ClassesCategoricas,
+    ClassesNumericas,
+    CriteriosProcessamento,
+    Pesos,
+    coluna_por_estacao,
+    colunas_do_total,
+    prepara_valores_categoricos,
+    prepara_valores_numericos,
+    valores_dos_criterios,
+    vetor_de_pesos,
+)
+from planrehidro_flu.core.parametros_multicriterio import NomeCampo
+
+
+@dataclass
+class ConfiguracaoSensibilidade:
+    """
+    Amostragem de Monte Carlo em torno dos pesos e dos limites das classes.
+
+    Cada peso é multiplicado por um fator uniforme em [1 - variacao_pesos,
+    1 + variacao_pesos]; cada limite de classe numérica, por um fator em
+    [1 - variacao_limites, 1 + variacao_limites], sem ultrapassar o ponto médio
+    até os limites vizinhos, de modo que as classes mantêm a ordem. Limites
+    compartilhados por classes vizinhas recebem o mesmo fator, e as classes
+    continuam contíguas.
+
+    Com processos > 1, as amostras são classificadas em processos iniciados
+    por "spawn", que não herdam o estado do servidor do Streamlit.
+    """
+
+    amostras: int = 2000
+    variacao_pesos: float = 0.2
+    variacao_limites: float = 0.1
+    # Estações consideradas no topo da classificação
+    topo: int = 100
+    amostras_por_bloco: int = 100
+    processos: int = os.cpu_count() or 1
+    semente: int | None = None
+
+
+@dataclass(frozen=True)
+class CriterioCompilado:
+    """
+    Valores das estações em um critério, prontos para pontuar: para critérios
+    categóricos, limites vazios e as pontuações já aplicadas.
+    """
+
+    valores: np.ndarray
+    limites: np.ndarray
+    pontuacoes: np.ndarray
+
+
+def compila_criterios(
+    criterios_proc: CriteriosProcessamento, colunas: list[NomeCampo]
+) -> list[CriterioCompilado]:
+    valores_df = valores_dos_criterios()
+    compilados = []
+    for nome_campo in colunas:
+        df_classif = criterios_proc[nome_campo]
+        if "Categoria" in df_classif.columns:
+            classes = ClassesCategoricas.da_tabela(df_classif)
+            pontuacoes = classes.pontua(
+                prepara_valores_categoricos(
+                    nome_campo, coluna_por_estacao(valores_df, nome_campo)
+                )
+            )
+            compilados.append(
+                CriterioCompilado(np.empty(0), np.empty(0), np.nan_to_num(pontuacoes))
+            )
+        else:
+            classes = ClassesNumericas.da_tabela(df_classif)
+            compilados.append(
+                CriterioCompilado(
+                    prepara_valores_numericos(nome_campo, valores_df[nome_campo]),
+                    classes.limites,
+                    np.nan_to_num(classes.pontuacoes),
+                )
+            )
+    return compilados
+
+
+def pontua_com_limites(
+    criterio: CriterioCompilado, fatores_limites: np.ndarray
+) -> np.ndarray:
+    """
+    Pontuações (amostras x estações) com os limites multiplicados pelos
+    fatores de cada amostra (amostras x limites). Cada limite perturbado fica
+    entre os pontos médios até os limites vizinhos, preservando a ordem das
+    classes.
+    """
+    amostras = fatores_limites.shape[0]
+    if criterio.limites.size == 0:
+        return np.broadcast_to(
+            criterio.pontuacoes, (amostras, criterio.pontuacoes.size)
+        )
+
+    pontos_medios = (criterio.limites[:-1] + criterio.limites[1:]) / 2
+    limites = np.clip(
+        criterio.limites * fatores_limites,
+        np.concatenate([[-np.inf], pontos_medios]),
+        np.concatenate([pontos_medios, [np.inf]]),
+    )
+    # Índice do intervalo: número de limites menores ou iguais ao valor, menos 1
+    intervalos = (
+        criterio.valores[np.newaxis, :, np.newaxis] >= limites[:, np.newaxis, :]
+    ).sum(axis=2) - 1
+    dentro = (intervalos >= 0) & (intervalos < criterio.pontuacoes.size)
+    return np.where(
+        dentro,
+        criterio.pontuacoes[np.clip(intervalos, 0, criterio.pontuacoes.size - 1)],
+        0.0,
+    )
+
+
+def classifica(totais: np.ndarray) -> np.ndarray:
+    """
+    Classificação (1 = maior total) de cada linha; empates recebem a menor
+    posição, como rank(method="min").
+    """
+    linhas, colunas = totais.shape
+    ordem = np.argsort(-totais, axis=1, kind="stable")
+    ordenados = np.take_along_axis(totais, ordem, axis=1)
+    novo_valor = np.ones_like(ordenados, dtype=bool)
+    novo_valor[:, 1:] = ordenados[:, 1:] != ordenados[:, :-1]
+    inicio = np.maximum.accumulate(np.where(novo_valor, np.arange(colunas), 0), axis=1)
+    posicoes = np.empty((linhas, colunas), dtype=np.int32)
+    np.put_along_axis(posicoes, ordem, inicio + 1, axis=1)
+    return posicoes
+
+
+def classifica_amostras(
+    criterios: list[CriterioCompilado],
+    pesos: np.ndarray,
+    fatores_limites: list[np.ndarray],
+) -> np.ndarray:
+    """
+    Classificação das estações em cada amostra: pontuações (amostras x
+    estações x critérios) reduzidas pelos pesos de cada amostra em um único
+    produto.
+    """
+    pontuacoes = np.stack(
+        [
+            pontua_com_limites(criterio, fatores)
+            for criterio, fatores in zip(criterios, fatores_limites)
+        ],
+        axis=2,
+    )
+    totais = np.einsum("aek,ak->ae", pontuacoes, pesos)
+    return classifica(totais)
+
+
+# Critérios compilados nos processos de trabalho, enviados uma vez por processo
+_criterios_do_processo: list[CriterioCompilado] = []
+
+
+def _inicializa_processo(criterios: list[CriterioCompilado]) -> None:
+    _criterios_do_processo[:] = criterios
+
+
+def _classifica_bloco(
+    pesos: np.ndarray, fatores_limites: list[np.ndarray]
+) -> np.ndarray:
+    return classifica_amostras(_criterios_do_processo, pesos, fatores_limites)
+
+
+_lock_script_principal = Lock()
+
+
+@contextmanager
+def _sem_script_principal() -> Iterator[None]:
+    # No Streamlit, __main__ é o script da página, que os processos "spawn"
+    # executariam de novo ao iniciar; enquanto os processos são criados, o
+    # __main__ é trocado por um módulo vazio
+    with _lock_script_principal:
+        principal = sys.modules["__main__"]
+        sys.modules["__main__"] = types.ModuleType("__main__")
+        try:
+            yield
+        finally:
+            sys.modules["__main__"] = principal
+
+
+def analisa_sensibilidade(
+    criterios_proc: CriteriosProcessamento,
+    pesos: Pesos | None = None,
+    configuracao: ConfiguracaoSensibilidade | None = None,
+) -> pd.DataFrame:
+    """
+    Estatísticas da classificação de cada estação nas amostras: posição com os
+    parâmetros informados, média, desvio padrão, percentis 5 e 95, amplitude
+    e frequência no topo da classificação.
+    """
+    configuracao = configuracao or ConfiguracaoSensibilidade()
+    colunas = colunas_do_total()
+    criterios = compila_criterios(criterios_proc, colunas)
+    pesos_base = vetor_de_pesos(colunas, pesos)
+
+    gerador = np.random.default_rng(configuracao.semente)
+    amostras = configuracao.amostras
+    variacao_pesos = configuracao.variacao_pesos
+    variacao_limites = configuracao.variacao_limites
+    pesos_amostras = pesos_base * gerador.uniform(
+        1 - variacao_pesos, 1 + variacao_pesos, size=(amostras, len(colunas))
+    )
+    fatores_limites = [
+        gerador.uniform(
+            1 - variacao_limites,
+            1 + variacao_limites,
+            size=(amostras, criterio.limites.size),
+        )
+        for criterio in criterios
+    ]
+
+    blocos = [
+        slice(inicio, min(inicio + configuracao.amostras_por_bloco, amostras))
+        for inicio in range(0, amostras, configuracao.amostras_por_bloco)
+    ]
+    if configuracao.processos > 1 and len(blocos) > 1:
+        with ProcessPoolExecutor(
+            configuracao.processos,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_inicializa_processo,
+            initargs=(criterios,),
+        ) as executor:
+            # map submete todos os blocos (e cria os processos) antes de retornar
+            with _sem_script_principal():
+                resultados = executor.map(
+                    _classifica_bloco,
+                    [pesos_amostras[bloco] for bloco in blocos],
+                    [
+                        [fatores[bloco] for fatores in fatores_limites]
+                        for bloco in blocos
+                    ],
+                )
+            posicoes = np.concatenate(list(resultados))
+    else:
+        posicoes = np.concatenate(
+            [
+                classifica_amostras(
+                    criterios,
+                    pesos_amostras[bloco],
+                    [fatores[bloco] for fatores in fatores_limites],
+                )
+                for bloco in blocos
+            ]
+        )
+
+    posicao_base = classifica_amostras(
+        criterios,
+        pesos_base[np.newaxis, :],
+        [np.ones((1, criterio.limites.size)) for criterio in criterios],
+    )[0]
+    percentis = np.percentile(posicoes, [5, 95], axis=0)
+    resultado = pd.DataFrame(
+        {
+            "codigo_estacao": valores_dos_criterios()["codigo_estacao"].to_numpy(),
+            "Classificação": posicao_base,
+            "Classificação Média": posicoes.mean(axis=0),
+            "Desvio Padrão": posicoes.std(axis=0),
+            "Percentil 5": percentis[0],
+            "Percentil 95": percentis[1],
+            "Amplitude": posicoes.max(axis=0) - posicoes.min(axis=0),
+            f"Frequência no Topo {configuracao.topo}": (
+                posicoes <= configuracao.topo
+            ).mean(axis=0),
+        }
+    )
+    return resultado.sort_values("Classificação", kind="stable")
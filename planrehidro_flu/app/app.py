@@ -1,8 +1,10 @@
+import time
 from pathlib import Path
 from typing import TypedDict
 
 import streamlit as st
 
+from planrehidro_flu.app.data import inicia_aquecimento, relatorio_de_carga
 from planrehidro_flu.app.paginas.config_pesos_params import (
     default_page_config_params_points,
     default_page_config_params_weights,
@@ -15,7 +17,10 @@ from planrehidro_flu.app.paginas.default_pages import (
 )
 from planrehidro_flu.core.parametros_multicriterio import NomeCampo
 
+inicio_execucao = time.perf_counter()
+
 st.set_page_config(page_title="PlanReHidro", page_icon="💧", layout="wide")
+inicia_aquecimento()
 
 
 FOLDER_PAGES = Path("paginas")
@@ -145,3 +150,9 @@ pg = st.navigation(
     }
 )
 pg.run()
+
+if "relatorio_de_carga" not in st.session_state:
+    st.session_state["relatorio_de_carga"] = relatorio_de_carga(
+        time.perf_counter() - inicio_execucao
+    )
+    print(st.session_state["relatorio_de_carga"])
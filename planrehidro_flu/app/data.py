@@ -1,4 +1,7 @@
-from typing import Sequence
+import time
+from functools import cache
+from threading import Lock, Thread
+from typing import Callable, Sequence
 
 import pandas as pd
 import streamlit as st
@@ -6,18 +9,42 @@ from sqlalchemy import Engine
 
 from planrehidro_flu.core.parametros_multicriterio import parametros_multicriterio
 from planrehidro_flu.databases.internal.database_access import (
-    retorna_criterios_das_estacoes,
     retorna_criterios_por_rh,
     retorna_dados_adicionais_estacoes,
     retorna_estacoes_por_rh,
     retorna_estacoes_rhnr_cenario,
     retorna_inventario,
+    retorna_tabela_criterios,
 )
 from planrehidro_flu.databases.internal.models import (
     ENGINE,
     InventarioEstacaoFluAna,
 )
 
+# Níveis do ISH em ordem crescente. Como critério:
+# Mínimo e Baixo = 1 / Médio, Alto e Máximo = 0
+NIVEIS_ISH = ("Mínimo", "Baixo", "Médio", "Alto", "Máximo")
+FORMATACAO_ISH = {"Mínimo": 1, "Baixo": 1, "Médio": 0, "Alto": 0, "Máximo": 0}
+
+# Tipos das colunas da tabela de critérios: flags booleanas e numéricos
+# anuláveis (pd.NA no lugar de None) e o ISH como categoria ordenada
+TIPOS_CRITERIOS = {
+    "codigo_estacao": "int64",
+    "area_dren": "Float64",
+    "espacial": "Float64",
+    "cheias": "boolean",
+    "ish": pd.CategoricalDtype(NIVEIS_ISH, ordered=True),
+    "semiarido": "boolean",
+    "irrigacao": "boolean",
+    "navegacao": "boolean",
+    "extensao": "Int64",
+    "desv_cchave": "Float64",
+    "med_desc": "Float64",
+    "est_energia": "Float64",
+    "rhnr_c1": "Float64",
+    "rhnr_c2": "Float64",
+}
+
 
 @st.cache_resource
 def get_internal_engine() -> Engine:
@@ -25,21 +52,11 @@ def get_internal_engine() -> Engine:
 
 
 @st.cache_data
-def get_dados_criterios(_engine) -> list[dict]:
-    criterios = retorna_criterios_das_estacoes(_engine)
-    dict_criterios = [criterio.to_dict() for criterio in criterios]
-    # Formatando dados do Critéio ish ->
-    # Mínimo e Baixo = 1 / Médio, Alto e Máximo = 0
-    formatacao_ish = {
-        "Mínimo": 1,
-        "Baixo": 1,
-        "Médio": 0,
-        "Alto": 0,
-        "Máximo": 0,
-    }
-    for criterio in dict_criterios:
-        criterio["ish"] = formatacao_ish[criterio["ish"]]
-    return dict_criterios
+def get_dados_criterios(_engine) -> pd.DataFrame:
+    """
+    Valores dos critérios das estações, uma coluna tipada por critério.
+    """
+    return retorna_tabela_criterios(_engine).astype(TIPOS_CRITERIOS)
 
 
 @st.cache_data
@@ -89,7 +106,74 @@ def get_dados_adicionais_das_estacoes(
     return retorna_dados_adicionais_estacoes(_engine)
 
 
-internal_engine = get_internal_engine()
-df_criterios_rh = get_dados_criterios_por_rh(internal_engine)
-dados_criterios_estacoes = get_dados_criterios(internal_engine)
-df_dicionario = get_data_dictionary()
+# Acesso sob demanda: cada página carrega apenas os dados que usa
+
+
+def criterios_por_rh() -> pd.DataFrame:
+    return get_dados_criterios_por_rh(get_internal_engine())
+
+
+def criterios_das_estacoes() -> pd.DataFrame:
+    return get_dados_criterios(get_internal_engine())
+
+
+def dicionario_de_dados() -> pd.DataFrame:
+    return get_data_dictionary()
+
+
+def estacoes_rhnr_cenario1() -> pd.DataFrame:
+    return get_estacoes_rhnr_cenario1(get_internal_engine())
+
+
+def dados_adicionais_das_estacoes() -> pd.DataFrame:
+    return get_dados_adicionais_das_estacoes(get_internal_engine())
+
+
+# Conjuntos carregados em segundo plano na primeira execução do app
+DADOS_AQUECIDOS: dict[str, Callable[[], pd.DataFrame]] = {
+    "criterios_por_rh": criterios_por_rh,
+    "criterios_das_estacoes": criterios_das_estacoes,
+    "dicionario_de_dados": dicionario_de_dados,
+    "estacoes_rhnr_cenario1": estacoes_rhnr_cenario1,
+    "dados_adicionais_das_estacoes": dados_adicionais_das_estacoes,
+}
+
+_tempos_de_carga: dict[str, float] = {}
+_lock_tempos = Lock()
+
+
+def _aquece_dados() -> None:
+    for nome, carrega in DADOS_AQUECIDOS.items():
+        inicio = time.perf_counter()
+        try:
+            carrega()
+        except Exception as e:
+            print(f"Erro ao carregar {nome} em segundo plano: {e}")
+            continue
+        with _lock_tempos:
+            _tempos_de_carga[nome] = time.perf_counter() - inicio
+
+
+@cache
+def inicia_aquecimento() -> Thread:
+    """
+    Carrega os conjuntos de dados em uma thread, uma vez por processo. O
+    st.cache_data é compartilhado entre sessões e trava o cálculo por chave:
+    uma página que pede um conjunto ainda em carga espera o resultado em vez
+    de repetir a consulta. A thread não recebe o contexto da sessão, para que
+    os avisos de carga não sejam desenhados na página.
+    """
+    thread = Thread(target=_aquece_dados, name="aquecimento_dados", daemon=True)
+    thread.start()
+    return thread
+
+
+def relatorio_de_carga(primeira_exibicao: float) -> str:
+    with _lock_tempos:
+        tempos = dict(_tempos_de_carga)
+    linhas = [f"Primeira exibição do app: {primeira_exibicao:.3f} s"]
+    for nome in DADOS_AQUECIDOS:
+        tempo = tempos.get(nome)
+        situacao = f"{tempo:.3f} s" if tempo is not None else "em carga"
+        linhas.append(f"  {nome}: {situacao}")
+    return "\n".join(linhas)
@@ -6,6 +6,10 @@ import plotly.graph_objects as go
 import streamlit as st
 from typing_extensions import Literal
 
+from planrehidro_flu.app.analise_sensibilidade import (
+    ConfiguracaoSensibilidade,
+    analisa_sensibilidade,
+)
 from planrehidro_flu.app.consistencia_dataframe import (
     checa_consistencia_dado_categorico,
     checa_consistencia_entre_as_classes,
@@ -13,8 +17,8 @@ from planrehidro_flu.app.consistencia_dataframe import (
     checa_consistencia_valores_da_classe,
 )
 from planrehidro_flu.app.data import (
-    get_dados_adicionais_das_estacoes,
-    get_estacoes_rhnr_cenario1,
+    dados_adicionais_das_estacoes,
+    estacoes_rhnr_cenario1,
 )
 from planrehidro_flu.app.paginas.default_pages import cdf
 from planrehidro_flu.app.params_default_values import (
@@ -23,13 +27,14 @@ from planrehidro_flu.app.params_default_values import (
 )
 from planrehidro_flu.app.processamento_multicriterio import (
     CriteriosProcessamento,
+    Pesos,
+    calcula_total,
     processa_criterios,
 )
 from planrehidro_flu.core.parametros_multicriterio import (
     NomeCampo,
     parametros_multicriterio,
 )
-from planrehidro_flu.databases.internal.models import ENGINE
 
 
 def checa_consistencia_params():
@@ -102,12 +107,12 @@ def gera_graficos_dos_resultados(
 @st.cache_data
 def gera_dataframe_com_dados_finais(df: pd.DataFrame) -> pd.DataFrame:
     df_final = df.copy()
-    df_c1 = get_estacoes_rhnr_cenario1(ENGINE)
+    df_c1 = estacoes_rhnr_cenario1()
     # df_c2 = get_estacoes_rhnr_cenario2(ENGINE)
     df_final["Integra RHNR?"] = df_final["codigo_estacao"].isin(df_c1["codigo"])
     # df_final["Integra RHNR-C2?"] = df_final["codigo_estacao"].isin(df_c2["codigo"])
 
-    df_dados_adicionais = get_dados_adicionais_das_estacoes(ENGINE)
+    df_dados_adicionais = dados_adicionais_das_estacoes()
 
     return df_dados_adicionais.merge(
         df_final, how="right", left_on="codigo", right_on="codigo_estacao"
@@ -123,6 +128,16 @@ def gera_resultados(df_resultado: None | pd.DataFrame = None):
         if df_resultado is None:
             st.warning("Parâmetros não configurados!", icon="⚠️")
         else:
+            # Os pesos só alteram o total: a classificação é refeita a partir
+            # das pontuações já calculadas, sem reaplicar as classes
+            with st.expander("Pesos dos critérios"):
+                pesos = editor_de_pesos(key="weigths_resultados")
+            df_resultado = calcula_total(df_resultado, pesos).sort_values(
+                "Classificação", kind="stable"
+            )
+            with st.expander("Análise de sensibilidade da classificação"):
+                gera_analise_sensibilidade(pesos)
+
             opcoes_cenarios = [
                 "Todas as estações ",
                 "Ocultar estações RHNR - Cenário 1",
@@ -168,6 +183,35 @@ def gera_resultados(df_resultado: None | pd.DataFrame = None):
             )
 
 
+def gera_analise_sensibilidade(pesos: Pesos) -> None:
+    col1, col2, col3 = st.columns(3)
+    amostras = col1.number_input(
+        "Número de amostras", min_value=100, max_value=20000, value=2000, step=100
+    )
+    variacao_pesos = col2.number_input(
+        "Variação dos pesos (%)", min_value=0, max_value=100, value=20
+    )
+    variacao_limites = col3.number_input(
+        "Variação dos limites das classes (%)", min_value=0, max_value=100, value=10
+    )
+
+    if st.button("Executar análise de sensibilidade"):
+        configuracao = ConfiguracaoSensibilidade(
+            amostras=int(amostras),
+            variacao_pesos=variacao_pesos / 100,
+            variacao_limites=variacao_limites / 100,
+        )
+        with st.spinner("Calculando as classificações das amostras..."):
+            st.session_state["sensibilidade"] = analisa_sensibilidade(
+                gera_criterios_para_processamento(cast(dict, st.session_state)),
+                pesos,
+                configuracao,
+            )
+
+    if "sensibilidade" in st.session_state:
+        st.dataframe(st.session_state["sensibilidade"], hide_index=True)
+
+
 def to_excel(df):
     """
     Converts a Pandas DataFrame to an Excel file in-memory.
@@ -210,21 +254,52 @@ def reset_data_editor_state(nome_campo: NomeCampo):
     )
 
 
-def default_page_config_params_weights() -> None:
-    st.subheader("Configuração dos valores dos Pesos")
-
-    df_weigths = pd.DataFrame(
+def get_dataframe_pesos(pesos: Pesos | None = None) -> pd.DataFrame:
+    pesos = pesos or {}
+    return pd.DataFrame(
         [
             {
                 "Critério": criterio["descricao"],
-                "Peso": DEFAULT_WEIGTH_PARAMS[criterio["nome_campo"]],
+                "Peso": pesos.get(
+                    criterio["nome_campo"],
+                    DEFAULT_WEIGTH_PARAMS[criterio["nome_campo"]],
+                ),
             }
             for criterio in parametros_multicriterio
             if criterio["nome_campo"] in DEFAULT_WEIGTH_PARAMS
         ]
     )
 
-    st.data_editor(df_weigths, num_rows="dynamic", width=600, key="weigths")
+
+def le_pesos_editados(df_weigths: pd.DataFrame) -> Pesos:
+    nome_campo_por_descricao = {
+        criterio["descricao"]: criterio["nome_campo"]
+        for criterio in parametros_multicriterio
+    }
+    return {
+        nome_campo_por_descricao[row["Critério"]]: (
+            0.0 if pd.isna(row["Peso"]) else float(row["Peso"])
+        )
+        for _, row in df_weigths.iterrows()
+        if row["Critério"] in nome_campo_por_descricao
+    }
+
+
+def editor_de_pesos(key: str) -> Pesos:
+    df_weigths = st.data_editor(
+        get_dataframe_pesos(st.session_state.get("pesos")),
+        num_rows="dynamic",
+        width=600,
+        key=key,
+    )
+    pesos = le_pesos_editados(df_weigths)
+    st.session_state["pesos"] = pesos
+    return pesos
+
+
+def default_page_config_params_weights() -> None:
+    st.subheader("Configuração dos valores dos Pesos")
+    editor_de_pesos(key="weigths")
 
 
 def default_page_config_params_points() -> None:
@@ -257,7 +332,9 @@ def default_page_config_params_points() -> None:
         checa_consistencia_params()
         criterios_proc = gera_criterios_para_processamento(cast(dict, st.session_state))
         progress_bar = st.progress(0, text="Processando critérios...")
-        df_resultado = processa_criterios(criterios_proc, progress_bar)
+        df_resultado = processa_criterios(
+            criterios_proc, progress_bar, st.session_state.get("pesos")
+        )
         st.session_state["resultado"] = df_resultado
         st.page_link(
             st.Page(gera_resultados, title="Resultados", icon=":material/rubric:")
@@ -2,11 +2,13 @@ from typing import get_args
 
 import streamlit as st
 
-from planrehidro_flu.app.data import df_criterios_rh, df_dicionario
+from planrehidro_flu.app.data import criterios_por_rh, dicionario_de_dados
 from planrehidro_flu.core.parametros_multicriterio import NomeCampo
 
+df_criterios_rh = criterios_por_rh()
+
 st.subheader("Dicionário de Dados dos Critérios na tabela")
-st.dataframe(df_dicionario, hide_index=True)
+st.dataframe(dicionario_de_dados(), hide_index=True)
 
 st.subheader("Estatística dos dados dos Critérios Numéricos")
 st.dataframe(df_criterios_rh[list(get_args(NomeCampo))[1:]].describe().T)
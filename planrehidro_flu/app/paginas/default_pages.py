@@ -6,7 +6,7 @@ import plotly.graph_objects as go
 import streamlit as st
 from plotly.subplots import make_subplots
 
-from planrehidro_flu.app.data import df_criterios_rh
+from planrehidro_flu.app.data import criterios_por_rh
 from planrehidro_flu.core.parametros_multicriterio import (
     NomeCampo,
     search_criterio_props,
@@ -28,7 +28,7 @@ def default_page_stats_categorical_params(nome_campo: NomeCampo) -> None:
     criterio = search_criterio_props(nome_campo)
     criterio_str = f"{criterio['descricao']} [{criterio['unidade']}]"
 
-    df = df_criterios_rh.copy()
+    df = criterios_por_rh().copy()
 
     classes_ish = None
     if nome_campo == "ish":
@@ -130,6 +130,7 @@ def default_page_stats_numerical_params(nome_campo: NomeCampo) -> None:
     criterio = search_criterio_props(nome_campo)
     criterio_str = f"{criterio['descricao']} [{criterio['unidade']}]"
 
+    df_criterios_rh = criterios_por_rh()
     x_data = df_criterios_rh[nome_campo]
 
     st.title("Resultados Globais")
@@ -1,7 +1,7 @@
 import folium
 from streamlit_folium import st_folium
 
-from planrehidro_flu.app.data import df_criterios_rh
+from planrehidro_flu.app.data import criterios_por_rh
 
 map = folium.Map(location=[-14.0, -48.0], zoom_start=5)
 
@@ -12,7 +12,7 @@ icon_estacao = folium.DivIcon(
 )
 
 
-for _, estacao in df_criterios_rh.iterrows():
+for _, estacao in criterios_por_rh().iterrows():
     folium.Marker(
         location=[estacao["latitude"], estacao["longitude"]],
         icon=icon_estacao,
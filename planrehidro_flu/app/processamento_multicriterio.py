@@ -1,74 +1,257 @@
-from typing import Literal, cast, get_args
+from collections import OrderedDict
+from dataclasses import dataclass
+from hashlib import sha1
+from typing import Mapping, Self, get_args
 
 import numpy as np
 import pandas as pd
 
-from planrehidro_flu.app.data import dados_criterios_estacoes
+from planrehidro_flu.app.data import FORMATACAO_ISH, criterios_das_estacoes
+from planrehidro_flu.app.params_default_values import DEFAULT_WEIGTH_PARAMS
 from planrehidro_flu.core.parametros_multicriterio import NomeCampo
 
 type CriteriosProcessamento = dict[NomeCampo, pd.DataFrame]
+type Pesos = Mapping[NomeCampo, float]
 
+CATEGORIAS = ("Não", "Sim")  # posição = valor do critério (0 ou 1)
 
-def calculo_dados_categoricos(dataframe: pd.DataFrame, categoria: str) -> float:
-    df = dataframe.copy()
-    if categoria not in df["Categoria"].unique():
-        raise ValueError(f"A categoria informada '{categoria}' não existe!")
-    return df.loc[df["Categoria"] == categoria, "Pontuação"].values[0]
+# Critérios guardados como categoria, com o valor (0 ou 1) de cada nível
+VALORES_DAS_CATEGORIAS: dict[NomeCampo, Mapping[str, int]] = {"ish": FORMATACAO_ISH}
 
+# Valores usados no lugar de critérios nulos:
+# desv_cchave nulo -> pontuação 0; est_energia ou rhnr_c1 nulos -> 9999.0
+VALORES_PADRAO_NULOS: dict[NomeCampo, float] = {
+    "desv_cchave": 0.0,
+    "est_energia": 9999.0,
+    "rhnr_c1": 9999.0,
+}
 
-def calculo_dados_numericos(df: pd.DataFrame, valor_criterio: float) -> float:
-    if df["Valor Superior"].hasnans:
-        df.loc[df["Valor Superior"].isna(), "Valor Superior"] = np.inf
+# Pontuações por critério já calculadas, chave (critério, hash da tabela de
+# classes, hash dos valores das estações): uma recarga dos dados gera chaves novas
+LIMITE_PONTUACOES_EM_CACHE = 128
+_pontuacoes_em_cache: OrderedDict[tuple[str, str, str], np.ndarray] = OrderedDict()
 
-    return df.loc[
-        (df["Valor Inferior"] <= valor_criterio)
-        & (df["Valor Superior"] > valor_criterio),
-        "Pontuação",
-    ].values[0]
 
+@dataclass(frozen=True)
+class ClassesNumericas:
+    """
+    Tabela de classes compilada em limites crescentes: o intervalo
+    [limites[i], limites[i + 1]) recebe pontuacoes[i] (NaN fora das classes).
+    Com classes sobrepostas, vale a primeira linha da tabela que contém o valor.
+    """
+
+    limites: np.ndarray
+    pontuacoes: np.ndarray
+
+    @classmethod
+    def da_tabela(cls, df: pd.DataFrame) -> Self:
+        inferiores = df["Valor Inferior"].to_numpy(dtype=float)
+        superiores = df["Valor Superior"].to_numpy(dtype=float)
+        superiores = np.where(np.isnan(superiores), np.inf, superiores)
+        pontuacoes = df["Pontuação"].to_numpy(dtype=float)
+
+        validas = ~np.isnan(inferiores)
+        limites = np.unique(np.concatenate([inferiores[validas], superiores[validas]]))
+        inicio = limites[:-1, np.newaxis]
+        # Linhas que cobrem cada intervalo elementar; argmax pega a primeira
+        cobre = (inferiores <= inicio) & (superiores > inicio)
+        pontuacoes_intervalos = np.where(
+            cobre.any(axis=1), pontuacoes[cobre.argmax(axis=1)], np.nan
+        )
+        return cls(limites, pontuacoes_intervalos)
+
+    def pontua(self, valores: np.ndarray) -> np.ndarray:
+        intervalos = np.searchsorted(self.limites, valores, side="right") - 1
+        dentro = (intervalos >= 0) & (intervalos < len(self.pontuacoes))
+        return np.where(
+            dentro,
+            self.pontuacoes[np.clip(intervalos, 0, len(self.pontuacoes) - 1)],
+            np.nan,
+        )
+
+
+@dataclass(frozen=True)
+class ClassesCategoricas:
+    """
+    Pontuação por categoria, indexada pelo valor do critério (0 = "Não",
+    1 = "Sim"); NaN para categorias ausentes da tabela.
+    """
+
+    pontuacoes: np.ndarray
+
+    @classmethod
+    def da_tabela(cls, df: pd.DataFrame) -> Self:
+        primeiras = df.drop_duplicates("Categoria").set_index("Categoria")
+        return cls(
+            primeiras["Pontuação"].reindex(list(CATEGORIAS)).to_numpy(dtype=float)
+        )
+
+    def pontua(self, valores: np.ndarray) -> np.ndarray:
+        return self.pontuacoes[valores]
+
+
+type Classes = ClassesNumericas | ClassesCategoricas
+
+
+def valores_dos_criterios() -> pd.DataFrame:
+    """
+    Valores dos critérios das estações, uma coluna por critério.
+    """
+    return criterios_das_estacoes()
+
+
+def coluna_por_estacao(valores: pd.DataFrame, nome_campo: NomeCampo) -> pd.Series:
+    """
+    Valores de um critério indexados pelo código da estação.
+    """
+    return valores[nome_campo].set_axis(valores["codigo_estacao"])
+
+
+def prepara_valores_categoricos(nome_campo: NomeCampo, coluna: pd.Series) -> np.ndarray:
+    if nome_campo in VALORES_DAS_CATEGORIAS:
+        # Mapeia os níveis da categoria, não cada linha; nível nulo ou fora da
+        # categoria não vira 0
+        coluna = coluna.map(VALORES_DAS_CATEGORIAS[nome_campo])
+        if coluna.isna().any():
+            estacoes = ", ".join(map(str, coluna.index[coluna.isna()]))
+            raise ValueError(
+                f"Valores nulos ou desconhecidos para o critério {nome_campo} "
+                f"nas estações: {estacoes}!"
+            )
+    valores = coluna.astype("Float64").fillna(0).to_numpy(dtype=float)
+    if not np.isin(valores, (0, 1)).all():
+        raise ValueError(f"Valores categóricos inválidos para o critério {nome_campo}!")
+    return valores.astype(np.intp)
+
+
+def prepara_valores_numericos(nome_campo: NomeCampo, coluna: pd.Series) -> np.ndarray:
+    valores = pd.to_numeric(coluna).to_numpy(dtype=float, na_value=np.nan)
+    if nome_campo in VALORES_PADRAO_NULOS:
+        valores = np.where(np.isnan(valores), VALORES_PADRAO_NULOS[nome_campo], valores)
+    if np.isnan(valores).any():
+        raise ValueError(f"Valores nulos para o critério {nome_campo}!")
+    return np.maximum(valores, 0.0)
 
-def processa_criterios(
-    criterios_proc: CriteriosProcessamento, progress_bar
-) -> pd.DataFrame:
-    total_estacoes = len(dados_criterios_estacoes)
-
-    pontuacoes: list[dict[NomeCampo, float]] = []
-    for idx, estacao in enumerate(dados_criterios_estacoes, start=1):
-        pontuacao_estacao: dict[NomeCampo, float] = {}
-        for nome_campo, df_classif in criterios_proc.items():
-            if "Categoria" in df_classif.columns:
-                categoricos = {0: "Não", 1: "Sim"}
-                valor_campo = (
-                    estacao.get(nome_campo)
-                    if estacao.get(nome_campo) is not None
-                    else 0
-                )
-                categoria = categoricos[cast(Literal[0, 1], valor_campo)]
-                pontuacao = calculo_dados_categoricos(df_classif, categoria)
-            else:
-                valor_criterio = estacao[nome_campo]
-                # Se desv_cchave for nulo -> pontuação = 0 0
-                # Se est_energia ou rhnr_c1 forem nulos -> pontuação = 9999.0
-                if valor_criterio is None:
-                    if nome_campo == "desv_cchave":
-                        valor_criterio = 0.0
-                    if nome_campo in ("est_energia", "rhnr_c1"):
-                        valor_criterio = 9999.0
-                valor_criterio = valor_criterio if valor_criterio >= 0.0 else 0.0
-                pontuacao = calculo_dados_numericos(df_classif, valor_criterio)
-            pontuacao_estacao[nome_campo] = pontuacao
-        pontuacao_estacao["codigo_estacao"] = estacao["codigo_estacao"]
-        pontuacoes.append(pontuacao_estacao)
-        progress_bar.progress(idx / total_estacoes, text="Processando critérios...")
-    progress_bar.empty()
 
+def pontua_criterio(
+    nome_campo: NomeCampo, classes: Classes, coluna: pd.Series
+) -> np.ndarray:
+    if isinstance(classes, ClassesCategoricas):
+        pontuacoes = classes.pontua(prepara_valores_categoricos(nome_campo, coluna))
+        if np.isnan(pontuacoes).any():
+            raise ValueError(f"A categoria informada não existe para {nome_campo}!")
+    else:
+        pontuacoes = classes.pontua(prepara_valores_numericos(nome_campo, coluna))
+        if np.isnan(pontuacoes).any():
+            raise ValueError(f"Valores fora das classes do critério {nome_campo}!")
+    return pontuacoes
+
+
+def hash_tabela_classes(df_classif: pd.DataFrame) -> str:
+    conteudo = pd.util.hash_pandas_object(df_classif, index=False).to_numpy()
+    return sha1(
+        "|".join(map(str, df_classif.columns)).encode("utf-8") + conteudo.tobytes()
+    ).hexdigest()
+
+
+def hash_valores_do_criterio(valores: pd.DataFrame, nome_campo: NomeCampo) -> str:
+    conteudo = pd.util.hash_pandas_object(
+        valores[["codigo_estacao", nome_campo]], index=False
+    ).to_numpy()
+    return sha1(conteudo.tobytes()).hexdigest()
+
+
+def pontua_criterio_em_cache(
+    nome_campo: NomeCampo, df_classif: pd.DataFrame
+) -> np.ndarray:
+    """
+    Pontuações das estações em um critério; a tabela de classes só é aplicada
+    de novo quando o seu conteúdo ou os valores das estações mudam.
+    """
+    valores = valores_dos_criterios()
+    chave = (
+        nome_campo,
+        hash_tabela_classes(df_classif),
+        hash_valores_do_criterio(valores, nome_campo),
+    )
+    if chave in _pontuacoes_em_cache:
+        _pontuacoes_em_cache.move_to_end(chave)
+        return _pontuacoes_em_cache[chave]
+
+    classes = (
+        ClassesCategoricas.da_tabela(df_classif)
+        if "Categoria" in df_classif.columns
+        else ClassesNumericas.da_tabela(df_classif)
+    )
+    pontuacoes = pontua_criterio(
+        nome_campo, classes, coluna_por_estacao(valores, nome_campo)
+    )
+    pontuacoes.setflags(write=False)
+    _pontuacoes_em_cache[chave] = pontuacoes
+    if len(_pontuacoes_em_cache) > LIMITE_PONTUACOES_EM_CACHE:
+        _pontuacoes_em_cache.popitem(last=False)
+    return pontuacoes
+
+
+def colunas_do_total() -> list[NomeCampo]:
     colunas = list(get_args(NomeCampo))
-    df_resultado = pd.DataFrame(pontuacoes)[colunas]
     colunas_cenario1 = [col for col in colunas if col != "rhnr_c2"]
     # colunas_cenario2 = [col for col in colunas if col != "rhnr_c1"]
-    df_resultado["Total"] = df_resultado[colunas_cenario1[1:]].sum(axis=1)
-    # df_resultado["Total-C1"] = df_resultado[colunas_cenario1[1:]].sum(axis=1)
-    # df_resultado["Total-C2"] = df_resultado[colunas_cenario2[1:]].sum(axis=1)
-    
+    return colunas_cenario1[1:]
+
+
+def vetor_de_pesos(colunas: list[NomeCampo], pesos: Pesos | None = None) -> np.ndarray:
+    """
+    Pesos na ordem das colunas; critérios sem peso informado usam o padrão.
+    """
+    pesos = pesos or {}
+    return np.array(
+        [
+            float(pesos.get(coluna, DEFAULT_WEIGTH_PARAMS.get(coluna, 1)))
+            for coluna in colunas
+        ]
+    )
+
+
+def calcula_total(
+    df_resultado: pd.DataFrame, pesos: Pesos | None = None
+) -> pd.DataFrame:
+    """
+    Recalcula o total ponderado e a classificação das estações a partir das
+    pontuações já calculadas (produto matriz-vetor).
+    """
+    colunas = colunas_do_total()
+    df_total = df_resultado.copy()
+    df_total["Total"] = df_resultado[colunas].to_numpy() @ vetor_de_pesos(
+        colunas, pesos
+    )
+    df_total["Classificação"] = (
+        df_total["Total"].rank(method="min", ascending=False).astype(int)
+    )
+    return df_total
+
+
+def processa_criterios(
+    criterios_proc: CriteriosProcessamento,
+    progress_bar=None,
+    pesos: Pesos | None = None,
+) -> pd.DataFrame:
+    valores = valores_dos_criterios()
+    colunas = list(get_args(NomeCampo))
+
+    # Matriz estações x critérios, preenchida uma coluna por vez
+    pontuacoes = np.empty((len(valores), len(colunas) - 1))
+    for idx, nome_campo in enumerate(colunas[1:]):
+        pontuacoes[:, idx] = pontua_criterio_em_cache(
+            nome_campo, criterios_proc[nome_campo]
+        )
+        if progress_bar is not None:
+            progress_bar.progress(
+                (idx + 1) / (len(colunas) - 1), text="Processando critérios..."
+            )
+    if progress_bar is not None:
+        progress_bar.empty()
 
-    return df_resultado
+    df_resultado = pd.DataFrame(pontuacoes, columns=colunas[1:])
+    df_resultado.insert(0, "codigo_estacao", valores["codigo_estacao"].to_numpy())
+    return calcula_total(df_resultado, pesos)
@@ -0,0 +1,100 @@
+from hashlib import sha1
+from typing import Sequence, get_args
+
+from planrehidro_flu.core.models import EstacaoHidro
+from planrehidro_flu.core.parametros_calculo import (
+    TabelaDeOrigem,
+    create_cpalar_reader,
+    create_hidro_reader,
+)
+from planrehidro_flu.databases.cplar.cache_camadas import CAMADAS_ESPACIAIS
+from planrehidro_flu.databases.hidro.hidro_reader import OrigemPorEstacao
+
+ORIGENS_POR_ESTACAO: tuple[str, ...] = get_args(OrigemPorEstacao)
+
+
+def assinatura_da_estacao(estacao: EstacaoHidro) -> str:
+    return sha1(estacao.model_dump_json().encode("utf-8")).hexdigest()
+
+
+def assinatura_da_origem(origem: str, usa_cache_local: bool = False) -> str:
+    """
+    Assinatura de uma origem do banco CPLAR. Com usa_cache_local, as camadas
+    espaciais são identificadas pelo carimbo do arquivo local de onde o
+    critério lê os dados, sem consultar o banco.
+    """
+    cplar_reader = create_cpalar_reader()
+    if usa_cache_local and origem in CAMADAS_ESPACIAIS:
+        return f"camada_local={cplar_reader.cache_camadas.versao_camada(origem)}"
+    return cplar_reader.retorna_assinatura_origem(origem)
+
+
+def chave_assinatura_origem(origem: str, usa_cache_local: bool) -> str:
+    # Chave das assinaturas memorizadas: a mesma camada tem assinaturas
+    # diferentes no banco e no cache local
+    if usa_cache_local and origem in CAMADAS_ESPACIAIS:
+        return f"{origem}:local"
+    return origem
+
+
+def calcula_assinaturas(
+    estacoes: Sequence[EstacaoHidro],
+    origens: Sequence[TabelaDeOrigem],
+    assinaturas_tabelas: dict[str, str] | None = None,
+    usa_cache_local: bool = False,
+) -> dict[TabelaDeOrigem, dict[int, str]]:
+    """
+    Assinatura atual de cada origem para cada estação.
+
+    - "Estacao": hash dos dados do inventário da estação;
+    - tabelas do Hidro DW: assinatura dos registros da estação (estações sem
+      registros recebem assinatura vazia);
+    - tabelas do banco CPLAR: assinatura da tabela inteira, a mesma para todas
+      as estações. Com assinaturas_tabelas, cada origem é consultada uma vez
+      e reaproveitada nas chamadas seguintes (vários critérios). Com
+      usa_cache_local, as camadas espaciais usam a versão do cache local
+      (ver assinatura_da_origem).
+    """
+    codigos = [estacao.codigo for estacao in estacoes]
+    assinaturas: dict[TabelaDeOrigem, dict[int, str]] = {}
+    for origem in dict.fromkeys(origens):
+        if origem == "Estacao":
+            assinaturas[origem] = {
+                estacao.codigo: assinatura_da_estacao(estacao) for estacao in estacoes
+            }
+        elif origem in ORIGENS_POR_ESTACAO:
+            por_estacao = create_hidro_reader().retorna_assinaturas_por_estacao(
+                origem, codigos
+            )
+            assinaturas[origem] = {
+                codigo: por_estacao.get(codigo, "") for codigo in codigos
+            }
+        else:
+            if assinaturas_tabelas is None:
+                assinaturas_tabelas = {}
+            chave = chave_assinatura_origem(origem, usa_cache_local)
+            if chave not in assinaturas_tabelas:
+                assinaturas_tabelas[chave] = assinatura_da_origem(
+                    origem, usa_cache_local
+                )
+            assinaturas[origem] = dict.fromkeys(codigos, assinaturas_tabelas[chave])
+    return assinaturas
+
+
+def seleciona_estacoes_alteradas(
+    assinaturas_atuais: dict[TabelaDeOrigem, dict[int, str]],
+    assinaturas_gravadas: dict[tuple[int, str], str],
+    codigos: Sequence[int],
+) -> list[int]:
+    """
+    Estações em que alguma origem mudou desde o último cálculo, ou que ainda
+    não têm assinatura gravada.
+    """
+    return [
+        codigo
+        for codigo in codigos
+        if any(
+            assinaturas_gravadas.get((codigo, origem)) != por_estacao[codigo]
+            for origem, por_estacao in assinaturas_atuais.items()
+        )
+    ]
@@ -0,0 +1,140 @@
+from functools import cache
+from hashlib import sha1
+from threading import Lock
+from typing import Sequence
+
+from planrehidro_flu.core.assinaturas_origem import (
+    assinatura_da_estacao,
+    assinatura_da_origem,
+    chave_assinatura_origem,
+)
+from planrehidro_flu.core.models import EstacaoHidro
+from planrehidro_flu.core.parametros_calculo import (
+    FALHA_NO_CALCULO,
+    CalculoDoCriterio,
+    CriterioOutput,
+)
+from planrehidro_flu.databases.internal.cache_resultados import (
+    BackendCache,
+    CacheSQLite,
+)
+
+
+def e_armazenavel(calculo: CalculoDoCriterio) -> bool:
+    """
+    Critérios que dependem apenas dos dados da própria estação e das bases de
+    referência do CPLAR (topologia, ISH, navegação, semiárido, polos...).
+    Critérios que leem o Hidro DW dependem de séries que mudam a cada carga.
+    """
+    return (
+        bool(calculo.bancos_de_dados)
+        and "hidro" not in calculo.bancos_de_dados
+        and bool(calculo.tabelas_de_origem)
+    )
+
+
+class CacheDeCriterios:
+    """
+    Resultados de critérios guardados entre execuções.
+
+    A chave combina a classe do critério, sua versão, o código da estação e a
+    assinatura das tabelas de origem; uma mudança nos dados de referência ou
+    na regra de cálculo gera chaves novas, e as antigas expiram pela validade
+    do backend. As assinaturas das tabelas do CPLAR (ou, para critérios que
+    usam o cache local de camadas, das camadas em disco) são consultadas uma
+    vez por execução (reinicia).
+    """
+
+    def __init__(self, backend: BackendCache) -> None:
+        self.backend = backend
+        self.ativo = True
+        self._assinaturas_tabelas: dict[str, str] = {}
+        self._lock = Lock()
+        self.acertos = 0
+        self.falhas = 0
+
+    def _assinatura_tabela(self, origem: str, usa_cache_local: bool) -> str:
+        chave = chave_assinatura_origem(origem, usa_cache_local)
+        with self._lock:
+            if chave in self._assinaturas_tabelas:
+                return self._assinaturas_tabelas[chave]
+        assinatura = assinatura_da_origem(origem, usa_cache_local)
+        with self._lock:
+            return self._assinaturas_tabelas.setdefault(chave, assinatura)
+
+    def chaves(
+        self, calculo: CalculoDoCriterio, estacoes: Sequence[EstacaoHidro]
+    ) -> dict[int, str]:
+        assinaturas_tabelas = [
+            self._assinatura_tabela(origem, calculo.usa_cache_local)
+            for origem in calculo.tabelas_de_origem
+            if origem != "Estacao"
+        ]
+        prefixo = f"{type(calculo).__name__}:{calculo.versao}"
+        chaves: dict[int, str] = {}
+        for estacao in estacoes:
+            assinaturas = assinaturas_tabelas
+            if "Estacao" in calculo.tabelas_de_origem:
+                assinaturas = [assinatura_da_estacao(estacao), *assinaturas_tabelas]
+            versao_origem = sha1("|".join(assinaturas).encode("utf-8")).hexdigest()
+            chaves[estacao.codigo] = f"{prefixo}:{estacao.codigo}:{versao_origem}"
+        return chaves
+
+    def consulta(
+        self, calculo: CalculoDoCriterio, estacoes: Sequence[EstacaoHidro]
+    ) -> tuple[dict[int, CriterioOutput], list[EstacaoHidro]]:
+        """
+        Retorna os valores em cache e as estações que precisam ser calculadas.
+        """
+        if not self.ativo or not e_armazenavel(calculo):
+            return {}, list(estacoes)
+
+        chaves = self.chaves(calculo, estacoes)
+        em_cache = self.backend.obtem(list(chaves.values()))
+        valores = {
+            codigo: em_cache[chave]
+            for codigo, chave in chaves.items()
+            if chave in em_cache
+        }
+        pendentes = [estacao for estacao in estacoes if estacao.codigo not in valores]
+        with self._lock:
+            self.acertos += len(valores)
+            self.falhas += len(pendentes)
+        return valores, pendentes
+
+    def grava(
+        self,
+        calculo: CalculoDoCriterio,
+        estacoes: Sequence[EstacaoHidro],
+        resultado: dict[int, CriterioOutput],
+    ) -> None:
+        if not self.ativo or not e_armazenavel(calculo):
+            return
+
+        chaves = self.chaves(calculo, estacoes)
+        # Falhas e valores nulos (sem dados na consulta) não são guardados
+        self.backend.grava(
+            {
+                chaves[codigo]: valor
+                for codigo, valor in resultado.items()
+                if valor is not None
+                and valor is not FALHA_NO_CALCULO
+                and codigo in chaves
+            }
+        )
+
+    def reinicia(self, ativo: bool = True) -> None:
+        with self._lock:
+            self.ativo = ativo
+            self._assinaturas_tabelas.clear()
+            self.acertos = 0
+            self.falhas = 0
+
+    def estatisticas(self) -> dict[str, int | bool]:
+        with self._lock:
+            return {"ativo": self.ativo, "acertos": self.acertos, "falhas": self.falhas}
+
+
+@cache
+def create_cache_criterios() -> CacheDeCriterios:
+    return CacheDeCriterios(CacheSQLite())
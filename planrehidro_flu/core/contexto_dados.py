@@ -0,0 +1,164 @@
+import sys
+from collections import OrderedDict
+from concurrent.futures import Future
+from threading import Lock
+from typing import Any, Callable, Mapping, Sequence
+
+import pandas as pd
+
+type Carregador = Callable[[Sequence[int]], Mapping[int, Any]]
+
+LIMITE_MEMORIA_PADRAO = 512 * 1024**2  # bytes
+
+# Marca as estações consultadas sem resultado, para não repetir a consulta
+_AUSENTE = object()
+
+
+def estima_tamanho(valor: Any) -> int:
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(deep=True).sum())
+    if isinstance(valor, pd.Series):
+        return int(valor.memory_usage(deep=True))
+    if isinstance(valor, dict):
+        return sys.getsizeof(valor) + sum(
+            sys.getsizeof(chave) + sys.getsizeof(item) for chave, item in valor.items()
+        )
+    if isinstance(valor, (list, tuple)):
+        return sys.getsizeof(valor) + sum(sys.getsizeof(item) for item in valor)
+    return sys.getsizeof(valor)
+
+
+class ContextoDeDados:
+    """
+    Dados das estações compartilhados pelos critérios durante uma execução.
+
+    Cada conjunto de dados (resumos de descarga, curvas, séries de cota...)
+    possui um carregador que consulta várias estações de uma vez. O valor de
+    cada estação é lido uma única vez e mantido até a estação ser liberada
+    (fim do seu lote) ou descartado pelo limite de memória, na ordem do uso
+    menos recente (LRU).
+
+    Threads que pedem ao mesmo tempo dados de uma estação em carregamento
+    aguardam a consulta em andamento, sem repeti-la.
+    """
+
+    def __init__(
+        self,
+        carregadores: Mapping[str, Carregador],
+        limite_memoria: int = LIMITE_MEMORIA_PADRAO,
+    ) -> None:
+        self.carregadores = dict(carregadores)
+        self.limite_memoria = limite_memoria
+        self._entradas: OrderedDict[tuple[str, int], tuple[Any, int]] = OrderedDict()
+        self._em_andamento: dict[tuple[str, int], Future] = {}
+        self._memoria_em_uso = 0
+        self._lock = Lock()
+        self.acertos = 0
+        self.falhas = 0
+        self.descartes = 0
+
+    def obtem(self, conjunto: str, codigos: Sequence[int]) -> dict[int, Any]:
+        """
+        Retorna os dados das estações no conjunto informado; estações sem dados
+        não aparecem no resultado.
+        """
+        if conjunto not in self.carregadores:
+            raise KeyError(f"Conjunto de dados desconhecido: {conjunto}")
+
+        valores: dict[int, Any] = {}
+        aguardando: dict[int, Future] = {}
+        a_carregar: list[int] = []
+        with self._lock:
+            for codigo in dict.fromkeys(codigos):
+                chave = (conjunto, codigo)
+                if chave in self._entradas:
+                    self._entradas.move_to_end(chave)
+                    valores[codigo] = self._entradas[chave][0]
+                    self.acertos += 1
+                elif chave in self._em_andamento:
+                    aguardando[codigo] = self._em_andamento[chave]
+                    self.acertos += 1
+                else:
+                    self._em_andamento[chave] = Future()
+                    a_carregar.append(codigo)
+                    self.falhas += 1
+
+        if a_carregar:
+            valores.update(self._carrega(conjunto, a_carregar))
+
+        for codigo, future in aguardando.items():
+            valores[codigo] = future.result()
+
+        return {
+            codigo: valores[codigo]
+            for codigo in codigos
+            if valores.get(codigo, _AUSENTE) is not _AUSENTE
+        }
+
+    def _carrega(self, conjunto: str, codigos: list[int]) -> dict[int, Any]:
+        try:
+            carregados = self.carregadores[conjunto](codigos)
+        except BaseException as e:
+            with self._lock:
+                for codigo in codigos:
+                    self._em_andamento.pop((conjunto, codigo)).set_exception(e)
+            raise
+
+        valores = {codigo: carregados.get(codigo, _AUSENTE) for codigo in codigos}
+        with self._lock:
+            for codigo, valor in valores.items():
+                self._armazena((conjunto, codigo), valor)
+                self._em_andamento.pop((conjunto, codigo)).set_result(valor)
+        return valores
+
+    def _armazena(self, chave: tuple[str, int], valor: Any) -> None:
+        tamanho = 0 if valor is _AUSENTE else estima_tamanho(valor)
+        if chave in self._entradas:
+            self._memoria_em_uso -= self._entradas.pop(chave)[1]
+        self._entradas[chave] = (valor, tamanho)
+        self._memoria_em_uso += tamanho
+
+        while self._memoria_em_uso > self.limite_memoria and len(self._entradas) > 1:
+            _, (_, tamanho_descartado) = self._entradas.popitem(last=False)
+            self._memoria_em_uso -= tamanho_descartado
+            self.descartes += 1
+
+    def adiciona(
+        self, conjunto: str, codigos: Sequence[int], valores: Mapping[int, Any]
+    ) -> None:
+        """
+        Registra dados já carregados em outro processo (ver obtem); estações
+        ausentes de valores ficam marcadas como sem dados.
+        """
+        with self._lock:
+            for codigo in codigos:
+                self._armazena((conjunto, codigo), valores.get(codigo, _AUSENTE))
+
+    def libera(self, codigos: Sequence[int]) -> None:
+        """
+        Descarta os dados das estações cujo processamento terminou.
+        """
+        with self._lock:
+            for conjunto in self.carregadores:
+                for codigo in codigos:
+                    entrada = self._entradas.pop((conjunto, codigo), None)
+                    if entrada is not None:
+                        self._memoria_em_uso -= entrada[1]
+
+    def limpa(self) -> None:
+        with self._lock:
+            self._entradas.clear()
+            self._memoria_em_uso = 0
+            self.acertos = 0
+            self.falhas = 0
+            self.descartes = 0
+
+    def estatisticas(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "acertos": self.acertos,
+                "falhas": self.falhas,
+                "descartes": self.descartes,
+                "entradas": len(self._entradas),
+                "memoria_em_uso": self._memoria_em_uso,
+            }
@@ -1,26 +1,57 @@
+import argparse
+from itertools import batched
+from typing import Sequence
+
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 from tqdm import tqdm
 
+from planrehidro_flu.core.assinaturas_origem import (
+    calcula_assinaturas,
+    seleciona_estacoes_alteradas,
+)
+from planrehidro_flu.core.cache_criterios import create_cache_criterios
+from planrehidro_flu.core.models import EstacaoHidro
+from planrehidro_flu.core.parametros_calculo import (
+    FALHA_NO_CALCULO,
+    TabelaDeOrigem,
+    create_contexto_dados,
+    create_cpalar_reader,
+    create_hidro_reader,
+)
 from planrehidro_flu.core.parametros_multicriterio import (
     CriterioSelecionado,
     parametros_multicriterio,
 )
-from planrehidro_flu.databases.hidro.hidro_reader import HidroDWReader
+from planrehidro_flu.core.processamento_paralelo import (
+    ConfiguracaoProcessamento,
+    calcula_criterios_das_estacoes,
+)
+from planrehidro_flu.databases.cplar.models import (
+    EstacaoHidroRefBHAE,
+    EstacaoHidroRefBHO2013,
+)
 from planrehidro_flu.databases.internal.database_access import (
-    insere_criterios_da_estacao,
+    atualiza_criterio_das_estacoes,
+    finaliza_execucao,
+    inicia_execucao,
+    insere_criterios_das_estacoes,
     insere_inventario,
+    retorna_assinaturas_do_criterio,
     retorna_estacoes_processadas,
     retorna_estacoes_rhnr_cenario,
-    update_criterio_da_estacao,
+    salva_assinaturas_do_criterio,
 )
 from planrehidro_flu.databases.internal.models import (
     ENGINE,
+    AssinaturaDoCriterio,
     Base,
-    CriteriosDaEstacao,
     DescricaoCriterio,
+    ExecucaoProcessamento,
     GrupoCriterios,
+    modo_de_gravacao,
 )
+from planrehidro_flu.databases.pool_conexoes import estatisticas_pools
 
 
 def create_tables() -> None:
@@ -28,7 +59,7 @@ def create_tables() -> None:
 
 
 def armazena_inventario() -> None:
-    hidro = HidroDWReader()
+    hidro = create_hidro_reader()
     inventario = hidro.cria_inventario_estacao_hidro()
     insere_inventario(engine=ENGINE, inventario=inventario)
 
@@ -59,66 +90,247 @@ def populate_info_tables() -> None:
             session.commit()
 
 
-def processa_criterios() -> None:
+def inicia_cache_da_execucao(usa_cache_resultados: bool = True) -> None:
+    # As estações hidrorreferenciadas são consultadas por vários critérios para
+    # cada estação: carrega as duas tabelas uma única vez no início da execução
+    # e salva o índice topológico em disco para os processos de trabalho.
+    cplar_reader = create_cpalar_reader()
+    cplar_reader.invalida_cache_hidrorreferenciadas()
+    for classe_href in (EstacaoHidroRefBHAE, EstacaoHidroRefBHO2013):
+        cplar_reader.carrega_indice_topologico(classe_href, reconstroi=True)
+    create_contexto_dados().limpa()
+    create_cache_criterios().reinicia(ativo=usa_cache_resultados)
+
+
+def finaliza_cache_da_execucao() -> None:
+    cplar_reader = create_cpalar_reader()
+    print(
+        "Cache de estações hidrorreferenciadas:",
+        cplar_reader.estatisticas_cache_hidrorreferenciadas(),
+    )
+    cplar_reader.invalida_cache_hidrorreferenciadas()
+
+    contexto_dados = create_contexto_dados()
+    print("Contexto de dados das estações:", contexto_dados.estatisticas())
+    contexto_dados.limpa()
+
+    print("Cache de resultados dos critérios:", create_cache_criterios().estatisticas())
+    print("Pools de conexões:", estatisticas_pools())
+
+
+def processa_criterios(configuracao: ConfiguracaoProcessamento | None = None) -> None:
     # Base.metadata.create_all(ENGINE, tables=[CriteriosDaEstacao.__table__])
+    Base.metadata.create_all(ENGINE, tables=[ExecucaoProcessamento.__table__])
+    configuracao = configuracao or ConfiguracaoProcessamento()
 
     estacoes_rhnr = retorna_estacoes_rhnr_cenario(engine=ENGINE, cenario="Cenário1")
 
-    hidro = HidroDWReader()
+    hidro = create_hidro_reader()
     inventario = hidro.cria_inventario_estacao_hidro_por_codigos(
         codigos=[estacao.codigo for estacao in estacoes_rhnr]
     )
 
-    estacoes_processadas = retorna_estacoes_processadas(engine=ENGINE)
+    # Retomada: as estações já gravadas em uma execução anterior são ignoradas
+    estacoes_processadas = set(retorna_estacoes_processadas(engine=ENGINE))
     estacoes_nao_processadas = [
         estacao for estacao in inventario if estacao.codigo not in estacoes_processadas
     ]
+    inicia_cache_da_execucao(configuracao.usa_cache_resultados)
+    with modo_de_gravacao(ENGINE):
+        execucao_id = inicia_execucao(
+            ENGINE, operacao="processa_criterios", estacoes_previstas=len(inventario)
+        )
+        resultados = calcula_criterios_das_estacoes(
+            estacoes_nao_processadas, parametros_multicriterio, configuracao
+        )
+        for lote in batched(
+            tqdm(resultados, total=len(estacoes_nao_processadas)),
+            configuracao.tamanho_lote_gravacao,
+        ):
+            # Na primeira gravação, critérios que falharam ficam nulos
+            insere_criterios_das_estacoes(
+                engine=ENGINE,
+                valores_criterios=[
+                    {
+                        campo: None if valor is FALHA_NO_CALCULO else valor
+                        for campo, valor in valores_criterios.items()
+                    }
+                    for valores_criterios in lote
+                ],
+                execucao_id=execucao_id,
+            )
+        finaliza_execucao(ENGINE, execucao_id)
+    finaliza_cache_da_execucao()
 
-    for estacao in tqdm(estacoes_nao_processadas):
-        valores_criterios = {}
-        valores_criterios["codigo_estacao"] = estacao.codigo
 
-        for criterio in parametros_multicriterio:
-            try:
-                valor_criterio = criterio["calculo"].calcular(estacao)
-                valores_criterios[criterio["nome_campo"]] = valor_criterio  # type: ignore
-            except Exception as e:
-                print(
-                    f"Erro ao processar critérios para a estação {estacao.codigo}: {e}"
-                )
-                valores_criterios[criterio["nome_campo"]] = None  # type: ignore
-
-        insere_criterios_da_estacao(
-            engine=ENGINE, valores_criterios=CriteriosDaEstacao(**valores_criterios)
-        )
+def _cria_tabelas_de_atualizacao() -> None:
+    Base.metadata.create_all(
+        ENGINE,
+        tables=[ExecucaoProcessamento.__table__, AssinaturaDoCriterio.__table__],
+    )
 
 
-def update_field(criterio: CriterioSelecionado):
-    hidro = HidroDWReader()
-    inventario = hidro.cria_inventario_estacao_hidro()
+def _retorna_inventario(codigos: Sequence[int] | None) -> list[EstacaoHidro]:
+    if codigos is None:
+        codigos = retorna_estacoes_processadas(engine=ENGINE)
+    hidro = create_hidro_reader()
+    return hidro.cria_inventario_estacao_hidro_por_codigos(codigos=list(codigos))
 
-    for estacao in tqdm(inventario):
-        try:
-            valores_criterios = {}
-            valores_criterios["codigo_estacao"] = estacao.codigo
 
-            valor_criterio = criterio["calculo"].calcular(estacao)
-            valores_criterios[criterio["nome_campo"]] = valor_criterio  # type: ignore
+def _atualiza_campo(
+    criterio: CriterioSelecionado,
+    inventario: Sequence[EstacaoHidro],
+    configuracao: ConfiguracaoProcessamento,
+    apenas_alterados: bool,
+    assinaturas_tabelas: dict[str, str],
+) -> int:
+    """
+    Recalcula o critério para as estações do inventário e grava os valores.
+    Com apenas_alterados, recalcula só as estações com alguma tabela de origem
+    alterada e grava as assinaturas atuais; assinaturas_tabelas guarda as
+    assinaturas das tabelas do CPLAR entre os critérios de uma execução.
+    """
+    campo = criterio["nome_campo"]
 
-            update_criterio_da_estacao(
-                engine=ENGINE,
-                codigo_estacao=estacao.codigo,
-                campo=criterio["nome_campo"],
-                valor=valor_criterio,
+    assinaturas: dict[TabelaDeOrigem, dict[int, str]] = {}
+    if apenas_alterados:
+        calculo = criterio["calculo"]
+        assinaturas = calcula_assinaturas(
+            inventario,
+            calculo.tabelas_de_origem,
+            assinaturas_tabelas,
+            usa_cache_local=calculo.usa_cache_local,
+        )
+        alterados = set(
+            seleciona_estacoes_alteradas(
+                assinaturas,
+                retorna_assinaturas_do_criterio(engine=ENGINE, campo=campo),
+                [estacao.codigo for estacao in inventario],
             )
-        except Exception as e:
-            print(
-                f"Erro ao processar critério: {criterio['nome_campo']} para a estação {estacao.codigo}: {e}"
+        )
+        inventario = [estacao for estacao in inventario if estacao.codigo in alterados]
+        if not inventario:
+            print(f"Critério {campo}: nenhuma tabela de origem alterada")
+            return 0
+
+    execucao_id = inicia_execucao(
+        ENGINE, operacao=f"update_field:{campo}", estacoes_previstas=len(inventario)
+    )
+    resultados = calcula_criterios_das_estacoes(inventario, [criterio], configuracao)
+    # Estações cujo cálculo falhou mantêm o valor já gravado
+    valores = {
+        valores_criterios["codigo_estacao"]: valores_criterios[campo]
+        for valores_criterios in tqdm(resultados, total=len(inventario))
+        if valores_criterios[campo] is not FALHA_NO_CALCULO
+    }
+    alteradas = atualiza_criterio_das_estacoes(
+        engine=ENGINE, campo=campo, valores=valores, execucao_id=execucao_id
+    )
+    if apenas_alterados:
+        # As assinaturas são gravadas depois dos valores: uma interrupção antes
+        # deste ponto faz as estações serem recalculadas na próxima execução.
+        # Estações com falha ou valor nulo ficam sem assinatura nova e são
+        # tentadas de novo na próxima atualização incremental.
+        salva_assinaturas_do_criterio(
+            engine=ENGINE,
+            campo=campo,
+            assinaturas=assinaturas,
+            codigos=[codigo for codigo, valor in valores.items() if valor is not None],
+        )
+    finaliza_execucao(ENGINE, execucao_id)
+
+    print(f"Critério {campo}: {alteradas} de {len(valores)} estações alteradas")
+    if len(valores) < len(inventario):
+        print(f"Critério {campo}: {len(inventario) - len(valores)} estações com falha")
+    return alteradas
+
+
+def update_field(
+    criterio: CriterioSelecionado,
+    configuracao: ConfiguracaoProcessamento | None = None,
+    codigos: Sequence[int] | None = None,
+    apenas_alterados: bool = False,
+) -> int:
+    """
+    Recalcula um critério e grava os valores em uma única transação.
+
+    Por padrão são recalculadas apenas as estações já gravadas na tabela de
+    critérios; codigos restringe o cálculo a um subconjunto. Com
+    apenas_alterados, são recalculadas só as estações em que alguma tabela de
+    origem do critério mudou desde o último cálculo. Retorna o número de
+    estações cujo valor mudou.
+    """
+    _cria_tabelas_de_atualizacao()
+    inventario = _retorna_inventario(codigos)
+    configuracao = configuracao or ConfiguracaoProcessamento()
+
+    inicia_cache_da_execucao(configuracao.usa_cache_resultados)
+    with modo_de_gravacao(ENGINE):
+        alteradas = _atualiza_campo(
+            criterio, inventario, configuracao, apenas_alterados, {}
+        )
+    finaliza_cache_da_execucao()
+    return alteradas
+
+
+def atualiza_incremental(
+    configuracao: ConfiguracaoProcessamento | None = None,
+    criterios: Sequence[CriterioSelecionado] = parametros_multicriterio,
+) -> dict[str, int]:
+    """
+    Recalcula apenas as células (estação, critério) cujas tabelas de origem
+    mudaram desde o último cálculo. Na primeira execução todas as estações são
+    recalculadas e as assinaturas de referência são gravadas.
+
+    O inventário, os índices topológicos e as assinaturas das tabelas do CPLAR
+    são carregados uma vez para todos os critérios.
+    """
+    _cria_tabelas_de_atualizacao()
+    inventario = _retorna_inventario(None)
+    configuracao = configuracao or ConfiguracaoProcessamento()
+    assinaturas_tabelas: dict[str, str] = {}
+
+    alteradas: dict[str, int] = {}
+    inicia_cache_da_execucao(configuracao.usa_cache_resultados)
+    with modo_de_gravacao(ENGINE):
+        for criterio in criterios:
+            if not criterio["calculo"].tabelas_de_origem:
+                continue
+            alteradas[criterio["nome_campo"]] = _atualiza_campo(
+                criterio, inventario, configuracao, True, assinaturas_tabelas
             )
+    finaliza_cache_da_execucao()
+    return alteradas
 
 
 if __name__ == "__main__":
-    # processa_criterios()
+    parser = argparse.ArgumentParser(description="Cálculo dos critérios das estações")
+    parser.add_argument(
+        "operacao",
+        nargs="?",
+        choices=["processa_criterios", "atualiza_incremental"],
+    )
+    parser.add_argument(
+        "--sem-cache",
+        action="store_true",
+        help="recalcula todos os critérios, sem ler nem gravar o cache de resultados",
+    )
+    parser.add_argument(
+        "--limpa-cache",
+        action="store_true",
+        help="apaga o cache de resultados dos critérios antes de processar",
+    )
+    args = parser.parse_args()
+
+    if args.limpa_cache:
+        create_cache_criterios().backend.limpa()
+    configuracao = ConfiguracaoProcessamento(usa_cache_resultados=not args.sem_cache)
+    if args.operacao == "processa_criterios":
+        processa_criterios(configuracao)
+    elif args.operacao == "atualiza_incremental":
+        atualiza_incremental(configuracao)
+
+    # processa_criterios(ConfiguracaoProcessamento(threads=8, processos=2))
     # update_field(
     #     {
     #         "grupo": "Objetivos da Estação",
@@ -128,4 +340,3 @@ if __name__ == "__main__":
     #         "calculo": CalculoDoCriterioTrechoDeNavegacao(),
     #     }
     # )
-    ...
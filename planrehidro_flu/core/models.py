@@ -1,6 +1,8 @@
 from datetime import date
-from typing import Literal, Self
+from typing import Any, Iterator, Literal, Self, cast
 
+import numpy as np
+import pandas as pd
 from pydantic import BaseModel
 
 from planrehidro_flu.core.enums import (
@@ -61,36 +63,122 @@ class CurvaDeDescarga(BaseModel):
     coef_a3: float | None
 
 
+class _ColunasInventario:
+    """
+    Armazenamento colunar de um inventário, compartilhado pelas suas visões.
+
+    Os objetos EstacaoHidro são criados sob demanda a partir das colunas (e
+    guardados) quando o inventário não foi montado a partir deles. Montado a
+    partir dos objetos, só as colunas consultadas são extraídas deles. Os
+    índices (valor -> posições) são montados na primeira consulta a cada coluna.
+    """
+
+    def __init__(
+        self,
+        estacoes: list[EstacaoHidro | None],
+        colunas: pd.DataFrame | None = None,
+    ) -> None:
+        self.estacoes = estacoes
+        self._colunas = None if colunas is None else colunas.reset_index(drop=True)
+        self._indices: dict[str, dict[Any, np.ndarray]] = {}
+
+    def coluna(self, coluna: str) -> pd.Series:
+        if self._colunas is not None:
+            return self._colunas[coluna]
+        return pd.Series(
+            [getattr(estacao, coluna) for estacao in self.estacoes], dtype=object
+        )
+
+    def indice(self, coluna: str) -> dict[Any, np.ndarray]:
+        if coluna not in self._indices:
+            valores = self.coluna(coluna)
+            self._indices[coluna] = valores.groupby(
+                valores, sort=False, dropna=False
+            ).indices
+        return self._indices[coluna]
+
+    def estacao(self, posicao: int) -> EstacaoHidro:
+        estacao = self.estacoes[posicao]
+        if estacao is None:
+            # Sem o objeto, o inventário foi montado a partir das colunas
+            linha = cast(pd.DataFrame, self._colunas).iloc[posicao].to_dict()
+            estacao = EstacaoHidro.model_validate(
+                {
+                    campo: None if pd.isna(valor) else valor
+                    for campo, valor in linha.items()
+                }
+            )
+            self.estacoes[posicao] = estacao
+        return estacao
+
+
 class InventarioEstacoesHidro:
+    """
+    Inventário de estações com filtros indexados por codigo, bacia, estado e
+    responsavel.
+
+    Os filtros retornam visões sobre as mesmas colunas (apenas as posições
+    selecionadas), e podem ser encadeados sem copiar as estações.
+    """
+
     def __init__(self, lista_estacoes: list[EstacaoHidro]):
-        self._inventario = lista_estacoes
+        self._colunas = _ColunasInventario(list(lista_estacoes))
+        self._posicoes: np.ndarray | None = None  # None: todas as estações
+
+    @classmethod
+    def de_dataframe(cls, colunas: pd.DataFrame) -> Self:
+        """
+        Inventário a partir das colunas de EstacaoHidro, sem criar os objetos.
+        """
+        inventario = cls.__new__(cls)
+        inventario._colunas = _ColunasInventario([None] * len(colunas), colunas)
+        inventario._posicoes = None
+        return inventario
+
+    def _visao(self, posicoes: np.ndarray) -> Self:
+        visao = self.__class__.__new__(self.__class__)
+        visao._colunas = self._colunas
+        visao._posicoes = posicoes
+        return visao
+
+    @property
+    def posicoes(self) -> np.ndarray:
+        if self._posicoes is None:
+            return np.arange(len(self._colunas.estacoes))
+        return self._posicoes
 
     @property
     def inventario(self) -> list[EstacaoHidro]:
-        return self._inventario
+        return list(self)
+
+    def __iter__(self) -> Iterator[EstacaoHidro]:
+        for posicao in self.posicoes:
+            yield self._colunas.estacao(int(posicao))
+
+    def __len__(self) -> int:
+        return len(self.posicoes)
+
+    def _posicoes_com_valor(self, coluna: str, valor: Any) -> np.ndarray:
+        posicoes = self._colunas.indice(coluna).get(valor, np.empty(0, dtype=np.intp))
+        if self._posicoes is None:
+            return posicoes
+        # Posições em ordem crescente: a visão mantém a ordem do inventário
+        return np.intersect1d(self._posicoes, posicoes, assume_unique=True)
+
+    def _filtra(self, coluna: str, valor: Any) -> Self:
+        return self._visao(self._posicoes_com_valor(coluna, valor))
 
     def filtra_responsavel(self, responsavel: str) -> Self:
-        return self.__class__(
-            [
-                estacao
-                for estacao in self.inventario
-                if estacao.responsavel == responsavel
-            ]
-        )
+        return self._filtra("responsavel", responsavel)
 
     def filtra_bacia(self, bacia: BaciaEnumStr) -> Self:
-        return self.__class__(
-            [estacao for estacao in self.inventario if estacao.bacia == bacia]
-        )
+        return self._filtra("bacia", bacia)
 
     def filtra_estado(self, estado: EstadoEnumStr) -> Self:
-        return self.__class__(
-            [estacao for estacao in self.inventario if estacao.estado == estado]
-        )
+        return self._filtra("estado", estado)
 
     def filtra_estacao_por_codigo(self, codigo: int) -> EstacaoHidro:
-        for estacao in self.inventario:
-            if estacao.codigo == codigo:
-                return estacao
-
-        raise ValueError(f"Estação com código {codigo} não encontrada.")
+        posicoes = self._posicoes_com_valor("codigo", codigo)
+        if len(posicoes) == 0:
+            raise ValueError(f"Estação com código {codigo} não encontrada.")
+        return self._colunas.estacao(int(posicoes[0]))
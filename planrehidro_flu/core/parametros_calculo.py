@@ -1,26 +1,70 @@
-import calendar
 import json
 from abc import ABC, abstractmethod
+from collections import defaultdict
+from enum import Enum
 from functools import cache
-from typing import cast
+from typing import Callable, Literal, Mapping, Sequence, cast
 
+import numpy as np
+import pandas as pd
+
+from planrehidro_flu.core.contexto_dados import ContextoDeDados
 from planrehidro_flu.core.models import EstacaoHidro
 from planrehidro_flu.core.params_funcoes_suporte import (
-    calcula_desvio_medio_curva_chave,
-    pivot_cota_to_dataframe,
-    retorna_estatisticas_descarga_liquida,
-)
-from planrehidro_flu.databases.cplar.bd_cplar_reader import (
-    PostgresReader,
-    localiza_cocursodags_de_jusante,
+    calcula_completude_anual,
+    calcula_desvios_medios_curva_chave,
+    calcula_medicoes_por_ano,
+    conta_dias_por_ano,
+    limpa_serie_cota,
+    seleciona_estacoes_extremas_de_montante,
+    seleciona_estacoes_extremas_de_montante_lote,
 )
+from planrehidro_flu.databases.cplar.bd_cplar_reader import PostgresReader
+from planrehidro_flu.databases.cplar.bd_cplar_reader_async import PostgresReaderAsync
 from planrehidro_flu.databases.cplar.models import (
+    EstacaoComObjetivos,
     EstacaoHidroRefBHAE,
     EstacaoHidroRefBHO2013,
 )
 from planrehidro_flu.databases.hidro.hidro_reader import HidroDWReader
+from planrehidro_flu.databases.hidro.models import Estacao
+from planrehidro_flu.databases.internal.serie_historica_local import (
+    SerieHistoricaLocal,
+)
+
+
+class FalhaNoCalculo(Enum):
+    """
+    Resultado de uma estação cujo cálculo lançou exceção. Distingue a falha
+    de um valor nulo calculado: a gravação inicial registra nulo, e as
+    atualizações mantêm o valor já gravado.
+    """
+
+    FALHA = "falha"
+
 
-CriterioOutput = int | float | bool | str | None
+FALHA_NO_CALCULO = FalhaNoCalculo.FALHA
+
+CriterioOutput = int | float | bool | str | FalhaNoCalculo | None
+BancoDeDados = Literal["cplar", "hidro"]
+# Tabelas (ou grupos de tabelas) de origem dos dados dos critérios, usadas na
+# detecção de alterações do processamento incremental
+TabelaDeOrigem = Literal[
+    "Estacao",
+    "ResumoDescarga",
+    "CurvaDescarga",
+    "PivotCota",
+    "hidrorref",
+    "estacoes_operantes",
+    "inundacoes",
+    "ish",
+    "polos_nacionais",
+    "semiarido",
+    "trechos_navegaveis",
+    "rhnr",
+]
+
+ANO_REFERENCIA_DESCARGAS = 2024
 
 
 @cache
@@ -33,19 +77,166 @@ def create_hidro_reader() -> HidroDWReader:
     return HidroDWReader()
 
 
+@cache
+def create_cpalar_reader_async() -> PostgresReaderAsync:
+    return PostgresReaderAsync(create_cpalar_reader())
+
+
+@cache
+def create_serie_local() -> SerieHistoricaLocal:
+    return SerieHistoricaLocal()
+
+
+def sincroniza_serie_cota(codigos: Sequence[int]) -> SerieHistoricaLocal:
+    # As séries de cota são lidas da base local, atualizada com os registros
+    # novos do Hidro DW uma vez por estação em cada execução
+    create_contexto_dados().obtem("sincronizacao_cota", codigos)
+    return create_serie_local()
+
+
+def _sincroniza_cota(codigos: Sequence[int]) -> dict[int, bool]:
+    create_serie_local().sincroniza(create_hidro_reader(), "cota", codigos)
+    return {codigo: True for codigo in codigos}
+
+
+def _carrega_serie_cota(codigos: Sequence[int]) -> dict[int, pd.DataFrame]:
+    serie_local = sincroniza_serie_cota(codigos)
+    return {
+        codigo: serie_local.retorna_serie_historica_df("cota", codigo)
+        for codigo in codigos
+    }
+
+
+@cache
+def create_contexto_dados() -> ContextoDeDados:
+    # Dados do Hidro DW usados por mais de um critério: cada conjunto é lido
+    # uma vez por estação e compartilhado entre os critérios do mesmo lote
+    return ContextoDeDados(
+        carregadores={
+            "resumo_descarga": lambda codigos: (
+                create_hidro_reader().retorna_resumos_de_descarga(codigos)
+            ),
+            "curva_descarga": lambda codigos: (
+                create_hidro_reader().retorna_curvas_de_descarga(codigos)
+            ),
+            "contagem_descargas": lambda codigos: (
+                create_hidro_reader().retorna_contagem_de_descargas(
+                    codigos, ano_referencia=ANO_REFERENCIA_DESCARGAS
+                )
+            ),
+            "sincronizacao_cota": _sincroniza_cota,
+            "serie_cota": _carrega_serie_cota,
+            "data_inicial_cota": lambda codigos: sincroniza_serie_cota(
+                codigos
+            ).retorna_data_inicial_serie_cota(codigos),
+            "dias_com_cota_por_ano": lambda codigos: sincroniza_serie_cota(
+                codigos
+            ).retorna_dias_com_cota_por_ano(codigos),
+        }
+    )
+
+
+def calcula_isolado(
+    estacao: EstacaoHidro, calculo: Callable[[EstacaoHidro], CriterioOutput]
+) -> CriterioOutput:
+    try:
+        return calculo(estacao)
+    except Exception as e:
+        print(f"Erro ao processar critérios para a estação {estacao.codigo}: {e}")
+        return FALHA_NO_CALCULO
+
+
+def seleciona_estacao_href[T](estacoes_href: Mapping[int, T], codigo: int) -> T:
+    if codigo not in estacoes_href:
+        raise ValueError(
+            f"Estação Hidrorreferenciada com código {codigo} não encontrada."
+        )
+    return estacoes_href[codigo]
+
+
 class CalculoDoCriterio(ABC):
+    # Bancos consultados pelo critério e se o cálculo é dominado por pandas/numpy;
+    # usados pelo processamento paralelo para limitar conexões e escolher o executor.
+    bancos_de_dados: tuple[BancoDeDados, ...] = ()
+    uso_intensivo_cpu: bool = False
+    # Tabelas lidas pelo critério: o valor é recalculado quando alguma delas muda
+    tabelas_de_origem: tuple[TabelaDeOrigem, ...] = ()
+    # Incrementar quando a regra de cálculo mudar: invalida o cache de resultados
+    versao: int = 1
+    # Conjuntos do ContextoDeDados lidos por calcular_lote: nos processos de
+    # trabalho, são carregados no processo principal e enviados com o lote
+    conjuntos_de_dados: tuple[str, ...] = ()
+    # Lê as camadas espaciais do cache local (ver CalculoDoCriterioComCamadaLocal)
+    usa_cache_local: bool = False
+    # Critérios com calcular_lote_async consultam o CPLAR pelo leitor
+    # assíncrono no agendador asyncio, sem ocupar uma thread
+    consulta_assincrona: bool = False
+
     @abstractmethod
     def calcular(self, estacao: EstacaoHidro) -> CriterioOutput: ...
 
+    def calcular_lote(
+        self, estacoes: Sequence[EstacaoHidro]
+    ) -> dict[int, CriterioOutput]:
+        """
+        Calcula o critério para um lote de estações. Estações cujo cálculo
+        falhar recebem FALHA_NO_CALCULO. As subclasses sobrescrevem este método para
+        consultar os bancos uma única vez para todo o lote.
+        """
+        return {
+            estacao.codigo: calcula_isolado(estacao, self.calcular)
+            for estacao in estacoes
+        }
+
+    async def calcular_lote_async(
+        self, estacoes: Sequence[EstacaoHidro]
+    ) -> dict[int, CriterioOutput]:
+        """
+        Versão assíncrona de calcular_lote, implementada pelos critérios com
+        consulta_assincrona.
+        """
+        raise NotImplementedError
+
+
+class CalculoDoCriterioComCamadaLocal(CalculoDoCriterio):
+    """
+    Critério que consulta uma camada espacial do CPLAR. Com usa_cache_local
+    (padrão), a camada é lida do cache local em disco (CacheCamadasEspaciais),
+    extraído do PostGIS uma vez por período de validade; sem ele, cada lote
+    consulta a camada no banco.
+    """
+
+    def __init__(self, usa_cache_local: bool = True) -> None:
+        self.usa_cache_local = usa_cache_local
+
 
 class CalculoDoCriterioAreaDrenagem(CalculoDoCriterio):
+    tabelas_de_origem = ("Estacao",)
+
     def calcular(self, estacao: EstacaoHidro) -> CriterioOutput:
         if estacao.area_drenagem_km2 is None:
             raise ValueError("Área de drenagem não informada")
         return estacao.area_drenagem_km2
 
 
+def retorna_estacoes_de_montante_lote(
+    estacoes: Sequence[EstacaoHidro],
+) -> tuple[dict[int, EstacaoHidroRefBHAE], dict[int, list[EstacaoHidroRefBHAE]]]:
+    cplar_reader = create_cpalar_reader()
+    estacoes_href = cplar_reader.retorna_estacoes_hidrorreferenciadas(
+        classe_href=EstacaoHidroRefBHAE,
+        codigos=[estacao.codigo for estacao in estacoes],
+    )
+    estacoes_a_montante = cplar_reader.retorna_estacoes_de_montante_lote(
+        classe_href=EstacaoHidroRefBHAE, estacoes_href=list(estacoes_href.values())
+    )
+    return estacoes_href, estacoes_a_montante
+
+
 class CalculoDoCriterioRelevanciaEspacial(CalculoDoCriterio):
+    bancos_de_dados = ("cplar",)
+    tabelas_de_origem = ("Estacao", "hidrorref", "estacoes_operantes")
+
     def calcular(self, estacao: EstacaoHidro) -> CriterioOutput:
         if estacao.area_drenagem_km2 is None:
             raise ValueError("Área de drenagem não informada")
@@ -57,33 +248,52 @@ class CalculoDoCriterioRelevanciaEspacial(CalculoDoCriterio):
         estacoes_a_montante = cplar_reader.retorna_estacoes_de_montante(
             classe_href=EstacaoHidroRefBHAE, estacao_href=estacao_href
         )
+        return self.calcula_relevancia(
+            estacao, seleciona_estacoes_extremas_de_montante(estacoes_a_montante)
+        )
 
-        if not estacoes_a_montante:
-            return 1.0
+    def calcular_lote(
+        self, estacoes: Sequence[EstacaoHidro]
+    ) -> dict[int, CriterioOutput]:
+        estacoes_href, estacoes_a_montante = retorna_estacoes_de_montante_lote(estacoes)
+        # Estações extremas de todo o lote em uma única passada
+        estacoes_extremas = seleciona_estacoes_extremas_de_montante_lote(
+            estacoes_a_montante
+        )
 
-        estacoes_a_computar = []
-        for est_mont in estacoes_a_montante:
-            cocursodags_jusante = localiza_cocursodags_de_jusante(est_mont.cobacia)
-            cobacias_jusante = [
-                est_jus.codigo
-                for est_jus in estacoes_a_montante
-                if est_jus.cocursodag in cocursodags_jusante
-                and est_jus.codigo != est_mont.codigo
-                and est_jus.cobacia <= est_mont.cobacia
-                and cast(float, est_jus.area_drenagem)
-                > cast(float, est_mont.area_drenagem)
-            ]
-            if not cobacias_jusante:
-                estacoes_a_computar.append(est_mont)
+        def resultado(estacao: EstacaoHidro) -> CriterioOutput:
+            if estacao.area_drenagem_km2 is None:
+                raise ValueError("Área de drenagem não informada")
+            seleciona_estacao_href(estacoes_href, estacao.codigo)
+            if estacao.codigo not in estacoes_extremas:
+                raise ValueError(
+                    "Área de drenagem não informada em estação de montante"
+                )
+            return self.calcula_relevancia(estacao, estacoes_extremas[estacao.codigo])
+
+        return {
+            estacao.codigo: calcula_isolado(estacao, resultado) for estacao in estacoes
+        }
+
+    def calcula_relevancia(
+        self, estacao: EstacaoHidro, estacoes_a_computar: Sequence[EstacaoHidroRefBHAE]
+    ) -> float:
+        if not estacoes_a_computar:
+            return 1.0
 
         soma_areas_drenagens_nao_repetidas = sum(
             set([cast(float, est.area_drenagem) for est in estacoes_a_computar])
         )
 
-        return 1 - (soma_areas_drenagens_nao_repetidas / estacao.area_drenagem_km2)
+        return 1 - (
+            soma_areas_drenagens_nao_repetidas / cast(float, estacao.area_drenagem_km2)
+        )
 
 
 class CalculoDoCriterioDensidadeEstacoes(CalculoDoCriterio):
+    bancos_de_dados = ("cplar",)
+    tabelas_de_origem = ("Estacao", "hidrorref", "estacoes_operantes")
+
     def calcular(self, estacao: EstacaoHidro) -> CriterioOutput:
         if estacao.area_drenagem_km2 is None:
             raise ValueError("Área de drenagem não informada")
@@ -100,20 +310,87 @@ class CalculoDoCriterioDensidadeEstacoes(CalculoDoCriterio):
 
         return estacao.area_drenagem_km2 / len(estacoes_a_montante)
 
+    def calcular_lote(
+        self, estacoes: Sequence[EstacaoHidro]
+    ) -> dict[int, CriterioOutput]:
+        estacoes_href, estacoes_a_montante = retorna_estacoes_de_montante_lote(estacoes)
+
+        def resultado(estacao: EstacaoHidro) -> CriterioOutput:
+            if estacao.area_drenagem_km2 is None:
+                raise ValueError("Área de drenagem não informada")
+            seleciona_estacao_href(estacoes_href, estacao.codigo)
+            if not estacoes_a_montante[estacao.codigo]:
+                return 0.0
+            return estacao.area_drenagem_km2 / len(estacoes_a_montante[estacao.codigo])
+
+        return {
+            estacao.codigo: calcula_isolado(estacao, resultado) for estacao in estacoes
+        }
+
+
+class CalculoDoCriterioTrechoVulnerabilidadeCheias(CalculoDoCriterioComCamadaLocal):
+    bancos_de_dados = ("cplar",)
+    tabelas_de_origem = ("hidrorref", "inundacoes")
+    consulta_assincrona = True
 
-class CalculoDoCriterioTrechoVulnerabilidadeCheias(CalculoDoCriterio):
     def calcular(self, estacao: EstacaoHidro) -> CriterioOutput:
         cplar_reader = create_cpalar_reader()
         estacao_href = cplar_reader.retorna_estacao_hidrorreferenciada(
             classe_href=EstacaoHidroRefBHO2013, codigo_estacao=estacao.codigo
         )
-        trecho_vulneravel_cheias = cplar_reader.retorna_trecho_vulneravel_a_cheias(
-            estacao_href.cobacia
+        cobacias_vulneraveis = cplar_reader.retorna_cobacias_vulneraveis_a_cheias(
+            [estacao_href.cobacia], usa_cache_local=self.usa_cache_local
+        )
+        return estacao_href.cobacia in cobacias_vulneraveis
+
+    def calcular_lote(
+        self, estacoes: Sequence[EstacaoHidro]
+    ) -> dict[int, CriterioOutput]:
+        cplar_reader = create_cpalar_reader()
+        estacoes_href = cplar_reader.retorna_estacoes_hidrorreferenciadas(
+            classe_href=EstacaoHidroRefBHO2013,
+            codigos=[estacao.codigo for estacao in estacoes],
+        )
+        cobacias_vulneraveis = cplar_reader.retorna_cobacias_vulneraveis_a_cheias(
+            [href.cobacia for href in estacoes_href.values()],
+            usa_cache_local=self.usa_cache_local,
+        )
+        return self.resultados_do_lote(estacoes, estacoes_href, cobacias_vulneraveis)
+
+    async def calcular_lote_async(
+        self, estacoes: Sequence[EstacaoHidro]
+    ) -> dict[int, CriterioOutput]:
+        cplar_reader = create_cpalar_reader_async()
+        estacoes_href = await cplar_reader.retorna_estacoes_hidrorreferenciadas(
+            classe_href=EstacaoHidroRefBHO2013,
+            codigos=[estacao.codigo for estacao in estacoes],
         )
-        return False if trecho_vulneravel_cheias is None else True
+        cobacias_vulneraveis = await cplar_reader.retorna_cobacias_vulneraveis_a_cheias(
+            [href.cobacia for href in estacoes_href.values()],
+            usa_cache_local=self.usa_cache_local,
+        )
+        return self.resultados_do_lote(estacoes, estacoes_href, cobacias_vulneraveis)
+
+    def resultados_do_lote(
+        self,
+        estacoes: Sequence[EstacaoHidro],
+        estacoes_href: Mapping[int, EstacaoHidroRefBHO2013],
+        cobacias_vulneraveis: set[str],
+    ) -> dict[int, CriterioOutput]:
+        def resultado(estacao: EstacaoHidro) -> CriterioOutput:
+            estacao_href = seleciona_estacao_href(estacoes_href, estacao.codigo)
+            return estacao_href.cobacia in cobacias_vulneraveis
+
+        return {
+            estacao.codigo: calcula_isolado(estacao, resultado) for estacao in estacoes
+        }
 
 
 class CalculoDoCriterioISHNaAreaDrenagem(CalculoDoCriterio):
+    bancos_de_dados = ("cplar",)
+    tabelas_de_origem = ("hidrorref", "ish")
+    consulta_assincrona = True
+
     def calcular(self, estacao: EstacaoHidro) -> CriterioOutput:
         cplar_reader = create_cpalar_reader()
         estacao_href = cplar_reader.retorna_estacao_hidrorreferenciada(
@@ -133,6 +410,53 @@ class CalculoDoCriterioISHNaAreaDrenagem(CalculoDoCriterio):
         )
         return self.classifica_resultado(ish_ponderado)
 
+    def calcular_lote(
+        self, estacoes: Sequence[EstacaoHidro]
+    ) -> dict[int, CriterioOutput]:
+        cplar_reader = create_cpalar_reader()
+        estacoes_href = cplar_reader.retorna_estacoes_hidrorreferenciadas(
+            classe_href=EstacaoHidroRefBHO2013,
+            codigos=[estacao.codigo for estacao in estacoes],
+        )
+        ish_por_cobacia = cplar_reader.retorna_ish_numerico_agregado_por_area_drenagem(
+            [href.cobacia for href in estacoes_href.values()]
+        )
+        return self.resultados_do_lote(estacoes, estacoes_href, ish_por_cobacia)
+
+    async def calcular_lote_async(
+        self, estacoes: Sequence[EstacaoHidro]
+    ) -> dict[int, CriterioOutput]:
+        cplar_reader = create_cpalar_reader_async()
+        estacoes_href = await cplar_reader.retorna_estacoes_hidrorreferenciadas(
+            classe_href=EstacaoHidroRefBHO2013,
+            codigos=[estacao.codigo for estacao in estacoes],
+        )
+        ish_por_cobacia = (
+            await cplar_reader.retorna_ish_numerico_agregado_por_area_drenagem(
+                [href.cobacia for href in estacoes_href.values()]
+            )
+        )
+        return self.resultados_do_lote(estacoes, estacoes_href, ish_por_cobacia)
+
+    def resultados_do_lote(
+        self,
+        estacoes: Sequence[EstacaoHidro],
+        estacoes_href: Mapping[int, EstacaoHidroRefBHO2013],
+        ish_por_cobacia: dict[str, tuple[float, float]],
+    ) -> dict[int, CriterioOutput]:
+        def resultado(estacao: EstacaoHidro) -> CriterioOutput:
+            estacao_href = seleciona_estacao_href(estacoes_href, estacao.codigo)
+            if estacao_href.cobacia not in ish_por_cobacia:
+                raise ValueError(
+                    f"Ottobacias não encontradas para a estação: {estacao.codigo}"
+                )
+            area_total, ish_area = ish_por_cobacia[estacao_href.cobacia]
+            return self.classifica_resultado(ish_area / area_total)
+
+        return {
+            estacao.codigo: calcula_isolado(estacao, resultado) for estacao in estacoes
+        }
+
     def classifica_resultado(self, valor_ish: float) -> str:
         if 1.0 <= valor_ish < 1.5:
             return "Mínimo"
@@ -149,42 +473,159 @@ class CalculoDoCriterioISHNaAreaDrenagem(CalculoDoCriterio):
         )
 
 
-class CalculoDoCriterioEmPoloDeIrrigacao(CalculoDoCriterio):
+class CalculoDoCriterioEmPoloDeIrrigacao(CalculoDoCriterioComCamadaLocal):
+    bancos_de_dados = ("cplar",)
+    tabelas_de_origem = ("Estacao", "polos_nacionais")
+
     def calcular(self, estacao: EstacaoHidro) -> CriterioOutput:
         cplar_reader = create_cpalar_reader()
-        estacao_href = cplar_reader.retorno_polo_nacional_por_corrdenadas(
-            latitude=estacao.latitude, longitude=estacao.longitude
+        polos = cplar_reader.mapeia_polos_nacionais(
+            [(estacao.codigo, estacao.longitude, estacao.latitude)],
+            usa_cache_local=self.usa_cache_local,
         )
-        return False if estacao_href is None else True
+        return polos[estacao.codigo] is not None
 
+    def calcular_lote(
+        self, estacoes: Sequence[EstacaoHidro]
+    ) -> dict[int, CriterioOutput]:
+        cplar_reader = create_cpalar_reader()
+        polos = cplar_reader.mapeia_polos_nacionais(
+            [
+                (estacao.codigo, estacao.longitude, estacao.latitude)
+                for estacao in estacoes
+            ],
+            usa_cache_local=self.usa_cache_local,
+        )
+        return {
+            estacao.codigo: polos[estacao.codigo] is not None for estacao in estacoes
+        }
+
+
+class CalculoDoCriterioTrechoDeNavegacao(CalculoDoCriterioComCamadaLocal):
+    bancos_de_dados = ("cplar",)
+    tabelas_de_origem = ("hidrorref", "trechos_navegaveis")
+    consulta_assincrona = True
 
-class CalculoDoCriterioTrechoDeNavegacao(CalculoDoCriterio):
     def calcular(self, estacao: EstacaoHidro) -> CriterioOutput:
         cplar_reader = create_cpalar_reader()
         estacao_href = cplar_reader.retorna_estacao_hidrorreferenciada(
             classe_href=EstacaoHidroRefBHO2013, codigo_estacao=estacao.codigo
         )
-        trecho = cplar_reader.retorna_trecho_navegavel(estacao_href.cobacia)
-        return False if trecho is None else True
+        return estacao_href.cobacia in cplar_reader.retorna_cobacias_navegaveis(
+            [estacao_href.cobacia], usa_cache_local=self.usa_cache_local
+        )
+
+    def calcular_lote(
+        self, estacoes: Sequence[EstacaoHidro]
+    ) -> dict[int, CriterioOutput]:
+        cplar_reader = create_cpalar_reader()
+        estacoes_href = cplar_reader.retorna_estacoes_hidrorreferenciadas(
+            classe_href=EstacaoHidroRefBHO2013,
+            codigos=[estacao.codigo for estacao in estacoes],
+        )
+        cobacias_navegaveis = cplar_reader.retorna_cobacias_navegaveis(
+            [href.cobacia for href in estacoes_href.values()],
+            usa_cache_local=self.usa_cache_local,
+        )
+        return self.resultados_do_lote(estacoes, estacoes_href, cobacias_navegaveis)
+
+    async def calcular_lote_async(
+        self, estacoes: Sequence[EstacaoHidro]
+    ) -> dict[int, CriterioOutput]:
+        cplar_reader = create_cpalar_reader_async()
+        estacoes_href = await cplar_reader.retorna_estacoes_hidrorreferenciadas(
+            classe_href=EstacaoHidroRefBHO2013,
+            codigos=[estacao.codigo for estacao in estacoes],
+        )
+        cobacias_navegaveis = await cplar_reader.retorna_cobacias_navegaveis(
+            [href.cobacia for href in estacoes_href.values()],
+            usa_cache_local=self.usa_cache_local,
+        )
+        return self.resultados_do_lote(estacoes, estacoes_href, cobacias_navegaveis)
+
+    def resultados_do_lote(
+        self,
+        estacoes: Sequence[EstacaoHidro],
+        estacoes_href: Mapping[int, EstacaoHidroRefBHO2013],
+        cobacias_navegaveis: set[str],
+    ) -> dict[int, CriterioOutput]:
+        def resultado(estacao: EstacaoHidro) -> CriterioOutput:
+            estacao_href = seleciona_estacao_href(estacoes_href, estacao.codigo)
+            return estacao_href.cobacia in cobacias_navegaveis
+
+        return {
+            estacao.codigo: calcula_isolado(estacao, resultado) for estacao in estacoes
+        }
 
 
-class CalculoDoCriterioLocalizacaoSemiarido(CalculoDoCriterio):
+class CalculoDoCriterioLocalizacaoSemiarido(CalculoDoCriterioComCamadaLocal):
+    bancos_de_dados = ("cplar",)
+    tabelas_de_origem = ("Estacao", "semiarido")
+
     def calcular(self, estacao: EstacaoHidro) -> CriterioOutput:
         if estacao.latitude is None or estacao.longitude is None:
             raise ValueError("Coordenadas da estação não informadas")
         cplar_reader = create_cpalar_reader()
+        if self.usa_cache_local:
+            return cplar_reader.mapeia_estacoes_no_semiarido(
+                [(estacao.codigo, estacao.longitude, estacao.latitude)],
+                usa_cache_local=True,
+            )[estacao.codigo]
         return cplar_reader.esta_no_semiarido(
             latitude=estacao.latitude, longitude=estacao.longitude
         )
-        # geometria_semiarido = cplar_reader.retorna_geometria_semiarido()
-        # ponto_estacao = gpd.points_from_xy([estacao.longitude], [estacao.latitude])[0]
-        # return bool(geometria_semiarido.contains(ponto_estacao).any())
+
+    def calcular_lote(
+        self, estacoes: Sequence[EstacaoHidro]
+    ) -> dict[int, CriterioOutput]:
+        estacoes_com_coordenadas = [
+            estacao
+            for estacao in estacoes
+            if estacao.latitude is not None and estacao.longitude is not None
+        ]
+        cplar_reader = create_cpalar_reader()
+        no_semiarido = cplar_reader.mapeia_estacoes_no_semiarido(
+            [
+                (estacao.codigo, estacao.longitude, estacao.latitude)
+                for estacao in estacoes_com_coordenadas
+            ],
+            usa_cache_local=self.usa_cache_local,
+        )
+
+        def resultado(estacao: EstacaoHidro) -> CriterioOutput:
+            if estacao.latitude is None or estacao.longitude is None:
+                raise ValueError("Coordenadas da estação não informadas")
+            return no_semiarido[estacao.codigo]
+
+        return {
+            estacao.codigo: calcula_isolado(estacao, resultado) for estacao in estacoes
+        }
 
 
 class CalculoDoCriterioProximidadeObjetivosRHNR(CalculoDoCriterio):
+    bancos_de_dados = ("cplar",)
+    tabelas_de_origem = ("rhnr",)
+
     def calcular(self, estacao: EstacaoHidro) -> CriterioOutput:
         cplar_reader = create_cpalar_reader()
         objetivos = cplar_reader.retorna_objetivos_rhnr(estacao.codigo)
+        return self.formata_objetivos(objetivos)
+
+    def calcular_lote(
+        self, estacoes: Sequence[EstacaoHidro]
+    ) -> dict[int, CriterioOutput]:
+        cplar_reader = create_cpalar_reader()
+        objetivos = cplar_reader.retorna_objetivos_rhnr_lote(
+            [estacao.codigo for estacao in estacoes]
+        )
+        return {
+            estacao.codigo: self.formata_objetivos(objetivos[estacao.codigo])
+            for estacao in estacoes
+        }
+
+    def formata_objetivos(
+        self, objetivos: Sequence[EstacaoComObjetivos]
+    ) -> CriterioOutput:
         if not objetivos:
             return "Nenhum objetivo"
 
@@ -193,23 +634,12 @@ class CalculoDoCriterioProximidadeObjetivosRHNR(CalculoDoCriterio):
 
 
 class CalculoDoCriterioProximidadeEstacaoRHNR(CalculoDoCriterio):
+    bancos_de_dados = ("cplar",)
+    tabelas_de_origem = ("Estacao", "hidrorref", "rhnr")
+
     def calcular(self, estacao: EstacaoHidro, **kwargs) -> CriterioOutput:
         cplar_reader = create_cpalar_reader()
-
-        if "cenario" not in kwargs:
-            raise ValueError(
-                "Cenário não informado para o cálculo de proximidade à RHNR"
-            )
-        cenario = kwargs["cenario"]
-
-        if cenario == "Cenário 1":
-            estacoes_rhnr = cplar_reader.retorna_estacoes_rhnr_cenario1()
-        elif cenario == "Cenário 2":
-            estacoes_rhnr = cplar_reader.retorna_estacoes_rhnr_cenario2()
-        else:
-            raise ValueError(
-                f"Cenário inválido: {cenario} - Cenário deve ser 'Cenário 1' ou 'Cenário 2'"
-            )
+        estacoes_rhnr = self.retorna_estacoes_rhnr(**kwargs)
 
         estacao_href = cplar_reader.retorna_estacao_hidrorreferenciada(
             classe_href=EstacaoHidroRefBHAE, codigo_estacao=estacao.codigo
@@ -231,13 +661,78 @@ class CalculoDoCriterioProximidadeEstacaoRHNR(CalculoDoCriterio):
             no_mesmo_rio=True,
         )
         estacoes_no_rio = list(estacoes_montante) + list(estacoes_jusante)
+        return self.calcula_proximidade(
+            estacao, estacoes_no_rio, {est.codigo for est in estacoes_rhnr}
+        )
+
+    def calcular_lote(
+        self, estacoes: Sequence[EstacaoHidro], **kwargs
+    ) -> dict[int, CriterioOutput]:
+        cplar_reader = create_cpalar_reader()
+        codigos_estacoes_rhnr = {
+            est.codigo for est in self.retorna_estacoes_rhnr(**kwargs)
+        }
+
+        estacoes_href = cplar_reader.retorna_estacoes_hidrorreferenciadas(
+            classe_href=EstacaoHidroRefBHAE,
+            codigos=[estacao.codigo for estacao in estacoes],
+        )
+        cobacias = [href.cobacia for href in estacoes_href.values()]
+        estacoes_montante = (
+            cplar_reader.retorna_estacoes_hidrorreferenciadas_de_montante_lote(
+                classe_href=EstacaoHidroRefBHAE, cobacias=cobacias, no_mesmo_rio=True
+            )
+        )
+        estacoes_jusante = (
+            cplar_reader.retorna_estacoes_hidrorreferenciadas_de_jusante_lote(
+                classe_href=EstacaoHidroRefBHAE, cobacias=cobacias, no_mesmo_rio=True
+            )
+        )
+
+        def resultado(estacao: EstacaoHidro) -> CriterioOutput:
+            estacao_href = seleciona_estacao_href(estacoes_href, estacao.codigo)
+            if estacao.area_drenagem_km2 is None:
+                return None
+            estacoes_no_rio = (
+                estacoes_montante[estacao_href.cobacia]
+                + estacoes_jusante[estacao_href.cobacia]
+            )
+            return self.calcula_proximidade(
+                estacao, estacoes_no_rio, codigos_estacoes_rhnr
+            )
+
+        return {
+            estacao.codigo: calcula_isolado(estacao, resultado) for estacao in estacoes
+        }
+
+    def retorna_estacoes_rhnr(self, **kwargs):
+        cplar_reader = create_cpalar_reader()
+
+        if "cenario" not in kwargs:
+            raise ValueError(
+                "Cenário não informado para o cálculo de proximidade à RHNR"
+            )
+        cenario = kwargs["cenario"]
+
+        if cenario == "Cenário 1":
+            return cplar_reader.retorna_estacoes_rhnr_cenario1()
+        if cenario == "Cenário 2":
+            return cplar_reader.retorna_estacoes_rhnr_cenario2()
+        raise ValueError(
+            f"Cenário inválido: {cenario} - Cenário deve ser 'Cenário 1' ou 'Cenário 2'"
+        )
 
+    def calcula_proximidade(
+        self,
+        estacao: EstacaoHidro,
+        estacoes_no_rio: Sequence[EstacaoHidroRefBHAE],
+        codigos_estacoes_rhnr: set[int],
+    ) -> float | None:
         if not estacoes_no_rio:
             return None
 
-        codigos_estacoes_rhnr = {est.codigo for est in estacoes_rhnr}
         estacoes_selecionadas = [
-            100 * abs(1 - (est.area_drenagem / estacao.area_drenagem_km2))
+            100 * abs(1 - (est.area_drenagem / cast(float, estacao.area_drenagem_km2)))
             for est in estacoes_no_rio
             if est.codigo in codigos_estacoes_rhnr and est.area_drenagem is not None
         ]
@@ -246,20 +741,43 @@ class CalculoDoCriterioProximidadeEstacaoRHNR(CalculoDoCriterio):
 
 
 class CalculoDoCriterioProximidadeEstacaoRHNRCenario1(CalculoDoCriterio):
+    bancos_de_dados = ("cplar",)
+    tabelas_de_origem = ("Estacao", "hidrorref", "rhnr")
+
     def calcular(self, estacao: EstacaoHidro) -> CriterioOutput:
         return CalculoDoCriterioProximidadeEstacaoRHNR().calcular(
             estacao, cenario="Cenário 1"
         )
 
+    def calcular_lote(
+        self, estacoes: Sequence[EstacaoHidro]
+    ) -> dict[int, CriterioOutput]:
+        return CalculoDoCriterioProximidadeEstacaoRHNR().calcular_lote(
+            estacoes, cenario="Cenário 1"
+        )
+
 
 class CalculoDoCriterioProximidadeEstacaoRHNRCenario2(CalculoDoCriterio):
+    bancos_de_dados = ("cplar",)
+    tabelas_de_origem = ("Estacao", "hidrorref", "rhnr")
+
     def calcular(self, estacao: EstacaoHidro) -> CriterioOutput:
         return CalculoDoCriterioProximidadeEstacaoRHNR().calcular(
             estacao, cenario="Cenário 2"
         )
 
+    def calcular_lote(
+        self, estacoes: Sequence[EstacaoHidro]
+    ) -> dict[int, CriterioOutput]:
+        return CalculoDoCriterioProximidadeEstacaoRHNR().calcular_lote(
+            estacoes, cenario="Cenário 2"
+        )
+
 
 class CalculoDoCriterioProximidadeEstacaoSetorEletrico(CalculoDoCriterio):
+    bancos_de_dados = ("cplar", "hidro")
+    tabelas_de_origem = ("Estacao", "hidrorref")
+
     def calcular(self, estacao: EstacaoHidro) -> float | None:
         cplar_reader = create_cpalar_reader()
         hidro_reader = create_hidro_reader()
@@ -289,7 +807,69 @@ class CalculoDoCriterioProximidadeEstacaoSetorEletrico(CalculoDoCriterio):
         estacoes_hidro = hidro_reader.retorna_estacoes_por_codigo(
             codigos=list(estacoes_no_rio.keys())
         )
+        return self.calcula_proximidade(estacao, estacoes_no_rio, estacoes_hidro)
+
+    def calcular_lote(
+        self, estacoes: Sequence[EstacaoHidro]
+    ) -> dict[int, CriterioOutput]:
+        cplar_reader = create_cpalar_reader()
+        hidro_reader = create_hidro_reader()
+
+        estacoes_href = cplar_reader.retorna_estacoes_hidrorreferenciadas(
+            classe_href=EstacaoHidroRefBHAE,
+            codigos=[estacao.codigo for estacao in estacoes],
+        )
+        cobacias = [href.cobacia for href in estacoes_href.values()]
+        estacoes_montante = (
+            cplar_reader.retorna_estacoes_hidrorreferenciadas_de_montante_lote(
+                classe_href=EstacaoHidroRefBHAE, cobacias=cobacias
+            )
+        )
+        estacoes_jusante = (
+            cplar_reader.retorna_estacoes_hidrorreferenciadas_de_jusante_lote(
+                classe_href=EstacaoHidroRefBHAE, cobacias=cobacias
+            )
+        )
 
+        codigos_no_rio = {
+            est.codigo
+            for cobacia in cobacias
+            for est in estacoes_montante[cobacia] + estacoes_jusante[cobacia]
+        }
+        estacoes_hidro_por_codigo: dict[int, list[Estacao]] = defaultdict(list)
+        for est in hidro_reader.retorna_estacoes_por_codigo(
+            codigos=sorted(codigos_no_rio)
+        ):
+            estacoes_hidro_por_codigo[est.Codigo].append(est)
+
+        def resultado(estacao: EstacaoHidro) -> CriterioOutput:
+            estacao_href = seleciona_estacao_href(estacoes_href, estacao.codigo)
+            if estacao.area_drenagem_km2 is None:
+                return None
+
+            estacoes_no_rio = {
+                est.codigo: est.nuareamont
+                for est in estacoes_montante[estacao_href.cobacia]
+                + estacoes_jusante[estacao_href.cobacia]
+                if est.codigo != estacao.codigo
+            }
+            estacoes_hidro = [
+                est
+                for codigo in estacoes_no_rio
+                for est in estacoes_hidro_por_codigo[codigo]
+            ]
+            return self.calcula_proximidade(estacao, estacoes_no_rio, estacoes_hidro)
+
+        return {
+            estacao.codigo: calcula_isolado(estacao, resultado) for estacao in estacoes
+        }
+
+    def calcula_proximidade(
+        self,
+        estacao: EstacaoHidro,
+        estacoes_no_rio: dict[int, float],
+        estacoes_hidro: Sequence[Estacao],
+    ) -> float | None:
         estacoes_hidro_energia = [
             est
             for est in estacoes_hidro
@@ -308,7 +888,9 @@ class CalculoDoCriterioProximidadeEstacaoSetorEletrico(CalculoDoCriterio):
             else:
                 area_drenagem = est.AreaDrenagem
 
-            proporcao_area = 100 * abs(1 - (area_drenagem / estacao.area_drenagem_km2))
+            proporcao_area = 100 * abs(
+                1 - (area_drenagem / cast(float, estacao.area_drenagem_km2))
+            )
             proporcao_area_estacoes_setor_eletrico.append(proporcao_area)
 
         return (
@@ -319,91 +901,232 @@ class CalculoDoCriterioProximidadeEstacaoSetorEletrico(CalculoDoCriterio):
 
 
 class CalculoDoCriterioExtensaoDaSerie(CalculoDoCriterio):
+    bancos_de_dados = ("hidro",)
+    uso_intensivo_cpu = True
+    tabelas_de_origem = ("PivotCota",)
+    conjuntos_de_dados = ("dias_com_cota_por_ano",)
+
     def calcular(self, estacao: EstacaoHidro, **kwargs) -> CriterioOutput:
-        hidro_reader = create_hidro_reader()
-        serie_historica = hidro_reader.retorna_serie_historica_cota(estacao.codigo)
+        serie_historica = create_contexto_dados().obtem("serie_cota", [estacao.codigo])[
+            estacao.codigo
+        ]
         percentual_falhas = kwargs.get("percentual_falhas")
-        limiar_falhas = percentual_falhas / 100 if percentual_falhas else 0.1
 
-        if not serie_historica:
+        if serie_historica.empty:
             print(
                 f"Nenhum dado da série histórica disponível para a estação {estacao.codigo}"
             )
             return 0
 
-        df_serie = pivot_cota_to_dataframe(serie_historica)
-        anos_disponiveis = df_serie.index.year.value_counts()  # type: ignore
-        anos_completos = []
-        ano_inicial = anos_disponiveis.index.min()
-        ano_final = anos_disponiveis.index.max()
-        for ano in range(ano_inicial, ano_final + 1):
-            total_dias_no_ano = 366 if calendar.isleap(ano) else 365
-            total_dias_disponiveis = anos_disponiveis.get(ano, 0)
-            if (1 - (total_dias_disponiveis / total_dias_no_ano)) <= limiar_falhas:
-                anos_completos.append(ano)
+        df_serie = limpa_serie_cota(serie_historica)
+        dias_por_ano = conta_dias_por_ano(
+            np.full(len(df_serie), estacao.codigo), df_serie.index.to_numpy()
+        )
+        return self.conta_anos_completos(
+            calcula_completude_anual(dias_por_ano, percentual_falhas)
+        )
 
-        return len(anos_completos)
+    def calcular_lote(
+        self, estacoes: Sequence[EstacaoHidro], **kwargs
+    ) -> dict[int, CriterioOutput]:
+        tabelas_completude = self.retorna_tabelas_completude(
+            [estacao.codigo for estacao in estacoes], kwargs.get("percentual_falhas")
+        )
+
+        def resultado(estacao: EstacaoHidro) -> CriterioOutput:
+            if estacao.codigo not in tabelas_completude:
+                print(
+                    f"Nenhum dado da série histórica disponível para a estação {estacao.codigo}"
+                )
+                return 0
+            return self.conta_anos_completos(tabelas_completude[estacao.codigo])
+
+        return {
+            estacao.codigo: calcula_isolado(estacao, resultado) for estacao in estacoes
+        }
+
+    def retorna_tabelas_completude(
+        self, codigos: Sequence[int], percentual_falhas: float | None = None
+    ) -> dict[int, pd.DataFrame]:
+        """
+        Tabela de completude anual (ver calcula_completude_anual) de cada
+        estação com registros de cota; estações cujos registros não possuem
+        cota recebem uma tabela vazia.
+        """
+        dias_por_ano = create_contexto_dados().obtem("dias_com_cota_por_ano", codigos)
+        completude = calcula_completude_anual(
+            pd.DataFrame(
+                [
+                    (codigo, ano, dias)
+                    for codigo, dias_da_estacao in dias_por_ano.items()
+                    for ano, dias in dias_da_estacao.items()
+                ],
+                columns=["codigo", "ano", "dias"],
+            ),
+            percentual_falhas,
+        )
+        tabelas = {
+            int(codigo): tabela.reset_index(drop=True)
+            for codigo, tabela in completude.groupby("codigo", sort=False)
+        }
+        return {
+            codigo: tabelas.get(codigo, completude.iloc[0:0]) for codigo in dias_por_ano
+        }
+
+    def conta_anos_completos(self, completude: pd.DataFrame) -> int:
+        if completude.empty:
+            raise ValueError("Série histórica sem dados de cota")
+        return int(completude["completo"].sum())
 
 
 class CalculoDoCriterioDescargaLiquida(CalculoDoCriterio):
+    bancos_de_dados = ("hidro",)
+    tabelas_de_origem = ("ResumoDescarga",)
+
     def calcular(self, estacao: EstacaoHidro) -> CriterioOutput:
-        hidro_reader = create_hidro_reader()
-        resumo_de_descarga = hidro_reader.retorna_resumo_de_descarga(
-            codigo=estacao.codigo
+        resumos_de_descarga = create_contexto_dados().obtem(
+            "resumo_descarga", [estacao.codigo]
+        )
+        return estacao.codigo in resumos_de_descarga
+
+    def calcular_lote(
+        self, estacoes: Sequence[EstacaoHidro]
+    ) -> dict[int, CriterioOutput]:
+        contagem = create_contexto_dados().obtem(
+            "contagem_descargas", [estacao.codigo for estacao in estacoes]
         )
-        return True if resumo_de_descarga else False
+        return {estacao.codigo: estacao.codigo in contagem for estacao in estacoes}
 
 
 class CalculoDoCriterioTelemetrica(CalculoDoCriterio):
+    tabelas_de_origem = ("Estacao",)
+
     def calcular(self, estacao: EstacaoHidro) -> CriterioOutput:
         return estacao.estacao_telemetrica
 
 
 class CalculoDoCriterioDesvioCurvaChave(CalculoDoCriterio):
+    bancos_de_dados = ("hidro",)
+    uso_intensivo_cpu = True
+    tabelas_de_origem = ("ResumoDescarga", "CurvaDescarga")
+    conjuntos_de_dados = ("resumo_descarga", "curva_descarga")
+
     def calcular(self, estacao: EstacaoHidro) -> CriterioOutput:
-        hidro_reader = create_hidro_reader()
-        resumo_de_descarga = hidro_reader.retorna_resumo_de_descarga(
-            codigo=estacao.codigo
-        )
-        curva_de_descarga = hidro_reader.retorna_curva_de_descarga(estacao.codigo)
+        return self.prepara_desvios([estacao.codigo])(estacao)
+
+    def calcular_lote(
+        self, estacoes: Sequence[EstacaoHidro]
+    ) -> dict[int, CriterioOutput]:
+        resultado = self.prepara_desvios([estacao.codigo for estacao in estacoes])
+        return {
+            estacao.codigo: calcula_isolado(estacao, resultado) for estacao in estacoes
+        }
 
-        if not resumo_de_descarga:
+    def prepara_desvios(
+        self, codigos: Sequence[int]
+    ) -> Callable[[EstacaoHidro], CriterioOutput]:
+        contexto = create_contexto_dados()
+        resumos_de_descarga = contexto.obtem("resumo_descarga", codigos)
+        curvas_de_descarga = contexto.obtem("curva_descarga", codigos)
+
+        # Desvio de todas as estações com medições e curvas em uma única passagem
+        codigos_com_dados = [
+            codigo
+            for codigo in codigos
+            if codigo in resumos_de_descarga and codigo in curvas_de_descarga
+        ]
+        if codigos_com_dados:
+            desvios = calcula_desvios_medios_curva_chave(
+                pd.concat(
+                    [resumos_de_descarga[codigo] for codigo in codigos_com_dados]
+                ),
+                pd.concat([curvas_de_descarga[codigo] for codigo in codigos_com_dados]),
+            )
+        else:
+            desvios = pd.DataFrame(columns=["desvio_medio", "erro"])
+
+        def resultado(estacao: EstacaoHidro) -> CriterioOutput:
+            if not self.possui_dados(
+                estacao,
+                estacao.codigo in resumos_de_descarga,
+                estacao.codigo in curvas_de_descarga,
+            ):
+                return None
+            desvio = desvios.loc[estacao.codigo]
+            if desvio["erro"] is not None:
+                raise ValueError(desvio["erro"])
+            return float(desvio["desvio_medio"])
+
+        return resultado
+
+    @staticmethod
+    def possui_dados(
+        estacao: EstacaoHidro, possui_resumo: bool, possui_curva: bool
+    ) -> bool:
+        if not possui_resumo:
             print(
                 f"Nenhum medição de descarga disponível para a estação {estacao.codigo}"
             )
             print("Não é possível calcular o desvio da curva chave -> Retornando nulo")
-            return None
+            return False
 
-        if not curva_de_descarga:
+        if not possui_curva:
             print(
                 f"Nenhuma curva de descarga disponível para a estação {estacao.codigo}"
             )
             print("Não é possível calcular o desvio da curva chave -> Retornando nulo")
-            return None
+            return False
 
-        return calcula_desvio_medio_curva_chave(resumo_de_descarga, curva_de_descarga)
+        return True
 
 
 class CalculoDoCriterioTotalDeDescargasLiquidas(CalculoDoCriterio):
+    bancos_de_dados = ("hidro",)
+    tabelas_de_origem = ("ResumoDescarga",)
+
     def calcular(self, estacao: EstacaoHidro) -> CriterioOutput:
-        hidro_reader = create_hidro_reader()
-        resumo_de_descarga = hidro_reader.retorna_resumo_de_descarga(
-            codigo=estacao.codigo
+        resumos_de_descarga = create_contexto_dados().obtem(
+            "resumo_descarga", [estacao.codigo]
         )
-        estats = retorna_estatisticas_descarga_liquida(
-            resumo_de_descarga, ano_referencia=2024
+        if estacao.codigo not in resumos_de_descarga:
+            raise ValueError(
+                "Nenhum resumo de descarga encontrado para o código fornecido"
+            )
+        return len(resumos_de_descarga[estacao.codigo])
+
+    def calcular_lote(
+        self, estacoes: Sequence[EstacaoHidro]
+    ) -> dict[int, CriterioOutput]:
+        contagem = create_contexto_dados().obtem(
+            "contagem_descargas", [estacao.codigo for estacao in estacoes]
         )
-        return estats[0]
+
+        def resultado(estacao: EstacaoHidro) -> CriterioOutput:
+            if estacao.codigo not in contagem:
+                raise ValueError(
+                    "Nenhum resumo de descarga encontrado para o código fornecido"
+                )
+            total_medicoes, _ = contagem[estacao.codigo]
+            return total_medicoes
+
+        return {
+            estacao.codigo: calcula_isolado(estacao, resultado) for estacao in estacoes
+        }
 
 
 class CalculoDoCriterioDescargaLiquidaAnual(CalculoDoCriterio):
+    bancos_de_dados = ("hidro",)
+    uso_intensivo_cpu = True
+    tabelas_de_origem = ("ResumoDescarga", "PivotCota")
+    conjuntos_de_dados = ("contagem_descargas", "data_inicial_cota")
+
     def calcular(self, estacao: EstacaoHidro) -> CriterioOutput:
-        hidro_reader = create_hidro_reader()
-        resumo_de_descarga = hidro_reader.retorna_resumo_de_descarga(
-            codigo=estacao.codigo
+        contexto = create_contexto_dados()
+        resumo_de_descarga = contexto.obtem("resumo_descarga", [estacao.codigo]).get(
+            estacao.codigo
         )
 
-        if not resumo_de_descarga:
+        if resumo_de_descarga is None:
             print(
                 f"Nenhuma medição de descarga disponível para a estação {estacao.codigo}"
             )
@@ -412,8 +1135,8 @@ class CalculoDoCriterioDescargaLiquidaAnual(CalculoDoCriterio):
             )
             return 0.0
 
-        serie_historica = hidro_reader.retorna_serie_historica_cota(estacao.codigo)
-        if not serie_historica:
+        serie_historica = contexto.obtem("serie_cota", [estacao.codigo])[estacao.codigo]
+        if serie_historica.empty:
             print(
                 f"Não existem dados de cota consistidas para a estação {estacao.codigo}"
             )
@@ -422,17 +1145,52 @@ class CalculoDoCriterioDescargaLiquidaAnual(CalculoDoCriterio):
             )
             return 0.0
 
-        data_inicial = serie_historica[0].Data
-        if data_inicial.month <= 2:
-            ano_inicial = data_inicial.year
-        else:
-            ano_inicial = data_inicial.year + 1
-
-        estats = retorna_estatisticas_descarga_liquida(
-            resumo_descarga=[
-                resumo for resumo in resumo_de_descarga if resumo.data.year <= 2024
-            ],
-            ano_referencia=2024,
-            ano_inicial=ano_inicial,
+        anos_das_medicoes = pd.to_datetime(resumo_de_descarga["data"]).dt.year
+        return calcula_medicoes_por_ano(
+            total_medicoes=int((anos_das_medicoes <= ANO_REFERENCIA_DESCARGAS).sum()),
+            ano_referencia=ANO_REFERENCIA_DESCARGAS,
+            ano_inicial=self.retorna_ano_inicial(serie_historica.index[0]),
         )
-        return estats[1]
+
+    def calcular_lote(
+        self, estacoes: Sequence[EstacaoHidro]
+    ) -> dict[int, CriterioOutput]:
+        contexto = create_contexto_dados()
+        codigos = [estacao.codigo for estacao in estacoes]
+        contagem = contexto.obtem("contagem_descargas", codigos)
+        datas_iniciais = contexto.obtem("data_inicial_cota", codigos)
+
+        def resultado(estacao: EstacaoHidro) -> CriterioOutput:
+            if estacao.codigo not in contagem:
+                print(
+                    f"Nenhuma medição de descarga disponível para a estação {estacao.codigo}"
+                )
+                print(
+                    "Não é possível calcular a média anual do número de descargas líquidas -> Retornando 0.0!"
+                )
+                return 0.0
+
+            if estacao.codigo not in datas_iniciais:
+                print(
+                    f"Não existem dados de cota consistidas para a estação {estacao.codigo}"
+                )
+                print(
+                    "Não é possível calcular a média anual do número de descargas líquidas -> Retornando 0.0!"
+                )
+                return 0.0
+
+            _, total_ate_referencia = contagem[estacao.codigo]
+            return calcula_medicoes_por_ano(
+                total_medicoes=total_ate_referencia,
+                ano_referencia=ANO_REFERENCIA_DESCARGAS,
+                ano_inicial=self.retorna_ano_inicial(datas_iniciais[estacao.codigo]),
+            )
+
+        return {
+            estacao.codigo: calcula_isolado(estacao, resultado) for estacao in estacoes
+        }
+
+    def retorna_ano_inicial(self, data_inicial) -> int:
+        if data_inicial.month <= 2:
+            return data_inicial.year
+        return data_inicial.year + 1
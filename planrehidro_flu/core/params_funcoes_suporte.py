@@ -1,11 +1,15 @@
 import warnings
-from typing import Callable, Sequence
+from typing import Callable, Mapping, Sequence
 
 import numpy as np
 import pandas as pd
 
 from planrehidro_flu.core.models import CurvaDeDescarga, ResumoDeDescarga
-from planrehidro_flu.databases.hidro.models import PivotCota, PivotVazao
+from planrehidro_flu.databases.cplar.models import (
+    EstacaoHidroRefBHAE,
+    EstacaoHidroRefBHO2013,
+)
+from planrehidro_flu.databases.hidro.models import PivotVazao
 
 
 def pivot_vazao_to_dataframe(serie_vazao: Sequence[PivotVazao]) -> pd.DataFrame:
@@ -30,20 +34,14 @@ def pivot_vazao_to_dataframe(serie_vazao: Sequence[PivotVazao]) -> pd.DataFrame:
     return df_serie
 
 
-def pivot_cota_to_dataframe(serie_vazao: Sequence[PivotCota]) -> pd.DataFrame:
-    dataframe = pd.DataFrame(
-        [
-            {
-                "data": row.Data,
-                "cota": row.Cota,
-                "nivel_consistencia": row.NivelConsistencia,
-            }
-            for row in serie_vazao
-        ]
-    )
-    dataframe["data"] = pd.to_datetime(dataframe["data"])
+def limpa_serie_cota(serie_cota: pd.DataFrame) -> pd.DataFrame:
+    """
+    Remove as falhas da série de cotas (indexada por data) e mantém um único
+    registro por data, o de maior nível de consistência.
+    """
     df_serie = (
-        dataframe.dropna()
+        serie_cota.dropna()
+        .reset_index()
         .sort_values(["data", "nivel_consistencia"])
         .drop_duplicates(subset=["data"], keep="last")
         .set_index("data")
@@ -52,16 +50,90 @@ def pivot_cota_to_dataframe(serie_vazao: Sequence[PivotCota]) -> pd.DataFrame:
     return df_serie
 
 
-def retorna_estatisticas_descarga_liquida(
-    resumo_descarga: list[ResumoDeDescarga], ano_referencia: int, ano_inicial: int
-) -> tuple[float, float]:
-    if not resumo_descarga:
-        raise ValueError("Nenhum resumo de descarga encontrado para o código fornecido")
+def conta_dias_por_ano(codigos: np.ndarray, datas: np.ndarray) -> pd.DataFrame:
+    """
+    Conta os dias distintos com dado em cada ano, para séries de várias
+    estações empilhadas (um código e uma data por registro, já sem falhas).
+    Retorna um DataFrame com as colunas "codigo", "ano" e "dias".
+    """
+    dias = np.asarray(datas, dtype="datetime64[D]")
+    registros = np.unique(
+        np.stack([np.asarray(codigos, dtype=np.int64), dias.astype(np.int64)], axis=1),
+        axis=0,
+    )
+    anos = (
+        registros[:, 1].astype("datetime64[D]").astype("datetime64[Y]").astype(np.int64)
+        + 1970
+    )
+    chaves, contagem = np.unique(
+        np.stack([registros[:, 0], anos], axis=1), axis=0, return_counts=True
+    )
+    return pd.DataFrame({"codigo": chaves[:, 0], "ano": chaves[:, 1], "dias": contagem})
+
+
+def calcula_completude_anual(
+    dias_por_ano: pd.DataFrame, percentual_falhas: float | None = None
+) -> pd.DataFrame:
+    """
+    Tabela de completude anual de várias estações a partir dos dias com dado
+    por ano (colunas "codigo", "ano" e "dias"). Cada estação recebe todos os
+    anos entre o primeiro e o último com dados, inclusive os anos sem registro.
+
+    Colunas do resultado: "codigo", "ano", "dias", "dias_no_ano", "falhas"
+    (fração de dias sem dado) e "completo" (falhas dentro do limiar; 10% quando
+    percentual_falhas não é informado).
+    """
+    com_dados = dias_por_ano[dias_por_ano["dias"] > 0]
+    codigos = com_dados["codigo"].to_numpy(dtype=np.int64)
+    anos = com_dados["ano"].to_numpy(dtype=np.int64)
+
+    estacoes, posicoes = np.unique(codigos, return_inverse=True)
+    ano_inicial = np.full(len(estacoes), np.iinfo(np.int64).max)
+    ano_final = np.full(len(estacoes), np.iinfo(np.int64).min)
+    np.minimum.at(ano_inicial, posicoes, anos)
+    np.maximum.at(ano_final, posicoes, anos)
+
+    # Uma linha por (estação, ano) entre o primeiro e o último ano de cada estação
+    total_anos = ano_final - ano_inicial + 1
+    inicio_estacao = np.cumsum(total_anos) - total_anos
+    codigos_tabela = np.repeat(estacoes, total_anos)
+    anos_tabela = np.repeat(ano_inicial - inicio_estacao, total_anos) + np.arange(
+        total_anos.sum()
+    )
+
+    dias_tabela = np.zeros(len(anos_tabela), dtype=np.int64)
+    np.add.at(
+        dias_tabela,
+        inicio_estacao[posicoes] + anos - ano_inicial[posicoes],
+        com_dados["dias"].to_numpy(dtype=np.int64),
+    )
+
+    bissexto = (anos_tabela % 4 == 0) & (
+        (anos_tabela % 100 != 0) | (anos_tabela % 400 == 0)
+    )
+    dias_no_ano = np.where(bissexto, 366, 365)
+    falhas = 1 - (dias_tabela / dias_no_ano)
+    limiar_falhas = percentual_falhas / 100 if percentual_falhas else 0.1
+
+    return pd.DataFrame(
+        {
+            "codigo": codigos_tabela,
+            "ano": anos_tabela,
+            "dias": dias_tabela,
+            "dias_no_ano": dias_no_ano,
+            "falhas": falhas,
+            "completo": falhas <= limiar_falhas,
+        }
+    )
+
 
-    total_medicoes = len(resumo_descarga)
-    medicoes_por_ano = total_medicoes / (ano_referencia - ano_inicial + 1)
+def calcula_medicoes_por_ano(
+    total_medicoes: int, ano_referencia: int, ano_inicial: int
+) -> float:
+    if not total_medicoes:
+        raise ValueError("Nenhum resumo de descarga encontrado para o código fornecido")
 
-    return total_medicoes, medicoes_por_ano
+    return total_medicoes / (ano_referencia - ano_inicial + 1)
 
 
 def retorna_equacao_potencial_curva_chave(
@@ -75,6 +147,170 @@ def retorna_equacao_potencial_curva_chave(
     return equacao
 
 
+def _registros_para_dataframe(
+    registros: Sequence, colunas: Sequence[str]
+) -> pd.DataFrame:
+    return pd.DataFrame(
+        [[getattr(registro, coluna) for coluna in colunas] for registro in registros],
+        columns=list(colunas),
+    )
+
+
+def _datas_em_dias(datas: pd.Series) -> np.ndarray:
+    return pd.to_datetime(datas).to_numpy(dtype="datetime64[D]").astype(np.int64)
+
+
+def _seleciona_curvas_das_medicoes(
+    codigos_medicao: np.ndarray,
+    datas_medicao: np.ndarray,
+    cotas_medicao: np.ndarray,
+    curvas: pd.DataFrame,
+) -> np.ndarray:
+    """
+    Para cada medição, retorna a posição (em curvas) da primeira curva da
+    mesma estação válida na data e na faixa de cotas da medição, ou -1.
+    """
+    codigos_curva = curvas["codigo"].to_numpy(dtype=np.int64)
+    inicios = _datas_em_dias(curvas["data_validade_inicio"])
+    fins = _datas_em_dias(curvas["data_validade_fim"])
+    cotas_minimas = curvas["cota_minima"].to_numpy(dtype=float)
+    cotas_maximas = curvas["cota_maxima"].to_numpy(dtype=float)
+
+    if not len(codigos_medicao) or curvas.empty:
+        return np.full(len(codigos_medicao), -1)
+
+    # Curvas ordenadas por estação e início de validade (ordenação estável, de
+    # modo que curvas com o mesmo início mantêm a ordem original)
+    ordem = np.lexsort((inicios, codigos_curva))
+
+    # Chave única (estação, data): uma busca binária localiza, para todas as
+    # medições, a última curva da estação com início <= data da medição
+    dia_inicial = min(inicios.min(), datas_medicao.min())
+    escala = max(inicios.max(), datas_medicao.max()) - dia_inicial + 1
+    chaves_curva = codigos_curva[ordem] * escala + (inicios[ordem] - dia_inicial)
+    chaves_medicao = codigos_medicao * escala + (datas_medicao - dia_inicial)
+
+    primeiras = np.searchsorted(codigos_curva[ordem], codigos_medicao, side="left")
+    ultimas = np.searchsorted(chaves_curva, chaves_medicao, side="right")
+
+    # Um par (medição, curva candidata) por linha
+    quantidades = ultimas - primeiras
+    pares_medicao = np.repeat(np.arange(len(codigos_medicao)), quantidades)
+    deslocamentos = np.arange(len(pares_medicao)) - np.repeat(
+        np.cumsum(quantidades) - quantidades, quantidades
+    )
+    pares_curva = ordem[np.repeat(primeiras, quantidades) + deslocamentos]
+
+    validas = (
+        (fins[pares_curva] >= datas_medicao[pares_medicao])
+        & (cotas_minimas[pares_curva] <= cotas_medicao[pares_medicao])
+        & (cotas_medicao[pares_medicao] <= cotas_maximas[pares_curva])
+    )
+
+    # Entre as curvas válidas, a primeira na ordem original
+    curva_selecionada = np.full(len(codigos_medicao), len(curvas))
+    np.minimum.at(curva_selecionada, pares_medicao[validas], pares_curva[validas])
+    curva_selecionada[curva_selecionada == len(curvas)] = -1
+    return curva_selecionada
+
+
+def calcula_desvios_medios_curva_chave(
+    resumos_descarga: pd.DataFrame, curvas_descarga: pd.DataFrame
+) -> pd.DataFrame:
+    """
+    Desvio médio (%) entre as vazões medidas e as calculadas pela curva chave,
+    para várias estações de uma vez. Os DataFrames seguem as colunas de
+    ResumoDeDescarga e CurvaDeDescarga (como em
+    HidroDWReader.retorna_resumos_de_descarga).
+
+    Retorna um DataFrame indexado por código da estação com as colunas
+    "desvio_medio" e "erro" (mensagem quando a curva selecionada não possui os
+    coeficientes da equação potencial; nesse caso o desvio é nulo).
+    """
+    codigos = resumos_descarga["codigo"].to_numpy(dtype=np.int64)
+    datas = _datas_em_dias(resumos_descarga["data"])
+    cotas = resumos_descarga["cota"].to_numpy(dtype=float)
+    vazoes = resumos_descarga["vazao"].to_numpy(dtype=float)
+
+    medicoes_validas = ~np.isnan(vazoes) & (vazoes != 0.0)
+    for vazao in vazoes[~medicoes_validas]:
+        if np.isnan(vazao):
+            warnings.warn(
+                "Descarga no resumo de descarga encontrada sem dado de vazão!"
+            )
+        else:
+            warnings.warn(
+                "Descarga no resumo de descarga encontrada com vazão igual a zero!"
+            )
+
+    codigos, datas, cotas, vazoes = (
+        codigos[medicoes_validas],
+        datas[medicoes_validas],
+        cotas[medicoes_validas],
+        vazoes[medicoes_validas],
+    )
+
+    curvas = _seleciona_curvas_das_medicoes(codigos, datas, cotas, curvas_descarga)
+    for data, cota in zip(datas[curvas < 0], cotas[curvas < 0]):
+        print(
+            f"Nenhuma curva de descarga válida encontrada para a data {np.datetime64(int(data), 'D')} e cota {cota}"
+        )
+
+    com_curva = curvas >= 0
+    codigos, cotas, vazoes, curvas = (
+        codigos[com_curva],
+        cotas[com_curva],
+        vazoes[com_curva],
+        curvas[com_curva],
+    )
+
+    coef_a = curvas_descarga["coef_a"].to_numpy(dtype=float)[curvas]
+    coef_h0 = curvas_descarga["coef_h0"].to_numpy(dtype=float)[curvas]
+    coef_n = curvas_descarga["coef_n"].to_numpy(dtype=float)[curvas]
+
+    coeficientes_invalidos = np.isnan(coef_a) | np.isnan(coef_h0) | np.isnan(coef_n)
+    erros: dict[int, str] = {}
+    for codigo, a, h0, n in zip(
+        codigos[coeficientes_invalidos],
+        coef_a[coeficientes_invalidos],
+        coef_h0[coeficientes_invalidos],
+        coef_n[coeficientes_invalidos],
+    ):
+        erros.setdefault(
+            int(codigo),
+            f"Coeficientes inválidos para equação de curva chave: a={_coeficiente(a)}, H0={_coeficiente(h0)}, N={_coeficiente(n)}",
+        )
+
+    # Equação potencial Q = a * (h - h0) ^ n, com h em metros e Q = 0 para h <= h0
+    cotas_m = cotas / 100
+    with np.errstate(invalid="ignore"):
+        vazoes_calculadas = np.where(
+            cotas_m <= coef_h0,
+            0.0,
+            coef_a * np.power(np.maximum(cotas_m - coef_h0, 0.0), coef_n),
+        )
+    desvios = 100 * np.abs(vazoes - vazoes_calculadas) / vazoes
+
+    estacoes = np.unique(resumos_descarga["codigo"].to_numpy(dtype=np.int64))
+    posicoes = np.searchsorted(estacoes, codigos)
+    somas = np.bincount(posicoes, weights=desvios, minlength=len(estacoes))
+    quantidades = np.bincount(posicoes, minlength=len(estacoes))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        desvios_medios = somas / quantidades
+
+    resultado = pd.DataFrame(
+        {"desvio_medio": desvios_medios, "erro": None},
+        index=pd.Index(estacoes, name="codigo"),
+    )
+    for codigo, erro in erros.items():
+        resultado.loc[codigo, ["desvio_medio", "erro"]] = [np.nan, erro]
+    return resultado
+
+
+def _coeficiente(valor: float) -> float | None:
+    return None if np.isnan(valor) else float(valor)
+
+
 def calcula_desvio_medio_curva_chave(
     resumo_descarga: list[ResumoDeDescarga], curvas_descarga: list[CurvaDeDescarga]
 ) -> float:
@@ -84,44 +320,152 @@ def calcula_desvio_medio_curva_chave(
     if not curvas_descarga:
         raise ValueError("A lista com as curvas de descarga está vazia")
 
-    desvios: list[float] = []
-
-    for descarga in resumo_descarga:
-        if descarga.vazao is None:
-            warnings.warn("Descarga no resumo de descarga encontrada sem dado de vazão!")
-            continue
-        
-        if descarga.vazao == 0.0:
-            warnings.warn("Descarga no resumo de descarga encontrada com vazão igual a zero!")
-            continue
-
-        curva_descarga = [
-            curva
-            for curva in curvas_descarga
-            if curva.data_validade_inicio <= descarga.data <= curva.data_validade_fim
-            and curva.cota_minima <= descarga.cota <= curva.cota_maxima
-        ]
+    # Todas as medições e curvas são tratadas como de uma mesma estação
+    resumos = _registros_para_dataframe(resumo_descarga, ["data", "cota", "vazao"])
+    curvas = _registros_para_dataframe(
+        curvas_descarga,
+        [
+            "data_validade_inicio",
+            "data_validade_fim",
+            "cota_minima",
+            "cota_maxima",
+            "coef_a",
+            "coef_h0",
+            "coef_n",
+        ],
+    )
+    resumos["codigo"] = 0
+    curvas["codigo"] = 0
 
-        if not curva_descarga:
-            print(
-                f"Nenhuma curva de descarga válida encontrada para a data {descarga.data} e cota {descarga.cota}"
-            )
-            continue
+    resultado = calcula_desvios_medios_curva_chave(resumos, curvas).iloc[0]
+    if resultado["erro"] is not None:
+        raise ValueError(resultado["erro"])
+    return float(resultado["desvio_medio"])
 
-        curva_selecionada = curva_descarga[0]
-        coeficientes = [
-            curva_selecionada.coef_a,
-            curva_selecionada.coef_h0,
-            curva_selecionada.coef_n,
-        ]
 
-        if any([coef is None for coef in coeficientes]):
-            raise ValueError(
-                f"Coeficientes inválidos para equação de curva chave: a={curva_selecionada.coef_a}, H0={curva_selecionada.coef_h0}, N={curva_selecionada.coef_n}"
-            )
+def _cocursodags_de_jusante(cobacias: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Cocursodags de jusante das cobacias (prefixos terminados em dígito par),
+    como pares (posição da cobacia, prefixo), na ordem das cobacias.
+    """
+    largura = cobacias.dtype.itemsize // 4
+    caracteres = cobacias.view(np.uint32).reshape(len(cobacias), largura)
+    # ord("0") é par: a paridade do código do caractere é a do dígito
+    posicao, fim = np.nonzero((caracteres != 0) & (caracteres % 2 == 0))
+    # Caracteres após o fim do prefixo zerados; o NumPy descarta os nulos finais
+    prefixos = np.where(
+        np.arange(largura) <= fim[:, np.newaxis], caracteres[posicao], 0
+    ).astype(np.uint32)
+    return posicao, prefixos.view(f"<U{largura}").ravel()
+
+
+def seleciona_estacoes_extremas_de_montante_lote[
+    K,
+    T: (EstacaoHidroRefBHO2013, EstacaoHidroRefBHAE),
+](conjuntos: Mapping[K, Sequence[T]]) -> dict[K, list[T]]:
+    """
+    Para cada conjunto, retorna, na ordem original, as estações que não possuem
+    outra estação do conjunto a jusante (cocursodag de jusante e cobacia menor
+    ou igual) com área de drenagem maior.
+
+    Todos os conjuntos do lote são resolvidos de uma vez: as estações são
+    ordenadas por (conjunto, cocursodag, cobacia) e cada cocursodag de jusante
+    de cada estação é uma busca binária sobre o máximo acumulado das áreas.
+    Conjuntos com estação sem área de drenagem ficam de fora do resultado.
+    """
+    validos = {
+        chave: estacoes
+        for chave, estacoes in conjuntos.items()
+        if all(estacao.area_drenagem is not None for estacao in estacoes)
+    }
+    estacoes = [estacao for conjunto in validos.values() for estacao in conjunto]
+    if not estacoes:
+        return {chave: [] for chave in validos}
+
+    tamanhos = np.array([len(conjunto) for conjunto in validos.values()])
+    conjunto = np.repeat(np.arange(len(tamanhos), dtype=np.int64), tamanhos)
+    areas = np.array([estacao.area_drenagem for estacao in estacoes], dtype=float)
+    cobacias_unicas, cobacia = np.unique(
+        np.array([estacao.cobacia for estacao in estacoes]), return_inverse=True
+    )
+
+    # Cocursodags de jusante de cada cobacia distinta, repetidos por estação
+    posicao_prefixo, prefixos = _cocursodags_de_jusante(cobacias_unicas)
+    prefixos_por_cobacia = np.bincount(posicao_prefixo, minlength=len(cobacias_unicas))
+    inicio_prefixos = np.cumsum(prefixos_por_cobacia) - prefixos_por_cobacia
+    consultas_por_estacao = prefixos_por_cobacia[cobacia]
+    estacao_consulta = np.repeat(np.arange(len(estacoes)), consultas_por_estacao)
+    deslocamento = np.arange(len(estacao_consulta)) - np.repeat(
+        np.cumsum(consultas_por_estacao) - consultas_por_estacao, consultas_por_estacao
+    )
+    prefixo_consulta = inicio_prefixos[cobacia[estacao_consulta]] + deslocamento
+
+    # Códigos inteiros comuns aos cocursodags das estações e aos prefixos
+    textos, codigos = np.unique(
+        np.concatenate(
+            [np.array([estacao.cocursodag for estacao in estacoes]), prefixos]
+        ),
+        return_inverse=True,
+    )
+    cocursodag, prefixo = codigos[: len(estacoes)], codigos[len(estacoes) :]
+
+    grupos, grupo = np.unique(conjunto * len(textos) + cocursodag, return_inverse=True)
+    chave_consulta = (
+        conjunto[estacao_consulta] * len(textos) + prefixo[prefixo_consulta]
+    )
+    grupo_consulta = np.minimum(
+        np.searchsorted(grupos, chave_consulta), len(grupos) - 1
+    )
+    existe = grupos[grupo_consulta] == chave_consulta
+    estacao_consulta, grupo_consulta = estacao_consulta[existe], grupo_consulta[existe]
+
+    # Máximo acumulado das áreas por grupo, em ordem de cobacia: o grupo fica
+    # nos dígitos altos, de modo que um único maximum.accumulate não mistura
+    # grupos (um valor abaixo de grupo * len(areas_unicas) é de grupo anterior)
+    areas_unicas, area = np.unique(areas, return_inverse=True)
+    chave_estacao = grupo * len(cobacias_unicas) + cobacia
+    ordem = np.argsort(chave_estacao, kind="stable")
+    area_maxima_acumulada = np.maximum.accumulate(
+        grupo[ordem] * len(areas_unicas) + area[ordem]
+    )
+
+    posicoes = (
+        np.searchsorted(
+            chave_estacao[ordem],
+            grupo_consulta * len(cobacias_unicas) + cobacia[estacao_consulta],
+            side="right",
+        )
+        - 1
+    )
+    maxima = area_maxima_acumulada[np.maximum(posicoes, 0)] - (
+        grupo_consulta * len(areas_unicas)
+    )
+    com_jusante = (posicoes >= 0) & (maxima >= 0)
+    # A própria estação tem área igual, logo não é contada como jusante maior
+    com_jusante[com_jusante] = (
+        areas_unicas[maxima[com_jusante]] > areas[estacao_consulta[com_jusante]]
+    )
+    extremas = np.ones(len(estacoes), dtype=bool)
+    extremas[estacao_consulta[com_jusante]] = False
+
+    inicios = np.cumsum(tamanhos) - tamanhos
+    return {
+        chave: [
+            estacao
+            for estacao, extrema in zip(conjunto_estacoes, extremas[inicio:])
+            if extrema
+        ]
+        for (chave, conjunto_estacoes), inicio in zip(validos.items(), inicios)
+    }
 
-        equacao = retorna_equacao_potencial_curva_chave(*coeficientes)  # type: ignore
-        descarga_calculada = equacao(descarga.cota / 100)
-        desvios.append(100 * abs(descarga.vazao - descarga_calculada) / descarga.vazao)
 
-    return float(np.mean(desvios))
+def seleciona_estacoes_extremas_de_montante[
+    T: (EstacaoHidroRefBHO2013, EstacaoHidroRefBHAE)
+](estacoes: Sequence[T]) -> list[T]:
+    """
+    Estações extremas de um único conjunto (ver
+    seleciona_estacoes_extremas_de_montante_lote).
+    """
+    if any(estacao.area_drenagem is None for estacao in estacoes):
+        raise ValueError("Área de drenagem não informada em estação de montante")
+    return seleciona_estacoes_extremas_de_montante_lote({0: estacoes})[0]
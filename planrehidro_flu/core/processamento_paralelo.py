@@ -0,0 +1,447 @@
+import asyncio
+from collections import deque
+from concurrent.futures import (
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from contextlib import AsyncExitStack, ExitStack
+from dataclasses import dataclass, field
+from itertools import batched
+from threading import BoundedSemaphore
+from typing import Any, AsyncIterator, Iterable, Iterator, Sequence
+
+from planrehidro_flu.core.cache_criterios import create_cache_criterios
+from planrehidro_flu.core.models import EstacaoHidro
+from planrehidro_flu.core.parametros_calculo import (
+    FALHA_NO_CALCULO,
+    BancoDeDados,
+    CalculoDoCriterio,
+    CriterioOutput,
+    create_contexto_dados,
+    create_cpalar_reader,
+    create_cpalar_reader_async,
+    create_hidro_reader,
+)
+from planrehidro_flu.core.parametros_multicriterio import CriterioSelecionado
+from planrehidro_flu.databases.cplar.indice_topologico import (
+    caminho_indice_topologico,
+)
+from planrehidro_flu.databases.cplar.models import (
+    EstacaoHidroRefBHAE,
+    EstacaoHidroRefBHO2013,
+)
+from planrehidro_flu.databases.internal.serie_historica_local import ENGINE_SERIES
+from planrehidro_flu.databases.pool_conexoes import descarta_conexoes_herdadas
+
+type ResultadoLote = dict[int, CriterioOutput]
+
+
+@dataclass
+class ConfiguracaoProcessamento:
+    """
+    Configuração do processamento concorrente dos critérios.
+
+    O padrão (1 thread, sem processos) reproduz o processamento sequencial.
+    Com assincrono, os lotes são agendados por um laço asyncio que sobrepõe
+    as consultas aos dois bancos, limitadas por conexoes_por_banco.
+    """
+
+    threads: int = 1
+    processos: int = 0
+    conexoes_por_banco: dict[BancoDeDados, int] = field(
+        default_factory=lambda: {"cplar": 5, "hidro": 5}
+    )
+    tamanho_lote: int = 100
+    lotes_em_andamento: int = 2
+    # Estações gravadas por transação no banco interno
+    tamanho_lote_gravacao: int = 500
+    # Reaproveita valores de critérios que dependem só de dados de referência
+    usa_cache_resultados: bool = True
+    assincrono: bool = False
+
+
+def inicializa_processo() -> None:
+    # Cada processo de trabalho tem o seu próprio ContextoDeDados, sem acesso
+    # aos dados do principal: os conjuntos de que o critério precisa são
+    # carregados no principal e enviados com o lote (executa_calculo_lote_em_processo)
+    # Conexões SQLite herdadas do processo principal não podem ser reutilizadas
+    ENGINE_SERIES.dispose(close=False)
+    descarta_conexoes_herdadas()
+
+    # Os processos de trabalho usam o índice topológico salvo pela execução
+    # principal, sem consultar as estações hidrorreferenciadas no banco
+    cplar_reader = create_cpalar_reader()
+    for classe_href in (EstacaoHidroRefBHAE, EstacaoHidroRefBHO2013):
+        if caminho_indice_topologico(classe_href).exists():
+            cplar_reader.carrega_indice_topologico(classe_href)
+
+
+def executa_calculo_lote(
+    calculo: CalculoDoCriterio, estacoes: Sequence[EstacaoHidro]
+) -> ResultadoLote:
+    # Função de módulo para poder ser serializada no ProcessPoolExecutor
+    try:
+        return calculo.calcular_lote(estacoes)
+    except Exception as e:
+        # Falha na consulta do lote: recalcula estação a estação para isolar o erro
+        print(f"Erro ao processar o lote de {type(calculo).__name__}: {e}")
+        return CalculoDoCriterio.calcular_lote(calculo, estacoes)
+
+
+def executa_calculo_lote_em_processo(
+    calculo: CalculoDoCriterio,
+    estacoes: Sequence[EstacaoHidro],
+    dados: dict[str, dict[int, Any]],
+) -> ResultadoLote:
+    codigos = [estacao.codigo for estacao in estacoes]
+    contexto = create_contexto_dados()
+    for conjunto, valores in dados.items():
+        contexto.adiciona(conjunto, codigos, valores)
+    try:
+        return executa_calculo_lote(calculo, estacoes)
+    finally:
+        contexto.libera(codigos)
+
+
+def _dados_do_lote(
+    calculo: CalculoDoCriterio, estacoes: Sequence[EstacaoHidro]
+) -> dict[str, dict[int, Any]]:
+    # Lidos pelo ContextoDeDados do principal, compartilhado com os demais
+    # critérios do lote
+    codigos = [estacao.codigo for estacao in estacoes]
+    contexto = create_contexto_dados()
+    return {
+        conjunto: contexto.obtem(conjunto, codigos)
+        for conjunto in calculo.conjuntos_de_dados
+    }
+
+
+def _sessao_do_banco(banco: BancoDeDados):
+    reader = create_cpalar_reader() if banco == "cplar" else create_hidro_reader()
+    return reader.sessao()
+
+
+def _executa_com_sessoes(
+    calculo: CalculoDoCriterio, estacoes: Sequence[EstacaoHidro]
+) -> ResultadoLote:
+    with ExitStack() as stack:
+        # Uma sessão (e uma conexão do pool) por banco para todo o lote da thread
+        for banco in sorted(calculo.bancos_de_dados):
+            stack.enter_context(_sessao_do_banco(banco))
+        return executa_calculo_lote(calculo, estacoes)
+
+
+def _consulta_cache(
+    calculo: CalculoDoCriterio, estacoes: Sequence[EstacaoHidro]
+) -> tuple[ResultadoLote, Sequence[EstacaoHidro]]:
+    try:
+        return create_cache_criterios().consulta(calculo, estacoes)
+    except Exception as e:
+        print(f"Erro ao consultar o cache de {type(calculo).__name__}: {e}")
+        return {}, estacoes
+
+
+def _grava_cache(
+    calculo: CalculoDoCriterio,
+    estacoes: Sequence[EstacaoHidro],
+    resultado: ResultadoLote,
+) -> None:
+    try:
+        create_cache_criterios().grava(calculo, estacoes, resultado)
+    except Exception as e:
+        print(f"Erro ao gravar o cache de {type(calculo).__name__}: {e}")
+
+
+def _calcula_criterio_lote(
+    criterio: CriterioSelecionado,
+    estacoes: Sequence[EstacaoHidro],
+    semaforos: dict[BancoDeDados, BoundedSemaphore],
+    executor_processos: ProcessPoolExecutor | None,
+) -> ResultadoLote:
+    calculo = criterio["calculo"]
+    em_cache, pendentes = _consulta_cache(calculo, estacoes)
+    if not pendentes:
+        return em_cache
+    resultado = _calcula_criterio_lote_sem_cache(
+        calculo, pendentes, semaforos, executor_processos
+    )
+    _grava_cache(calculo, pendentes, resultado)
+    return em_cache | resultado
+
+
+def _calcula_criterio_lote_sem_cache(
+    calculo: CalculoDoCriterio,
+    estacoes: Sequence[EstacaoHidro],
+    semaforos: dict[BancoDeDados, BoundedSemaphore],
+    executor_processos: ProcessPoolExecutor | None,
+) -> ResultadoLote:
+    with ExitStack() as stack:
+        # Ordem fixa de aquisição para evitar deadlock entre critérios multi-banco
+        for banco in sorted(calculo.bancos_de_dados):
+            stack.enter_context(semaforos[banco])
+        if executor_processos is not None and calculo.uso_intensivo_cpu:
+            try:
+                dados = _dados_do_lote(calculo, estacoes)
+                return executor_processos.submit(
+                    executa_calculo_lote_em_processo, calculo, estacoes, dados
+                ).result()
+            except Exception as e:
+                print(f"Erro no processo de {type(calculo).__name__}: {e}")
+        return _executa_com_sessoes(calculo, estacoes)
+
+
+async def _calcula_criterio_lote_async(
+    criterio: CriterioSelecionado,
+    estacoes: Sequence[EstacaoHidro],
+    semaforos: dict[BancoDeDados, asyncio.Semaphore],
+    executor_threads: ThreadPoolExecutor,
+    executor_processos: ProcessPoolExecutor | None,
+) -> ResultadoLote:
+    calculo = criterio["calculo"]
+    loop = asyncio.get_running_loop()
+    em_cache, pendentes = await loop.run_in_executor(
+        executor_threads, _consulta_cache, calculo, estacoes
+    )
+    if not pendentes:
+        return em_cache
+    resultado = await _calcula_criterio_lote_sem_cache_async(
+        calculo, pendentes, semaforos, executor_threads, executor_processos
+    )
+    await loop.run_in_executor(
+        executor_threads, _grava_cache, calculo, pendentes, resultado
+    )
+    return em_cache | resultado
+
+
+async def _calcula_criterio_lote_sem_cache_async(
+    calculo: CalculoDoCriterio,
+    estacoes: Sequence[EstacaoHidro],
+    semaforos: dict[BancoDeDados, asyncio.Semaphore],
+    executor_threads: ThreadPoolExecutor,
+    executor_processos: ProcessPoolExecutor | None,
+) -> ResultadoLote:
+    loop = asyncio.get_running_loop()
+    async with AsyncExitStack() as stack:
+        for banco in sorted(calculo.bancos_de_dados):
+            await stack.enter_async_context(semaforos[banco])
+        if calculo.consulta_assincrona:
+            # Consultas ao CPLAR pelo asyncpg, no próprio laço de eventos
+            try:
+                return await calculo.calcular_lote_async(estacoes)
+            except Exception as e:
+                print(f"Erro na consulta assíncrona de {type(calculo).__name__}: {e}")
+        if executor_processos is not None and calculo.uso_intensivo_cpu:
+            try:
+                dados = await loop.run_in_executor(
+                    executor_threads, _dados_do_lote, calculo, estacoes
+                )
+                return await loop.run_in_executor(
+                    executor_processos,
+                    executa_calculo_lote_em_processo,
+                    calculo,
+                    estacoes,
+                    dados,
+                )
+            except Exception as e:
+                print(f"Erro no processo de {type(calculo).__name__}: {e}")
+        return await loop.run_in_executor(
+            executor_threads, _executa_com_sessoes, calculo, estacoes
+        )
+
+
+async def _encerra_executor(executor: Executor) -> None:
+    # Descarta os lotes que não começaram e aguarda os em execução sem
+    # bloquear o laço de eventos
+    await asyncio.to_thread(executor.shutdown, wait=True, cancel_futures=True)
+
+
+def _coleta_resultados(
+    estacoes: Sequence[EstacaoHidro],
+    criterios: list[CriterioSelecionado],
+    futures: Sequence[Future[ResultadoLote] | asyncio.Future[ResultadoLote]],
+) -> Iterator[dict]:
+    resultados = [future.result() for future in futures]
+    for estacao in estacoes:
+        valores_criterios: dict = {"codigo_estacao": estacao.codigo}
+        for criterio, resultado in zip(criterios, resultados):
+            valores_criterios[criterio["nome_campo"]] = resultado.get(
+                estacao.codigo, FALHA_NO_CALCULO
+            )
+        yield valores_criterios
+
+    # Todos os critérios do lote terminaram: os dados das estações não são mais usados
+    create_contexto_dados().libera([estacao.codigo for estacao in estacoes])
+
+
+def calcula_criterios_das_estacoes(
+    estacoes: Iterable[EstacaoHidro],
+    criterios: list[CriterioSelecionado],
+    configuracao: ConfiguracaoProcessamento | None = None,
+) -> Iterator[dict]:
+    """
+    Calcula os critérios das estações de forma concorrente, em lotes.
+
+    Os resultados são retornados na mesma ordem das estações de entrada, um
+    dicionário por estação, com FALHA_NO_CALCULO para os critérios que
+    falharem.
+    """
+    configuracao = configuracao or ConfiguracaoProcessamento()
+    if configuracao.assincrono:
+        yield from _itera_resultados_assincronos(estacoes, criterios, configuracao)
+        return
+
+    semaforos = {
+        banco: BoundedSemaphore(limite)
+        for banco, limite in configuracao.conexoes_por_banco.items()
+    }
+
+    with ExitStack() as stack:
+        executor_threads = stack.enter_context(
+            ThreadPoolExecutor(max_workers=configuracao.threads)
+        )
+        executor_processos = (
+            stack.enter_context(
+                ProcessPoolExecutor(
+                    configuracao.processos, initializer=inicializa_processo
+                )
+            )
+            if configuracao.processos > 0
+            else None
+        )
+
+        pendentes: deque[tuple[Sequence[EstacaoHidro], list[Future[ResultadoLote]]]]
+        pendentes = deque()
+        for lote in batched(estacoes, configuracao.tamanho_lote):
+            futures = [
+                executor_threads.submit(
+                    _calcula_criterio_lote,
+                    criterio,
+                    lote,
+                    semaforos,
+                    executor_processos,
+                )
+                for criterio in criterios
+            ]
+            pendentes.append((lote, futures))
+
+            if len(pendentes) >= configuracao.lotes_em_andamento:
+                lote_pronto, futures_prontos = pendentes.popleft()
+                yield from _coleta_resultados(lote_pronto, criterios, futures_prontos)
+
+        while pendentes:
+            lote_pronto, futures_prontos = pendentes.popleft()
+            yield from _coleta_resultados(lote_pronto, criterios, futures_prontos)
+
+
+async def calcula_criterios_das_estacoes_async(
+    estacoes: Iterable[EstacaoHidro],
+    criterios: list[CriterioSelecionado],
+    configuracao: ConfiguracaoProcessamento | None = None,
+) -> AsyncIterator[dict]:
+    """
+    Versão asyncio de calcula_criterios_das_estacoes, com os mesmos resultados
+    e na mesma ordem.
+
+    Cada (critério, lote) é uma tarefa que aguarda os semáforos dos bancos que
+    usa. Os critérios com consulta_assincrona consultam o CPLAR pelo asyncpg
+    no próprio laço; os demais (e as consultas ao Hidro DW) executam em uma
+    thread. Tarefas de bancos diferentes e de vários lotes
+    (lotes_em_andamento) ficam em andamento ao mesmo tempo.
+    """
+    configuracao = configuracao or ConfiguracaoProcessamento()
+    semaforos = {
+        banco: asyncio.Semaphore(limite)
+        for banco, limite in configuracao.conexoes_por_banco.items()
+    }
+
+    async with AsyncExitStack() as stack:
+        # Uma thread por conexão permitida, mais as dos critérios sem banco
+        executor_threads = ThreadPoolExecutor(
+            max_workers=sum(configuracao.conexoes_por_banco.values())
+            + configuracao.threads
+        )
+        stack.push_async_callback(_encerra_executor, executor_threads)
+        executor_processos = None
+        if configuracao.processos > 0:
+            executor_processos = ProcessPoolExecutor(
+                configuracao.processos, initializer=inicializa_processo
+            )
+            stack.push_async_callback(_encerra_executor, executor_processos)
+        if any(criterio["calculo"].consulta_assincrona for criterio in criterios):
+            # As conexões do asyncpg pertencem a este laço de eventos
+            stack.push_async_callback(create_cpalar_reader_async().fecha)
+
+        pendentes: deque[tuple[Sequence[EstacaoHidro], list[asyncio.Task]]]
+        pendentes = deque()
+        try:
+            for lote in batched(estacoes, configuracao.tamanho_lote):
+                tarefas = [
+                    asyncio.create_task(
+                        _calcula_criterio_lote_async(
+                            criterio,
+                            lote,
+                            semaforos,
+                            executor_threads,
+                            executor_processos,
+                        )
+                    )
+                    for criterio in criterios
+                ]
+                pendentes.append((lote, tarefas))
+
+                if len(pendentes) >= configuracao.lotes_em_andamento:
+                    lote_pronto, tarefas_prontas = pendentes.popleft()
+                    await asyncio.wait(tarefas_prontas)
+                    for valores in _coleta_resultados(
+                        lote_pronto, criterios, tarefas_prontas
+                    ):
+                        yield valores
+
+            while pendentes:
+                lote_pronto, tarefas_prontas = pendentes.popleft()
+                await asyncio.wait(tarefas_prontas)
+                for valores in _coleta_resultados(
+                    lote_pronto, criterios, tarefas_prontas
+                ):
+                    yield valores
+        finally:
+            tarefas_pendentes = [
+                tarefa for _, tarefas in pendentes for tarefa in tarefas
+            ]
+            for tarefa in tarefas_pendentes:
+                tarefa.cancel()
+            await asyncio.gather(*tarefas_pendentes, return_exceptions=True)
+
+
+def _itera_resultados_assincronos(
+    estacoes: Iterable[EstacaoHidro],
+    criterios: list[CriterioSelecionado],
+    configuracao: ConfiguracaoProcessamento,
+) -> Iterator[dict]:
+    # Conduz o laço de eventos a cada resultado: quem consome (gravação em
+    # lotes, tqdm) continua síncrono
+    loop = asyncio.new_event_loop()
+    resultados = calcula_criterios_das_estacoes_async(estacoes, criterios, configuracao)
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(anext(resultados))
+            except StopAsyncIteration:
+                break
+    finally:
+        try:
+            # Uma interrupção pode deixar a tarefa de anext em andamento
+            tarefas = asyncio.all_tasks(loop)
+            for tarefa in tarefas:
+                tarefa.cancel()
+            if tarefas:
+                loop.run_until_complete(
+                    asyncio.gather(*tarefas, return_exceptions=True)
+                )
+            loop.run_until_complete(resultados.aclose())
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.run_until_complete(loop.shutdown_default_executor())
+        finally:
+            loop.close()
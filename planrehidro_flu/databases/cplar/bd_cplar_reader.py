@@ -1,12 +1,39 @@
 import os
+from functools import cache
 from operator import and_
+from pathlib import Path
+from threading import Lock
 from typing import Sequence, cast
 
 import geopandas as gpd
 from dotenv import load_dotenv
-from sqlalchemy import case, create_engine, or_, select, text
-from sqlalchemy.orm import Session
+from sqlalchemy import (
+    Engine,
+    Float,
+    Integer,
+    Select,
+    String,
+    case,
+    column,
+    func,
+    or_,
+    select,
+    table,
+    text,
+    values,
+)
 
+from planrehidro_flu.databases.cplar.cache_camadas import (
+    CAMADAS_ESPACIAIS,
+    CacheCamadasEspaciais,
+)
+from planrehidro_flu.databases.cplar.indice_topologico import (
+    IndiceTopologico,
+    caminho_indice_topologico,
+    cobacia_to_cocursodag,
+    localiza_cocursodags_de_jusante,
+)
+from planrehidro_flu.databases.cplar.juncao_espacial import Coordenadas
 from planrehidro_flu.databases.cplar.models import (
     Entidade,
     EstacaoComObjetivos,
@@ -24,38 +51,261 @@ from planrehidro_flu.databases.cplar.models import (
     TrechoVulneravelACheias,
 )
 from planrehidro_flu.databases.hidro.enums import ResponsavelEnum
+from planrehidro_flu.databases.pool_conexoes import (
+    ConfiguracaoPool,
+    SessoesPorThread,
+    cria_engine,
+)
 
 load_dotenv()
 
+EstacaoHidroRef = EstacaoHidroRefBHO2013 | EstacaoHidroRefBHAE
+
+# Tabelas do banco que compõem cada origem de dados dos critérios
+TABELAS_POR_ORIGEM: dict[str, tuple[str, ...]] = {
+    "hidrorref": (
+        EstacaoHidroRefBHAE.__table__.fullname,
+        EstacaoHidroRefBHO2013.__table__.fullname,
+    ),
+    # Situação, responsável e operadora que tornam uma estação elegível a montante
+    "estacoes_operantes": (
+        EstacaoFlu.__table__.fullname,
+        Responsavel.__table__.fullname,
+        Operadora.__table__.fullname,
+    ),
+    "inundacoes": (TrechoVulneravelACheias.__table__.fullname,),
+    "ish": (IndiceSegurancaHidricaNumerico.__table__.fullname,),
+    "polos_nacionais": (PoloNacional.__table__.fullname,),
+    "semiarido": (CAMADAS_ESPACIAIS["semiarido"].tabela,),
+    "trechos_navegaveis": (TrechoNavegavel.__table__.fullname,),
+    "rhnr": (
+        EstacaoFlu.__table__.fullname,
+        EstacaoRHNRSelecaoInicial.__table__.fullname,
+        EstacaoPropostaRHNR.__table__.fullname,
+        EstacaoComObjetivos.__table__.fullname,
+    ),
+}
+
+
+def url_cplar(driver: str = "psycopg2") -> str:
+    db_name = os.getenv("POSTGRES_DB_NAME")
+    user = os.getenv("POSTGRES_DB_USER")
+    password = os.getenv("POSTGRES_DB_PASSWORD")
+    host = os.getenv("POSTGRES_DB_HOST")
+    port = os.getenv("POSTGRES_DB_PORT")
+    return f"postgresql+{driver}://{user}:{password}@{host}:{port}/{db_name}"
+
+
+@cache
+def cria_engine_cplar() -> Engine:
+    """
+    Engine do banco Bases CPLAR compartilhada por todos os leitores do processo.
+    """
+    return cria_engine("cplar", url_cplar(), ConfiguracaoPool.do_ambiente("POSTGRES"))
+
+
+# Consultas em lote compartilhadas pelo PostgresReader e pelo PostgresReaderAsync
 
-def cobacia_to_cocursodag(cobacia: str) -> str:
-    for idx, char in enumerate(cobacia[::-1]):
-        if int(char) % 2 == 0:
-            if idx == 0:
-                return cobacia
-            return cobacia[:-idx]
-    raise ValueError("Cobacia inválido")
 
+def query_cobacias_navegaveis(cobacias: Sequence[str]) -> Select[tuple[str]]:
+    return select(TrechoNavegavel.cobacia).where(TrechoNavegavel.cobacia.in_(cobacias))
 
-def localiza_cocursodags_de_jusante(cobacia: str) -> list[str]:
-    cocursodags = []
-    for idx, _ in enumerate(cobacia, start=1):
-        if int(cobacia[:idx]) % 2 == 0:
-            cocursodags.append(cobacia[:idx])
-    return cocursodags
+
+def query_cobacias_vulneraveis_a_cheias(cobacias: Sequence[str]) -> Select[tuple[str]]:
+    return select(TrechoVulneravelACheias.cobacia).where(
+        TrechoVulneravelACheias.cobacia.in_(cobacias)
+    )
+
+
+def query_ish_agregado_por_area_drenagem(
+    cobacias: Sequence[str],
+) -> Select[tuple[str, float, float]]:
+    alvos = values(
+        column("cobacia", String), column("cocursodag", String), name="alvos"
+    ).data([(cobacia, cobacia_to_cocursodag(cobacia)) for cobacia in set(cobacias)])
+    return (
+        select(
+            alvos.c.cobacia,
+            func.sum(IndiceSegurancaHidricaNumerico.ire_nuareacont),
+            func.sum(
+                IndiceSegurancaHidricaNumerico.ire_cs_ishfinal
+                * IndiceSegurancaHidricaNumerico.ire_nuareacont
+            ),
+        )
+        .where(
+            IndiceSegurancaHidricaNumerico.ire_cobacia >= alvos.c.cobacia,
+            IndiceSegurancaHidricaNumerico.ire_cobacia.like(
+                alvos.c.cocursodag.concat("%")
+            ),
+        )
+        .group_by(alvos.c.cobacia)
+    )
 
 
 class PostgresReader:
-    def __init__(self) -> None:
-        db_name = os.getenv("POSTGRES_DB_NAME")
-        user = os.getenv("POSTGRES_DB_USER")
-        password = os.getenv("POSTGRES_DB_PASSWORD")
-        host = os.getenv("POSTGRES_DB_HOST")
-        port = os.getenv("POSTGRES_DB_PORT")
-        connection_url = (
-            f"postgresql+psycopg2://{user}:{password}@{host}:{port}/{db_name}"
+    def __init__(self, engine: Engine | None = None) -> None:
+        self.engine = engine or cria_engine_cplar()
+        self.sessao = SessoesPorThread(self.engine)
+
+        # Cache das estações hidrorreferenciadas, chave (classe, codigo).
+        # O valor None registra estações inexistentes para não repetir a consulta.
+        self._cache_href: dict[tuple[type, int], EstacaoHidroRef | None] = {}
+        self._classes_href_precarregadas: set[type] = set()
+        self._lock_cache_href = Lock()
+        self.cache_href_acertos = 0
+        self.cache_href_falhas = 0
+
+        # Índices topológicos em memória; quando carregados, as consultas de
+        # montante/jusante da classe correspondente não acessam o banco.
+        self._indices_topologicos: dict[type, IndiceTopologico] = {}
+
+        # Camadas espaciais em disco/memória para os critérios calculados sem PostGIS
+        self.cache_camadas = CacheCamadasEspaciais(self.engine)
+
+    def constroi_indice_topologico[T: (EstacaoHidroRefBHO2013, EstacaoHidroRefBHAE)](
+        self, classe_href: type[T]
+    ) -> IndiceTopologico[T]:
+        with self.sessao() as session:
+            estacoes = session.execute(select(classe_href)).scalars().all()
+
+            # Mesmos filtros de operação/responsável de retorna_estacoes_de_montante
+            query1 = (
+                select(EstacaoFlu.codigo)
+                .join(Responsavel, Responsavel.codigo_estacao == EstacaoFlu.codigo)
+                .where(
+                    EstacaoFlu.operando == 1,
+                    Responsavel.responsavel_codigo == ResponsavelEnum.ANA,
+                    or_(
+                        EstacaoFlu.descricao.not_like("%%HIDROOBSERVA%%"),
+                        EstacaoFlu.descricao.is_(None),
+                    ),
+                )
+            )
+            query2 = (
+                select(EstacaoFlu.codigo)
+                .join(Responsavel, Responsavel.codigo_estacao == EstacaoFlu.codigo)
+                .join(Operadora, Operadora.codigo_estacao == EstacaoFlu.codigo)
+                .where(
+                    EstacaoFlu.operando == 1,
+                    EstacaoFlu.descricao.like("%%HIDROOBSERVA%%"),
+                    Responsavel.responsavel_codigo == ResponsavelEnum.ANA,
+                    Operadora.operadora_codigo == ResponsavelEnum.SGB_CPRM,
+                )
+            )
+            codigos_elegiveis = list(session.execute(query1).scalars().all()) + list(
+                session.execute(query2).scalars().all()
+            )
+
+        return IndiceTopologico(
+            classe_href=classe_href,
+            estacoes=estacoes,
+            codigos_elegiveis_montante=codigos_elegiveis,
         )
-        self.engine = create_engine(connection_url)
+
+    def carrega_indice_topologico[T: (EstacaoHidroRefBHO2013, EstacaoHidroRefBHAE)](
+        self,
+        classe_href: type[T],
+        caminho: Path | str | None = None,
+        reconstroi: bool = False,
+    ) -> IndiceTopologico[T]:
+        """
+        Carrega o índice topológico salvo em disco ou, se não existir (ou se
+        reconstroi for verdadeiro), constrói a partir do banco e o salva.
+        """
+        caminho = caminho or caminho_indice_topologico(classe_href)
+        if not reconstroi and Path(caminho).exists():
+            indice = IndiceTopologico.carrega(classe_href, caminho)
+        else:
+            indice = self.constroi_indice_topologico(classe_href)
+            indice.salva(caminho)
+
+        self._indices_topologicos[classe_href] = indice
+        # O índice já contém a tabela completa: aproveita para preencher o cache
+        with self._lock_cache_href:
+            for estacao in indice.estacoes.values():
+                self._cache_href[(classe_href, estacao.codigo)] = estacao
+            self._classes_href_precarregadas.add(classe_href)
+        return indice
+
+    def descarta_indices_topologicos(self) -> None:
+        self._indices_topologicos.clear()
+
+    def precarrega_estacoes_hidrorreferenciadas(
+        self, classe_href: type[EstacaoHidroRef]
+    ) -> None:
+        """
+        Carrega toda a tabela de estações hidrorreferenciadas no cache, de
+        modo que as consultas seguintes não acessem o banco.
+        """
+        with self.sessao() as session:
+            response = session.execute(select(classe_href)).scalars().all()
+
+        with self._lock_cache_href:
+            for estacao in response:
+                self._cache_href[(classe_href, estacao.codigo)] = estacao
+            self._classes_href_precarregadas.add(classe_href)
+
+    def invalida_cache_hidrorreferenciadas(
+        self,
+        classe_href: type[EstacaoHidroRef] | None = None,
+        codigos: Sequence[int] | None = None,
+    ) -> None:
+        with self._lock_cache_href:
+            if classe_href is None and codigos is None:
+                self._cache_href.clear()
+                self._classes_href_precarregadas.clear()
+                self.cache_href_acertos = 0
+                self.cache_href_falhas = 0
+                return
+
+            for chave in list(self._cache_href):
+                classe, codigo = chave
+                if (classe_href is None or classe is classe_href) and (
+                    codigos is None or codigo in codigos
+                ):
+                    del self._cache_href[chave]
+            if classe_href is not None and codigos is None:
+                self._classes_href_precarregadas.discard(classe_href)
+
+    def estatisticas_cache_hidrorreferenciadas(self) -> dict[str, int]:
+        with self._lock_cache_href:
+            return {
+                "acertos": self.cache_href_acertos,
+                "falhas": self.cache_href_falhas,
+                "entradas": len(self._cache_href),
+            }
+
+    def _consulta_cache_href(
+        self, classe_href: type[EstacaoHidroRef], codigos: Sequence[int]
+    ) -> tuple[dict[int, EstacaoHidroRef | None], list[int]]:
+        encontrados: dict[int, EstacaoHidroRef | None] = {}
+        ausentes: list[int] = []
+        with self._lock_cache_href:
+            precarregada = classe_href in self._classes_href_precarregadas
+            for codigo in codigos:
+                chave = (classe_href, codigo)
+                if chave in self._cache_href:
+                    encontrados[codigo] = self._cache_href[chave]
+                    self.cache_href_acertos += 1
+                elif precarregada:
+                    encontrados[codigo] = None
+                    self.cache_href_acertos += 1
+                else:
+                    ausentes.append(codigo)
+                    self.cache_href_falhas += 1
+        return encontrados, ausentes
+
+    def _armazena_cache_href(
+        self,
+        classe_href: type[EstacaoHidroRef],
+        codigos: Sequence[int],
+        estacoes: Sequence[EstacaoHidroRef],
+    ) -> None:
+        with self._lock_cache_href:
+            for codigo in codigos:
+                self._cache_href[(classe_href, codigo)] = None
+            for estacao in estacoes:
+                self._cache_href[(classe_href, estacao.codigo)] = estacao
 
     def retorna_estacao_hidrorreferenciada[
         T: (EstacaoHidroRefBHO2013, EstacaoHidroRefBHAE)
@@ -64,21 +314,45 @@ class PostgresReader:
         classe_href: type[T],
         codigo_estacao: int,
     ) -> T:
-        with Session(self.engine) as session:
-            query = select(classe_href).where(classe_href.codigo == codigo_estacao)
-            response = session.execute(query).scalar()
+        response = self.retorna_estacoes_hidrorreferenciadas(
+            classe_href=classe_href, codigos=[codigo_estacao]
+        ).get(codigo_estacao)
 
-            if not response:
-                raise ValueError(
-                    f"Estação Hidrorreferenciada com código {codigo_estacao} não encontrada."
-                )
+        if not response:
+            raise ValueError(
+                f"Estação Hidrorreferenciada com código {codigo_estacao} não encontrada."
+            )
         return response
 
+    def retorna_estacoes_hidrorreferenciadas[
+        T: (EstacaoHidroRefBHO2013, EstacaoHidroRefBHAE)
+    ](self, classe_href: type[T], codigos: Sequence[int]) -> dict[int, T]:
+        encontrados, ausentes = self._consulta_cache_href(classe_href, codigos)
+
+        if ausentes:
+            with self.sessao() as session:
+                query = select(classe_href).where(classe_href.codigo.in_(ausentes))
+                response = session.execute(query).scalars().all()
+            self._armazena_cache_href(classe_href, ausentes, response)
+            encontrados.update({estacao.codigo: estacao for estacao in response})
+
+        return {
+            codigo: cast(T, estacao)
+            for codigo, estacao in encontrados.items()
+            if estacao is not None
+        }
+
     def retorna_estacoes_hidrorreferenciadas_de_montante[
         T: (EstacaoHidroRefBHO2013, EstacaoHidroRefBHAE)
     ](self, classe_href: type[T], cobacia: str, no_mesmo_rio: bool = False) -> list[T]:
+        indice = self._indices_topologicos.get(classe_href)
+        if indice is not None:
+            return indice.estacoes_de_montante(
+                cobacia=cobacia, no_mesmo_rio=no_mesmo_rio
+            )
+
         cocursodag = cobacia_to_cocursodag(cobacia=cobacia)
-        with Session(self.engine) as session:
+        with self.sessao() as session:
             query = select(classe_href).where(
                 classe_href.cobacia >= cobacia,
                 classe_href.cocursodag.like(f"{cocursodag}%%"),
@@ -98,12 +372,18 @@ class PostgresReader:
     def retorna_estacoes_hidrorreferenciadas_de_jusante[
         T: (EstacaoHidroRefBHO2013, EstacaoHidroRefBHAE)
     ](self, classe_href: type[T], cobacia: str, no_mesmo_rio: bool = False) -> list[T]:
+        indice = self._indices_topologicos.get(classe_href)
+        if indice is not None:
+            return indice.estacoes_de_jusante(
+                cobacia=cobacia, no_mesmo_rio=no_mesmo_rio
+            )
+
         if no_mesmo_rio:
             cocursodags = [cobacia_to_cocursodag(cobacia=cobacia)]
         else:
             cocursodags = localiza_cocursodags_de_jusante(cobacia=cobacia)
 
-        with Session(self.engine) as session:
+        with self.sessao() as session:
             query = select(classe_href).where(
                 classe_href.cobacia < cobacia,
                 classe_href.cocursodag.in_(cocursodags),
@@ -112,8 +392,86 @@ class PostgresReader:
 
         return [estacao for estacao in response if estacao.area_drenagem is not None]
 
+    def retorna_estacoes_hidrorreferenciadas_de_montante_lote[
+        T: (EstacaoHidroRefBHO2013, EstacaoHidroRefBHAE)
+    ](
+        self, classe_href: type[T], cobacias: Sequence[str], no_mesmo_rio: bool = False
+    ) -> dict[str, list[T]]:
+        indice = self._indices_topologicos.get(classe_href)
+        if indice is not None:
+            return {
+                cobacia: indice.estacoes_de_montante(cobacia, no_mesmo_rio)
+                for cobacia in cobacias
+            }
+
+        resultado: dict[str, list[T]] = {cobacia: [] for cobacia in cobacias}
+        if not resultado:
+            return resultado
+
+        alvos = values(
+            column("cobacia", String), column("cocursodag", String), name="alvos"
+        ).data(
+            [(cobacia, cobacia_to_cocursodag(cobacia=cobacia)) for cobacia in resultado]
+        )
+        if no_mesmo_rio:
+            condicao_rio = classe_href.cocursodag == alvos.c.cocursodag
+        else:
+            condicao_rio = classe_href.cocursodag.like(alvos.c.cocursodag.concat("%"))
+
+        query = select(alvos.c.cobacia, classe_href).where(
+            classe_href.cobacia >= alvos.c.cobacia,
+            condicao_rio,
+            classe_href.area_drenagem.is_not(None),
+        )
+        with self.sessao() as session:
+            response = session.execute(query).all()
+
+        for cobacia, estacao in response:
+            resultado[cobacia].append(estacao)
+        return resultado
+
+    def retorna_estacoes_hidrorreferenciadas_de_jusante_lote[
+        T: (EstacaoHidroRefBHO2013, EstacaoHidroRefBHAE)
+    ](
+        self, classe_href: type[T], cobacias: Sequence[str], no_mesmo_rio: bool = False
+    ) -> dict[str, list[T]]:
+        indice = self._indices_topologicos.get(classe_href)
+        if indice is not None:
+            return {
+                cobacia: indice.estacoes_de_jusante(cobacia, no_mesmo_rio)
+                for cobacia in cobacias
+            }
+
+        resultado: dict[str, list[T]] = {cobacia: [] for cobacia in cobacias}
+        if not resultado:
+            return resultado
+
+        pares_cocursodags = []
+        for cobacia in resultado:
+            if no_mesmo_rio:
+                cocursodags = [cobacia_to_cocursodag(cobacia=cobacia)]
+            else:
+                cocursodags = localiza_cocursodags_de_jusante(cobacia=cobacia)
+            pares_cocursodags += [(cobacia, cocursodag) for cocursodag in cocursodags]
+
+        alvos = values(
+            column("cobacia", String), column("cocursodag", String), name="alvos"
+        ).data(pares_cocursodags)
+
+        query = select(alvos.c.cobacia, classe_href).where(
+            classe_href.cobacia < alvos.c.cobacia,
+            classe_href.cocursodag == alvos.c.cocursodag,
+            classe_href.area_drenagem.is_not(None),
+        )
+        with self.sessao() as session:
+            response = session.execute(query).all()
+
+        for cobacia, estacao in response:
+            resultado[cobacia].append(estacao)
+        return resultado
+
     def retorna_trecho_navegavel(self, cobacia: str) -> TrechoNavegavel | None:
-        with Session(self.engine) as session:
+        with self.sessao() as session:
             query = select(TrechoNavegavel).where(TrechoNavegavel.cobacia == cobacia)
             response = session.execute(query).scalar()
         return response
@@ -121,17 +479,46 @@ class PostgresReader:
     def retorna_trecho_vulneravel_a_cheias(
         self, cobacia: str
     ) -> TrechoVulneravelACheias | None:
-        with Session(self.engine) as session:
+        with self.sessao() as session:
             query = select(TrechoVulneravelACheias).where(
                 TrechoVulneravelACheias.cobacia == cobacia
             )
             response = session.execute(query).scalar()
         return response
 
+    def retorna_cobacias_navegaveis(
+        self, cobacias: Sequence[str], usa_cache_local: bool = False
+    ) -> set[str]:
+        if not cobacias:
+            return set()
+
+        if usa_cache_local:
+            camada = self.cache_camadas.retorna_camada("trechos_navegaveis")
+            return set(cobacias) & set(camada["cobacia"])
+
+        with self.sessao() as session:
+            response = (
+                session.execute(query_cobacias_navegaveis(cobacias)).scalars().all()
+            )
+        return set(response)
+
+    def retorna_cobacias_vulneraveis_a_cheias(
+        self, cobacias: Sequence[str], usa_cache_local: bool = False
+    ) -> set[str]:
+        if not cobacias:
+            return set()
+
+        if usa_cache_local:
+            camada = self.cache_camadas.retorna_camada("inundacoes")
+            return set(cobacias) & set(camada["cobacia"])
+
+        with self.sessao() as session:
+            query = query_cobacias_vulneraveis_a_cheias(cobacias)
+            response = session.execute(query).scalars().all()
+        return set(response)
+
     def retorna_geometria_semiarido(self) -> gpd.GeoSeries:
-        query = "SELECT * FROM geoft.semiarido_2024"
-        gdf = gpd.read_postgis(query, self.engine, geom_col="geom")
-        return gdf.geometry
+        return self.cache_camadas.retorna_camada("semiarido").geometry
 
     def esta_no_semiarido(self, latitude: float, longitude: float) -> bool:
         query = text("""
@@ -139,27 +526,104 @@ class PostgresReader:
             WHERE ST_Intersects(geom, ST_Point(:longitude, :latitude, 4674)) 
         """)
 
-        with Session(self.engine) as session:
+        with self.sessao() as session:
             response = session.execute(
                 query, {"longitude": longitude, "latitude": latitude}
             ).first()
 
         return False if response is None else True
 
+    def retorna_codigos_no_semiarido(
+        self, coordenadas: Sequence[Coordenadas]
+    ) -> set[int]:
+        semiarido = table("semiarido_2024", column("geom"), schema="geoft")
+        return self._retorna_codigos_que_intersectam(semiarido, coordenadas)
+
+    def mapeia_estacoes_no_semiarido(
+        self, coordenadas: Sequence[Coordenadas], usa_cache_local: bool = False
+    ) -> dict[int, bool]:
+        """
+        Retorna código -> localização no semiárido. Com usa_cache_local, os
+        pontos são testados contra a geometria preparada da camada local.
+        """
+        if usa_cache_local:
+            no_semiarido = self.cache_camadas.intersecta_pontos(
+                "semiarido",
+                longitudes=[longitude for _, longitude, _ in coordenadas],
+                latitudes=[latitude for _, _, latitude in coordenadas],
+            )
+            codigos = {
+                codigo
+                for (codigo, _, _), intersecta in zip(coordenadas, no_semiarido)
+                if intersecta
+            }
+        else:
+            codigos = self.retorna_codigos_no_semiarido(coordenadas)
+        return {codigo: codigo in codigos for codigo, _, _ in coordenadas}
+
+    def _retorna_codigos_que_intersectam(
+        self, camada, coordenadas: Sequence[Coordenadas]
+    ) -> set[int]:
+        if not coordenadas:
+            return set()
+
+        pontos = values(
+            column("codigo", Integer),
+            column("longitude", Float),
+            column("latitude", Float),
+            name="pontos",
+        ).data(list(coordenadas))
+        query = select(pontos.c.codigo).where(
+            select(camada.c.geom)
+            .where(
+                func.ST_Intersects(
+                    camada.c.geom,
+                    func.ST_Point(pontos.c.longitude, pontos.c.latitude, 4674),
+                )
+            )
+            .exists()
+        )
+        with self.sessao() as session:
+            response = session.execute(query).scalars().all()
+        return set(response)
+
     def retorna_objetivos_rhnr(
         self, codigo_estacao: int
     ) -> Sequence[EstacaoComObjetivos]:
-        with Session(self.engine) as session:
+        with self.sessao() as session:
             query = select(EstacaoComObjetivos).where(
                 EstacaoComObjetivos.codigo_estacao == codigo_estacao
             )
             response = session.execute(query).scalars().all()
         return response
 
+    def retorna_objetivos_rhnr_lote(
+        self, codigos_estacoes: Sequence[int]
+    ) -> dict[int, list[EstacaoComObjetivos]]:
+        resultado: dict[int, list[EstacaoComObjetivos]] = {
+            codigo: [] for codigo in codigos_estacoes
+        }
+        if not resultado:
+            return resultado
+
+        with self.sessao() as session:
+            query = select(EstacaoComObjetivos).where(
+                EstacaoComObjetivos.codigo_estacao.in_(codigos_estacoes)
+            )
+            response = session.execute(query).scalars().all()
+
+        for objetivo in response:
+            resultado[objetivo.codigo_estacao].append(objetivo)
+        return resultado
+
     def retorna_estacoes_de_montante[T: (EstacaoHidroRefBHO2013, EstacaoHidroRefBHAE)](
         self, classe_href: type[T], estacao_href: T
     ) -> Sequence[T]:
-        with Session(self.engine) as session:
+        indice = self._indices_topologicos.get(classe_href)
+        if indice is not None:
+            return indice.estacoes_elegiveis_de_montante(estacao_href)
+
+        with self.sessao() as session:
             query1 = (
                 select(classe_href)
                 .join(EstacaoFlu, EstacaoFlu.codigo == classe_href.codigo)
@@ -206,6 +670,79 @@ class PostgresReader:
             # <= cast(float, estacao_href.area_drenagem)
         ]
 
+    def retorna_estacoes_de_montante_lote[
+        T: (EstacaoHidroRefBHO2013, EstacaoHidroRefBHAE)
+    ](self, classe_href: type[T], estacoes_href: Sequence[T]) -> dict[int, list[T]]:
+        indice = self._indices_topologicos.get(classe_href)
+        if indice is not None:
+            return {
+                href.codigo: indice.estacoes_elegiveis_de_montante(href)
+                for href in estacoes_href
+            }
+
+        resultado: dict[int, list[T]] = {href.codigo: [] for href in estacoes_href}
+        # Sem área de drenagem nenhuma estação satisfaz o filtro de área
+        estacoes_href = [
+            href for href in estacoes_href if href.area_drenagem is not None
+        ]
+        if not estacoes_href:
+            return resultado
+
+        alvos = values(
+            column("codigo", Integer),
+            column("cobacia", String),
+            column("cocursodag", String),
+            column("area_drenagem", Float),
+            name="alvos",
+        ).data(
+            [
+                (href.codigo, href.cobacia, href.cocursodag, href.area_drenagem)
+                for href in estacoes_href
+            ]
+        )
+        condicoes_montante = (
+            classe_href.cobacia >= alvos.c.cobacia,
+            classe_href.codigo != alvos.c.codigo,
+            classe_href.area_drenagem <= alvos.c.area_drenagem,
+            classe_href.cocursodag.like(alvos.c.cocursodag.concat("%")),
+        )
+
+        with self.sessao() as session:
+            query1 = (
+                select(alvos.c.codigo, classe_href)
+                .join(EstacaoFlu, EstacaoFlu.codigo == classe_href.codigo)
+                .join(Responsavel, Responsavel.codigo_estacao == EstacaoFlu.codigo)
+                .where(
+                    EstacaoFlu.operando == 1,
+                    Responsavel.responsavel_codigo == ResponsavelEnum.ANA,
+                    *condicoes_montante,
+                    or_(
+                        EstacaoFlu.descricao.not_like("%%HIDROOBSERVA%%"),
+                        EstacaoFlu.descricao.is_(None),
+                    ),
+                )
+            )
+
+            query2 = (
+                select(alvos.c.codigo, classe_href)
+                .join(EstacaoFlu, EstacaoFlu.codigo == classe_href.codigo)
+                .join(Responsavel, Responsavel.codigo_estacao == EstacaoFlu.codigo)
+                .join(Operadora, Operadora.codigo_estacao == EstacaoFlu.codigo)
+                .where(
+                    EstacaoFlu.operando == 1,
+                    EstacaoFlu.descricao.like("%%HIDROOBSERVA%%"),
+                    Responsavel.responsavel_codigo == ResponsavelEnum.ANA,
+                    Operadora.operadora_codigo == ResponsavelEnum.SGB_CPRM,
+                    *condicoes_montante,
+                )
+            )
+            response1 = session.execute(query1).all()
+            response2 = session.execute(query2).all()
+
+        for codigo, estacao in list(response1) + list(response2):
+            resultado[codigo].append(estacao)
+        return resultado
+
     def retorno_polo_nacional_por_corrdenadas(
         self, latitude: float, longitude: float
     ) -> PoloNacional | None:
@@ -214,13 +751,71 @@ class PostgresReader:
             WHERE ST_Intersects(geom, ST_Point(:longitude, :latitude, 4674)) 
         """)
 
-        with Session(self.engine) as session:
+        with self.sessao() as session:
             response = session.execute(
                 query, {"longitude": longitude, "latitude": latitude}
             ).scalar()
 
         return cast(PoloNacional, response)
 
+    def retorna_codigos_em_polo_nacional(
+        self, coordenadas: Sequence[Coordenadas]
+    ) -> set[int]:
+        polos = table("polos_nacionais_2021", column("geom"), schema="geoft")
+        return self._retorna_codigos_que_intersectam(polos, coordenadas)
+
+    def mapeia_polos_nacionais(
+        self, coordenadas: Sequence[Coordenadas], usa_cache_local: bool = False
+    ) -> dict[int, str | None]:
+        """
+        Retorna código -> nome do polo nacional de irrigação que contém a
+        estação (None fora dos polos).
+        """
+        resultado: dict[int, str | None] = {
+            codigo: None for codigo, _, _ in coordenadas
+        }
+        if not coordenadas:
+            return resultado
+
+        if usa_cache_local:
+            camada = self.cache_camadas.retorna_camada("polos_nacionais")
+            for codigo, idx_poligono in self.cache_camadas.localiza_poligonos(
+                "polos_nacionais", coordenadas
+            ).items():
+                resultado[codigo] = camada["nome"].iat[idx_poligono]
+            return resultado
+
+        pontos = values(
+            column("codigo", Integer),
+            column("longitude", Float),
+            column("latitude", Float),
+            name="pontos",
+        ).data(list(coordenadas))
+        polos = table(
+            "polos_nacionais_2021",
+            column("id"),
+            column("nome"),
+            column("geom"),
+            schema="geoft",
+        )
+        query = (
+            select(pontos.c.codigo, polos.c.nome)
+            .where(
+                func.ST_Intersects(
+                    polos.c.geom,
+                    func.ST_Point(pontos.c.longitude, pontos.c.latitude, 4674),
+                )
+            )
+            .order_by(pontos.c.codigo, polos.c.id)
+        )
+        with self.sessao() as session:
+            response = session.execute(query).all()
+
+        for codigo, nome in reversed(response):
+            # Ordem reversa: prevalece o polo de menor id, como em .first()
+            resultado[codigo] = nome
+        return resultado
+
     def retorna_classes_ish_por_area_drenagem(
         self, cobacia: str
     ) -> Sequence[IndiceSegurancaHidrica]:
@@ -230,7 +825,7 @@ class PostgresReader:
             IndiceSegurancaHidrica.cobacia >= cobacia,
             IndiceSegurancaHidrica.cobacia.like(f"{cocursodag}%%"),
         )
-        with Session(self.engine) as session:
+        with self.sessao() as session:
             response = session.execute(query).scalars().all()
 
         return response
@@ -244,13 +839,32 @@ class PostgresReader:
             IndiceSegurancaHidricaNumerico.ire_cobacia >= cobacia,
             IndiceSegurancaHidricaNumerico.ire_cobacia.like(f"{cocursodag}%%"),
         )
-        with Session(self.engine) as session:
+        with self.sessao() as session:
             response = session.execute(query).scalars().all()
 
         return response
 
+    def retorna_ish_numerico_agregado_por_area_drenagem(
+        self, cobacias: Sequence[str]
+    ) -> dict[str, tuple[float, float]]:
+        """
+        Retorna, para cada cobacia, a soma das áreas de contribuição das ottobacias
+        a montante e a soma do ISH ponderado por essas áreas.
+        """
+        if not cobacias:
+            return {}
+
+        with self.sessao() as session:
+            query = query_ish_agregado_por_area_drenagem(cobacias)
+            response = session.execute(query).all()
+
+        return {
+            cobacia: (area_total, ish_area)
+            for cobacia, area_total, ish_area in response
+        }
+
     def retorna_estacoes_rhnr_selecao_inicial(self) -> Sequence[EstacaoFlu]:
-        with Session(self.engine) as session:
+        with self.sessao() as session:
             response = (
                 session.execute(
                     select(EstacaoFlu)
@@ -267,7 +881,7 @@ class PostgresReader:
         return response
 
     def retorna_estacoes_implementadas_rhnr(self) -> Sequence[EstacaoFlu]:
-        with Session(self.engine) as session:
+        with self.sessao() as session:
             response = (
                 session.execute(
                     select(EstacaoFlu)
@@ -287,7 +901,7 @@ class PostgresReader:
     def retorna_estacoes_propostas_rhnr(
         self, integra_rhnr: bool = True
     ) -> Sequence[EstacaoFlu]:
-        with Session(self.engine) as session:
+        with self.sessao() as session:
             response = (
                 session.execute(
                     select(EstacaoFlu)
@@ -338,8 +952,30 @@ class PostgresReader:
         """
         return list(self.retorna_estacoes_propostas_rhnr(integra_rhnr=True))
 
+    def retorna_assinatura_origem(self, origem: str) -> str:
+        """
+        Versão das tabelas de uma origem (TABELAS_POR_ORIGEM): total de linhas
+        e contador de linhas inseridas, alteradas e removidas das estatísticas
+        do PostgreSQL, sem ler o conteúdo das tabelas. Um reinício das
+        estatísticas apenas gera uma versão nova.
+        """
+        assinaturas = []
+        with self.sessao() as session:
+            for tabela in TABELAS_POR_ORIGEM[origem]:
+                query = text(f"""
+                    SELECT count(*), (
+                        SELECT n_tup_ins + n_tup_upd + n_tup_del
+                        FROM pg_stat_all_tables
+                        WHERE relid = to_regclass(:tabela)
+                    )
+                    FROM {tabela}
+                """)
+                total, alteracoes = session.execute(query, {"tabela": tabela}).one()
+                assinaturas.append(f"{tabela}={total}:{alteracoes}")
+        return ";".join(assinaturas)
+
     def retorna_dados_adicionais_estacoes(self) -> list[dict]:
-        with Session(self.engine) as session:
+        with self.sessao() as session:
             response = session.execute(
                 select(
                     EstacaoFlu.codigo,
@@ -0,0 +1,106 @@
+from typing import Sequence, cast
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+
+from planrehidro_flu.databases.cplar.bd_cplar_reader import (
+    PostgresReader,
+    query_cobacias_navegaveis,
+    query_cobacias_vulneraveis_a_cheias,
+    query_ish_agregado_por_area_drenagem,
+    url_cplar,
+)
+from planrehidro_flu.databases.cplar.models import (
+    EstacaoHidroRefBHAE,
+    EstacaoHidroRefBHO2013,
+)
+from planrehidro_flu.databases.pool_conexoes import ConfiguracaoPool
+
+
+def cria_engine_cplar_async() -> AsyncEngine:
+    """
+    Engine assíncrona (asyncpg) do banco Bases CPLAR, com a mesma configuração
+    de pool da engine síncrona.
+    """
+    return create_async_engine(
+        url_cplar("asyncpg"),
+        **ConfiguracaoPool.do_ambiente("POSTGRES").argumentos_engine(),
+    )
+
+
+class PostgresReaderAsync:
+    """
+    Variante assíncrona (asyncpg, via SQLAlchemy asyncio) das consultas em
+    lote do PostgresReader usadas pelo agendador asyncio do processamento.
+
+    Compartilha os caches do leitor síncrono: estações hidrorreferenciadas já
+    lidas não são consultadas de novo, e as camadas do cache local são lidas
+    do disco. As conexões pertencem ao laço de eventos em que foram abertas;
+    fecha() deve ser aguardado antes do fim do laço.
+    """
+
+    def __init__(
+        self, reader: PostgresReader, engine: AsyncEngine | None = None
+    ) -> None:
+        self.reader = reader
+        self.engine = engine or cria_engine_cplar_async()
+
+    async def fecha(self) -> None:
+        await self.engine.dispose()
+
+    async def retorna_estacoes_hidrorreferenciadas[
+        T: (EstacaoHidroRefBHO2013, EstacaoHidroRefBHAE)
+    ](self, classe_href: type[T], codigos: Sequence[int]) -> dict[int, T]:
+        encontrados, ausentes = self.reader._consulta_cache_href(classe_href, codigos)
+
+        if ausentes:
+            async with AsyncSession(self.engine) as session:
+                query = select(classe_href).where(classe_href.codigo.in_(ausentes))
+                response = (await session.execute(query)).scalars().all()
+            self.reader._armazena_cache_href(classe_href, ausentes, response)
+            encontrados.update({estacao.codigo: estacao for estacao in response})
+
+        return {
+            codigo: cast(T, estacao)
+            for codigo, estacao in encontrados.items()
+            if estacao is not None
+        }
+
+    async def retorna_cobacias_navegaveis(
+        self, cobacias: Sequence[str], usa_cache_local: bool = False
+    ) -> set[str]:
+        if not cobacias or usa_cache_local:
+            return self.reader.retorna_cobacias_navegaveis(cobacias, usa_cache_local)
+
+        async with self.engine.connect() as conexao:
+            response = await conexao.execute(query_cobacias_navegaveis(cobacias))
+        return set(response.scalars().all())
+
+    async def retorna_cobacias_vulneraveis_a_cheias(
+        self, cobacias: Sequence[str], usa_cache_local: bool = False
+    ) -> set[str]:
+        if not cobacias or usa_cache_local:
+            return self.reader.retorna_cobacias_vulneraveis_a_cheias(
+                cobacias, usa_cache_local
+            )
+
+        async with self.engine.connect() as conexao:
+            response = await conexao.execute(
+                query_cobacias_vulneraveis_a_cheias(cobacias)
+            )
+        return set(response.scalars().all())
+
+    async def retorna_ish_numerico_agregado_por_area_drenagem(
+        self, cobacias: Sequence[str]
+    ) -> dict[str, tuple[float, float]]:
+        if not cobacias:
+            return {}
+
+        async with self.engine.connect() as conexao:
+            response = await conexao.execute(
+                query_ish_agregado_por_area_drenagem(cobacias)
+            )
+        return {
+            cobacia: (area_total, ish_area)
+            for cobacia, area_total, ish_area in response.all()
+        }
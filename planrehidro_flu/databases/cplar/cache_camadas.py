@@ -0,0 +1,170 @@
+import json
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from threading import Lock
+from typing import Sequence
+
+import geopandas as gpd
+import numpy as np
+import shapely
+from sqlalchemy import Engine
+
+from planrehidro_flu.databases.cplar.juncao_espacial import (
+    CRS_ESTACOES,
+    Coordenadas,
+    localiza_poligonos_dos_pontos,
+)
+
+DIRETORIO_CAMADAS = Path(__file__).parents[1] / "internal" / "camadas"
+VALIDADE_PADRAO = timedelta(days=30)
+
+
+@dataclass(frozen=True)
+class CamadaEspacial:
+    nome: str
+    tabela: str
+    coluna_geometria: str = "geom"
+
+
+CAMADAS_ESPACIAIS = {
+    camada.nome: camada
+    for camada in (
+        CamadaEspacial("semiarido", "geoft.semiarido_2024"),
+        CamadaEspacial("polos_nacionais", "geoft.polos_nacionais_2021"),
+        CamadaEspacial(
+            "trechos_navegaveis", "hidrorref_bho2013.hidrorref_trechos_navegaveis"
+        ),
+        CamadaEspacial("inundacoes", "hidrorref_bho2013.geoft_hidrorref_inundacoes"),
+    )
+}
+
+
+class CacheCamadasEspaciais:
+    """
+    Cache local das camadas espaciais usadas pelos critérios.
+
+    Cada camada é lida do PostGIS uma única vez e salva em FlatGeobuf, com um
+    arquivo JSON registrando a data da extração. Enquanto o arquivo estiver
+    dentro da validade, a camada é lida do disco, sem conexão com o banco.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        diretorio: Path = DIRETORIO_CAMADAS,
+        validade: timedelta = VALIDADE_PADRAO,
+    ) -> None:
+        self.engine = engine
+        self.diretorio = diretorio
+        self.validade = validade
+        self._camadas: dict[str, gpd.GeoDataFrame] = {}
+        self._geometrias_preparadas: dict[str, shapely.Geometry] = {}
+        self._lock = Lock()
+
+    def _caminho_camada(self, nome: str) -> Path:
+        return self.diretorio / f"{nome}.fgb"
+
+    def _caminho_carimbo(self, nome: str) -> Path:
+        return self.diretorio / f"{nome}.json"
+
+    def data_atualizacao(self, nome: str) -> datetime | None:
+        caminho = self._caminho_carimbo(nome)
+        if not caminho.exists() or not self._caminho_camada(nome).exists():
+            return None
+        carimbo = json.loads(caminho.read_text(encoding="utf-8"))
+        return datetime.fromisoformat(carimbo["atualizado_em"])
+
+    def esta_atualizada(self, nome: str) -> bool:
+        atualizado_em = self.data_atualizacao(nome)
+        return atualizado_em is not None and (
+            datetime.now() - atualizado_em <= self.validade
+        )
+
+    def versao_camada(self, nome: str) -> str:
+        """
+        Identifica o conteúdo do arquivo local da camada (data da extração e
+        total de registros). Uma camada vencida é extraída novamente, como em
+        retorna_camada, para que a versão corresponda aos dados usados.
+        """
+        if not self.esta_atualizada(nome):
+            self.atualiza_camada(nome)
+        carimbo = json.loads(self._caminho_carimbo(nome).read_text(encoding="utf-8"))
+        return f"{carimbo['atualizado_em']}:{carimbo['registros']}"
+
+    def atualiza_camada(self, nome: str) -> gpd.GeoDataFrame:
+        """
+        Lê a camada do banco e sobrescreve o arquivo local e o carimbo.
+        """
+        camada = CAMADAS_ESPACIAIS[nome]
+        gdf = gpd.read_postgis(
+            f"SELECT * FROM {camada.tabela}",
+            self.engine,
+            geom_col=camada.coluna_geometria,
+        )
+
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+        gdf.to_file(self._caminho_camada(nome), driver="FlatGeobuf")
+        carimbo = {
+            "tabela": camada.tabela,
+            "atualizado_em": datetime.now().isoformat(timespec="seconds"),
+            "registros": len(gdf),
+        }
+        self._caminho_carimbo(nome).write_text(json.dumps(carimbo), encoding="utf-8")
+
+        with self._lock:
+            self._camadas[nome] = gdf
+            self._geometrias_preparadas.pop(nome, None)
+        return gdf
+
+    def retorna_camada(self, nome: str) -> gpd.GeoDataFrame:
+        with self._lock:
+            if nome in self._camadas:
+                return self._camadas[nome]
+
+        if not self.esta_atualizada(nome):
+            return self.atualiza_camada(nome)
+
+        gdf = gpd.read_file(self._caminho_camada(nome))
+        with self._lock:
+            return self._camadas.setdefault(nome, gdf)
+
+    def retorna_geometria_preparada(self, nome: str) -> shapely.Geometry:
+        """
+        União de todos os polígonos da camada, preparada para testes repetidos
+        de ponto em polígono.
+        """
+        with self._lock:
+            if nome in self._geometrias_preparadas:
+                return self._geometrias_preparadas[nome]
+
+        geometria = shapely.union_all(self.retorna_camada(nome).geometry.values)
+        shapely.prepare(geometria)
+        with self._lock:
+            return self._geometrias_preparadas.setdefault(nome, geometria)
+
+    def intersecta_pontos(
+        self, nome: str, longitudes: Sequence[float], latitudes: Sequence[float]
+    ) -> np.ndarray:
+        """
+        Retorna um array booleano indicando se cada ponto intersecta a camada.
+        As coordenadas (SIRGAS 2000) são reprojetadas para o CRS da camada.
+        """
+        geometria = self.retorna_geometria_preparada(nome)
+        crs_camada = self.retorna_camada(nome).crs
+        pontos = gpd.GeoSeries(
+            gpd.points_from_xy(longitudes, latitudes), crs=CRS_ESTACOES
+        )
+        if crs_camada is not None and not pontos.crs.equals(crs_camada):
+            pontos = pontos.to_crs(crs_camada)
+        return shapely.intersects(geometria, pontos.values)
+
+    def localiza_poligonos(
+        self, nome: str, coordenadas: Sequence[Coordenadas]
+    ) -> dict[int, int]:
+        return localiza_poligonos_dos_pontos(self.retorna_camada(nome), coordenadas)
+
+    def limpa(self) -> None:
+        with self._lock:
+            self._camadas.clear()
+            self._geometrias_preparadas.clear()
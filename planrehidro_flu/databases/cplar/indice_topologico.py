@@ -0,0 +1,179 @@
+import gzip
+import json
+from bisect import bisect_left
+from collections import defaultdict
+from pathlib import Path
+from typing import Iterable, Sequence
+
+from planrehidro_flu.databases.cplar.models import (
+    EstacaoHidroRefBHAE,
+    EstacaoHidroRefBHO2013,
+)
+
+DIRETORIO_INDICES = Path(__file__).parents[1] / "internal"
+
+# Maior que qualquer dígito: "abc" <= x < "abc" + FIM_PREFIXO equivale a LIKE 'abc%'
+FIM_PREFIXO = ":"
+
+
+def cobacia_to_cocursodag(cobacia: str) -> str:
+    for idx, char in enumerate(cobacia[::-1]):
+        if int(char) % 2 == 0:
+            if idx == 0:
+                return cobacia
+            return cobacia[:-idx]
+    raise ValueError("Cobacia inválido")
+
+
+def localiza_cocursodags_de_jusante(cobacia: str) -> list[str]:
+    cocursodags = []
+    for idx, _ in enumerate(cobacia, start=1):
+        if int(cobacia[:idx]) % 2 == 0:
+            cocursodags.append(cobacia[:idx])
+    return cocursodags
+
+
+def caminho_indice_topologico(
+    classe_href: type[EstacaoHidroRefBHO2013 | EstacaoHidroRefBHAE],
+) -> Path:
+    return DIRETORIO_INDICES / f"indice_{classe_href.__tablename__}.json.gz"
+
+
+class IndiceTopologico[T: (EstacaoHidroRefBHO2013, EstacaoHidroRefBHAE)]:
+    """
+    Índice em memória das estações hidrorreferenciadas pela codificação de
+    Otto, para consultas de montante e jusante sem acesso ao banco.
+
+    As estações são agrupadas por cocursodag e ordenadas por cobacia, de modo
+    que cada consulta é resolvida por busca binária.
+    """
+
+    def __init__(
+        self,
+        classe_href: type[T],
+        estacoes: Iterable[T],
+        codigos_elegiveis_montante: Iterable[int] = (),
+    ) -> None:
+        self.classe_href = classe_href
+        self.estacoes: dict[int, T] = {}
+        # Códigos que atendem aos filtros de operação/responsável das consultas
+        # de estações de montante (retorna_estacoes_de_montante)
+        self.codigos_elegiveis_montante = set(codigos_elegiveis_montante)
+
+        por_cocursodag: defaultdict[str, list[T]] = defaultdict(list)
+        for estacao in estacoes:
+            self.estacoes[estacao.codigo] = estacao
+            por_cocursodag[estacao.cocursodag].append(estacao)
+
+        self._cocursodags = sorted(por_cocursodag)
+        self._estacoes_por_cocursodag: dict[str, list[T]] = {}
+        self._cobacias_por_cocursodag: dict[str, list[str]] = {}
+        for cocursodag, estacoes_do_rio in por_cocursodag.items():
+            estacoes_do_rio.sort(key=lambda estacao: (estacao.cobacia, estacao.codigo))
+            self._estacoes_por_cocursodag[cocursodag] = estacoes_do_rio
+            self._cobacias_por_cocursodag[cocursodag] = [
+                estacao.cobacia for estacao in estacoes_do_rio
+            ]
+
+    def __len__(self) -> int:
+        return len(self.estacoes)
+
+    def estacoes_por_codigo(self, codigos: Sequence[int]) -> dict[int, T]:
+        return {
+            codigo: self.estacoes[codigo]
+            for codigo in codigos
+            if codigo in self.estacoes
+        }
+
+    def _cocursodags_com_prefixo(self, prefixo: str) -> list[str]:
+        inicio = bisect_left(self._cocursodags, prefixo)
+        fim = bisect_left(self._cocursodags, prefixo + FIM_PREFIXO)
+        return self._cocursodags[inicio:fim]
+
+    def _estacoes_a_partir_de(self, cocursodag: str, cobacia: str) -> list[T]:
+        cobacias = self._cobacias_por_cocursodag.get(cocursodag, [])
+        estacoes = self._estacoes_por_cocursodag.get(cocursodag, [])
+        return estacoes[bisect_left(cobacias, cobacia) :]
+
+    def _estacoes_antes_de(self, cocursodag: str, cobacia: str) -> list[T]:
+        cobacias = self._cobacias_por_cocursodag.get(cocursodag, [])
+        estacoes = self._estacoes_por_cocursodag.get(cocursodag, [])
+        return estacoes[: bisect_left(cobacias, cobacia)]
+
+    def estacoes_de_montante(self, cobacia: str, no_mesmo_rio: bool = False) -> list[T]:
+        """
+        Estações com cobacia >= cobacia e cocursodag no mesmo curso d'água
+        (ou em seus afluentes, quando no_mesmo_rio é falso).
+        """
+        cocursodag = cobacia_to_cocursodag(cobacia=cobacia)
+        if no_mesmo_rio:
+            cocursodags = [cocursodag]
+        else:
+            cocursodags = self._cocursodags_com_prefixo(cocursodag)
+
+        return [
+            estacao
+            for cocursodag_montante in cocursodags
+            for estacao in self._estacoes_a_partir_de(cocursodag_montante, cobacia)
+            if estacao.area_drenagem is not None
+        ]
+
+    def estacoes_de_jusante(self, cobacia: str, no_mesmo_rio: bool = False) -> list[T]:
+        """
+        Estações com cobacia < cobacia nos cursos d'água a jusante.
+        """
+        if no_mesmo_rio:
+            cocursodags = [cobacia_to_cocursodag(cobacia=cobacia)]
+        else:
+            cocursodags = localiza_cocursodags_de_jusante(cobacia=cobacia)
+
+        return [
+            estacao
+            for cocursodag in cocursodags
+            for estacao in self._estacoes_antes_de(cocursodag, cobacia)
+            if estacao.area_drenagem is not None
+        ]
+
+    def estacoes_elegiveis_de_montante(self, estacao_href: T) -> list[T]:
+        """
+        Equivalente em memória de PostgresReader.retorna_estacoes_de_montante.
+        """
+        if estacao_href.area_drenagem is None:
+            return []
+
+        return [
+            estacao
+            for cocursodag in self._cocursodags_com_prefixo(estacao_href.cocursodag)
+            for estacao in self._estacoes_a_partir_de(cocursodag, estacao_href.cobacia)
+            if estacao.codigo in self.codigos_elegiveis_montante
+            and estacao.codigo != estacao_href.codigo
+            and estacao.area_drenagem is not None
+            and estacao.area_drenagem <= estacao_href.area_drenagem
+        ]
+
+    def salva(self, caminho: Path | str) -> None:
+        conteudo = {
+            "tabela": self.classe_href.__tablename__,
+            "estacoes": [estacao.to_dict() for estacao in self.estacoes.values()],
+            "codigos_elegiveis_montante": sorted(self.codigos_elegiveis_montante),
+        }
+        with gzip.open(caminho, "wt", encoding="utf-8") as arquivo:
+            json.dump(conteudo, arquivo)
+
+    @classmethod
+    def carrega(
+        cls, classe_href: type[T], caminho: Path | str
+    ) -> "IndiceTopologico[T]":
+        with gzip.open(caminho, "rt", encoding="utf-8") as arquivo:
+            conteudo = json.load(arquivo)
+
+        if conteudo["tabela"] != classe_href.__tablename__:
+            raise ValueError(
+                f"Índice em {caminho} pertence à tabela {conteudo['tabela']}, "
+                f"e não a {classe_href.__tablename__}."
+            )
+        return cls(
+            classe_href=classe_href,
+            estacoes=[classe_href(**registro) for registro in conteudo["estacoes"]],
+            codigos_elegiveis_montante=conteudo["codigos_elegiveis_montante"],
+        )
@@ -0,0 +1,47 @@
+from typing import Sequence
+
+import geopandas as gpd
+
+Coordenadas = tuple[int, float, float]  # (codigo, longitude, latitude)
+
+# SIRGAS 2000, o mesmo SRID usado em ST_Point nas consultas ao PostGIS
+CRS_ESTACOES = "EPSG:4674"
+
+
+def cria_geodataframe_de_pontos(coordenadas: Sequence[Coordenadas]) -> gpd.GeoDataFrame:
+    codigos = [codigo for codigo, _, _ in coordenadas]
+    longitudes = [longitude for _, longitude, _ in coordenadas]
+    latitudes = [latitude for _, _, latitude in coordenadas]
+    return gpd.GeoDataFrame(
+        {"codigo": codigos},
+        geometry=gpd.points_from_xy(longitudes, latitudes),
+        crs=CRS_ESTACOES,
+    )
+
+
+def localiza_poligonos_dos_pontos(
+    camada: gpd.GeoDataFrame, coordenadas: Sequence[Coordenadas]
+) -> dict[int, int]:
+    """
+    Junção espacial (intersects) entre os pontos das estações e uma camada de
+    polígonos já carregada em memória, usando o índice espacial (STRtree) da
+    camada. Retorna código da estação -> posição do primeiro polígono da
+    camada que contém o ponto; estações fora da camada não aparecem.
+    """
+    if not coordenadas or camada.empty:
+        return {}
+
+    pontos = cria_geodataframe_de_pontos(coordenadas)
+    if camada.crs is not None and pontos.crs != camada.crs:
+        pontos = pontos.to_crs(camada.crs)
+
+    indices_pontos, indices_poligonos = camada.sindex.query(
+        pontos.geometry, predicate="intersects"
+    )
+
+    poligono_por_codigo: dict[int, int] = {}
+    for idx_ponto, idx_poligono in sorted(zip(indices_pontos, indices_poligonos)):
+        poligono_por_codigo.setdefault(
+            int(pontos["codigo"].iat[idx_ponto]), int(idx_poligono)
+        )
+    return poligono_por_codigo
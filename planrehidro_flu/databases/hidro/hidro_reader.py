@@ -1,11 +1,21 @@
 import os
-from typing import Literal, Sequence
+from datetime import date
+from functools import cache
+from typing import Callable, Iterator, Literal, Sequence
 
 import pandas as pd
 from dotenv import load_dotenv
-from sqlalchemy import create_engine, or_, select
+from sqlalchemy import (
+    Engine,
+    Select,
+    case,
+    distinct,
+    extract,
+    func,
+    or_,
+    select,
+)
 from sqlalchemy.engine import URL
-from sqlalchemy.orm import Session
 
 from planrehidro_flu.core.models import CurvaDeDescarga, EstacaoHidro, ResumoDeDescarga
 from planrehidro_flu.databases.hidro.enums import (
@@ -28,39 +38,163 @@ from planrehidro_flu.databases.hidro.models import (
     Rio,
     SubBacia,
 )
+from planrehidro_flu.databases.pool_conexoes import (
+    ConfiguracaoPool,
+    SessoesPorThread,
+    cria_engine,
+)
 
 load_dotenv()
 
+# O SQL Server aceita no máximo 2100 parâmetros por consulta
+TAMANHO_BLOCO_CODIGOS = 2000
 
-class HidroDWReader:
-    def __init__(self) -> None:
-        driver = os.getenv("SQL_SERVER_DB_DRIVER")
-        server = os.getenv("SQL_SERVERDB_SERVER")
-        db_name = os.getenv("SQL_SERVER_DB_NAME")
-        connection_string = f"Driver={driver};Server={server};Database={db_name};Trusted_Connection=yes;"
-        connection_url = URL.create(
-            "mssql+pyodbc", query={"odbc_connect": connection_string}
+
+def divide_em_blocos(
+    codigos: Sequence[int], tamanho: int = TAMANHO_BLOCO_CODIGOS
+) -> Iterator[Sequence[int]]:
+    for inicio in range(0, len(codigos), tamanho):
+        yield codigos[inicio : inicio + tamanho]
+
+
+def seleciona_resumo_de_descarga(codigos: Sequence[int]) -> Select:
+    return (
+        select(
+            ResumoDescarga.EstacaoCodigo.label("codigo"),
+            ResumoDescarga.NivelConsistencia.label("nivel_consistencia"),
+            ResumoDescarga.Data.label("data"),
+            ResumoDescarga.Cota.label("cota"),
+            ResumoDescarga.Vazao.label("vazao"),
+            ResumoDescarga.AreaMolhada.label("area_molhada"),
+            ResumoDescarga.Largura.label("largura"),
+            ResumoDescarga.VelMedia.label("vel_media"),
+            ResumoDescarga.Profundidade.label("profundidade"),
+        )
+        .where(
+            ResumoDescarga.EstacaoCodigo.in_(codigos),
+            ResumoDescarga.NivelConsistencia == 2,
+            ResumoDescarga.Importado == 0,
+            ResumoDescarga.Temporario == 0,
+            ResumoDescarga.Removido == 0,
+            ResumoDescarga.ImportadoRepetido == 0,
+            ResumoDescarga.Cota.is_not(None),
+            ResumoDescarga.Vazao.is_not(None),
+        )
+        .order_by(ResumoDescarga.EstacaoCodigo, ResumoDescarga.Data)
+    )
+
+
+def seleciona_curva_de_descarga(codigos: Sequence[int]) -> Select:
+    return (
+        select(
+            CurvaDescarga.EstacaoCodigo.label("codigo"),
+            CurvaDescarga.NivelConsistencia.label("nivel_consistencia"),
+            CurvaDescarga.PeriodoValidadeInicio.label("data_validade_inicio"),
+            CurvaDescarga.PeriodoValidadeFim.label("data_validade_fim"),
+            CurvaDescarga.CotaMaxima.label("cota_maxima"),
+            CurvaDescarga.CotaMinima.label("cota_minima"),
+            CurvaDescarga.TipoCurva.label("tipo_curva"),
+            CurvaDescarga.TipoEquacao.label("tipo_equacao"),
+            CurvaDescarga.CoefA.label("coef_a"),
+            CurvaDescarga.CoefH0.label("coef_h0"),
+            CurvaDescarga.CoefN.label("coef_n"),
+            CurvaDescarga.CoefA0.label("coef_a0"),
+            CurvaDescarga.CoefA1.label("coef_a1"),
+            CurvaDescarga.CoefA2.label("coef_a2"),
+            CurvaDescarga.CoefA3.label("coef_a3"),
+        )
+        .where(
+            CurvaDescarga.EstacaoCodigo.in_(codigos),
+            CurvaDescarga.NivelConsistencia == 2,
+            CurvaDescarga.Importado == 0,
+            CurvaDescarga.Temporario == 0,
+            CurvaDescarga.Removido == 0,
+            CurvaDescarga.ImportadoRepetido == 0,
+        )
+        .order_by(CurvaDescarga.EstacaoCodigo, CurvaDescarga.PeriodoValidadeInicio)
+    )
+
+
+OrigemPorEstacao = Literal["ResumoDescarga", "CurvaDescarga", "PivotCota"]
+
+
+def seleciona_registros_de_origem(
+    origem: OrigemPorEstacao, codigos: Sequence[int]
+) -> Select:
+    """
+    Registros lidos pelos critérios em cada tabela de origem, com os mesmos
+    filtros das consultas dos critérios, mais o RegistroID.
+    """
+    if origem == "ResumoDescarga":
+        query = seleciona_resumo_de_descarga(codigos).add_columns(
+            ResumoDescarga.RegistroID.label("registro_id")
+        )
+    elif origem == "CurvaDescarga":
+        query = seleciona_curva_de_descarga(codigos).add_columns(
+            CurvaDescarga.RegistroID.label("registro_id")
+        )
+    else:
+        query = select(
+            PivotCota.EstacaoCodigo.label("codigo"),
+            PivotCota.Data.label("data"),
+            PivotCota.Cota.label("cota"),
+            PivotCota.RegistroID.label("registro_id"),
+        ).where(
+            PivotCota.EstacaoCodigo.in_(codigos),
+            PivotCota.NivelConsistencia == NivelConsistencia.CONSISTIDO.value,
         )
-        self.engine = create_engine(connection_url, use_setinputsizes=False)
+    # Usada como subconsulta: o SQL Server não aceita ORDER BY nesse caso
+    return query.order_by(None)
+
+
+@cache
+def cria_engine_hidro_dw() -> Engine:
+    """
+    Engine do Hidro DW compartilhada por todos os leitores do processo.
+    """
+    driver = os.getenv("SQL_SERVER_DB_DRIVER")
+    server = os.getenv("SQL_SERVERDB_SERVER")
+    db_name = os.getenv("SQL_SERVER_DB_NAME")
+    connection_string = (
+        f"Driver={driver};Server={server};Database={db_name};Trusted_Connection=yes;"
+    )
+    connection_url = URL.create(
+        "mssql+pyodbc", query={"odbc_connect": connection_string}
+    )
+    return cria_engine(
+        "hidro",
+        connection_url,
+        ConfiguracaoPool.do_ambiente("SQL_SERVER"),
+        use_setinputsizes=False,
+        fast_executemany=True,
+    )
+
+
+class HidroDWReader:
+    def __init__(self, engine: Engine | None = None) -> None:
+        self.engine = engine or cria_engine_hidro_dw()
+        self.sessao = SessoesPorThread(self.engine)
 
     def retorna_inventario(self) -> list[Estacao]:
-        with Session(self.engine) as session:
+        with self.sessao() as session:
             query = session.query(Estacao)
             return query.all()
 
     def retorna_estacoes_por_codigo(self, codigos: Sequence[int]) -> Sequence[Estacao]:
-        with Session(self.engine) as session:
-            response = (
-                session.execute(select(Estacao).where(Estacao.Codigo.in_(codigos)))
-                .scalars()
-                .all()
-            )
+        response: list[Estacao] = []
+        with self.sessao() as session:
+            for bloco in divide_em_blocos(codigos):
+                response += (
+                    session.execute(select(Estacao).where(Estacao.Codigo.in_(bloco)))
+                    .scalars()
+                    .all()
+                )
             return response
 
     def retorna_inventario_por_bacia(
         self, bacia: BaciaEnum, tipo_estacao: TipoEstacao, operando: Literal[0, 1]
     ) -> Sequence[Estacao]:
-        with Session(self.engine) as session:
+        with self.sessao() as session:
             query = select(Estacao).where(
                 Estacao.BaciaCodigo == bacia,
                 Estacao.TipoEstacao == tipo_estacao,
@@ -88,7 +222,7 @@ class HidroDWReader:
         return pd.read_sql(query, self.engine, index_col="Data")
 
     def cria_inventario_estacao_hidro(self) -> list[EstacaoHidro]:
-        with Session(self.engine) as session:
+        with self.sessao() as session:
             stmt = (
                 select(
                     Estacao.Codigo,
@@ -227,7 +361,7 @@ class HidroDWReader:
     def cria_inventario_estacao_hidro_por_codigos(
         self, codigos: list[int]
     ) -> list[EstacaoHidro]:
-        with Session(self.engine) as session:
+        with self.sessao() as session:
             stmt = (
                 select(
                     Estacao.Codigo,
@@ -281,13 +415,16 @@ class HidroDWReader:
                     Municipio.Temporario == 0,
                     Municipio.Removido == 0,
                     Municipio.ImportadoRepetido == 0,
-                    Estacao.Codigo.in_(codigos),
                 )
                 .order_by(Estacao.Codigo)
             )
 
-            resposta = session.execute(stmt)
-            rows_dict = [row._asdict() for row in resposta]
+            # Blocos de códigos: o SQL Server limita o número de parâmetros
+            rows_dict = [
+                row._asdict()
+                for bloco in divide_em_blocos(sorted(codigos))
+                for row in session.execute(stmt.where(Estacao.Codigo.in_(bloco)))
+            ]
             lista_estacoes_hidro = [
                 EstacaoHidro(
                     codigo=row_dict["Codigo"],
@@ -311,89 +448,203 @@ class HidroDWReader:
             return lista_estacoes_hidro
 
     def retorna_resumo_de_descarga(self, codigo: int) -> list[ResumoDeDescarga]:
-        query = (
-            select(
-                ResumoDescarga.EstacaoCodigo.label("codigo"),
-                ResumoDescarga.NivelConsistencia.label("nivel_consistencia"),
-                ResumoDescarga.Data.label("data"),
-                ResumoDescarga.Cota.label("cota"),
-                ResumoDescarga.Vazao.label("vazao"),
-                ResumoDescarga.AreaMolhada.label("area_molhada"),
-                ResumoDescarga.Largura.label("largura"),
-                ResumoDescarga.VelMedia.label("vel_media"),
-                ResumoDescarga.Profundidade.label("profundidade"),
-            )
-            .where(
-                ResumoDescarga.EstacaoCodigo == codigo,
-                ResumoDescarga.NivelConsistencia == 2,
-                ResumoDescarga.Importado == 0,
-                ResumoDescarga.Temporario == 0,
-                ResumoDescarga.Removido == 0,
-                ResumoDescarga.ImportadoRepetido == 0,
-                ResumoDescarga.Cota.is_not(None),
-                ResumoDescarga.Vazao.is_not(None),
-            )
-            .order_by(ResumoDescarga.Data)
-        )
-        with Session(self.engine) as session:
+        query = seleciona_resumo_de_descarga([codigo])
+        with self.sessao() as session:
             response = session.execute(query).all()
             result = [ResumoDeDescarga(**row._mapping) for row in response]
         return result
 
-    def retorna_curva_de_descarga(self, codigo: int) -> list[CurvaDeDescarga]:
-        query = (
-            select(
-                CurvaDescarga.EstacaoCodigo.label("codigo"),
-                CurvaDescarga.NivelConsistencia.label("nivel_consistencia"),
-                CurvaDescarga.PeriodoValidadeInicio.label("data_validade_inicio"),
-                CurvaDescarga.PeriodoValidadeFim.label("data_validade_fim"),
-                CurvaDescarga.CotaMaxima.label("cota_maxima"),
-                CurvaDescarga.CotaMinima.label("cota_minima"),
-                CurvaDescarga.TipoCurva.label("tipo_curva"),
-                CurvaDescarga.TipoEquacao.label("tipo_equacao"),
-                CurvaDescarga.CoefA.label("coef_a"),
-                CurvaDescarga.CoefH0.label("coef_h0"),
-                CurvaDescarga.CoefN.label("coef_n"),
-                CurvaDescarga.CoefA0.label("coef_a0"),
-                CurvaDescarga.CoefA1.label("coef_a1"),
-                CurvaDescarga.CoefA2.label("coef_a2"),
-                CurvaDescarga.CoefA3.label("coef_a3"),
-            )
-            .where(
-                CurvaDescarga.EstacaoCodigo == codigo,
-                CurvaDescarga.NivelConsistencia == 2,
-                CurvaDescarga.Importado == 0,
-                CurvaDescarga.Temporario == 0,
-                CurvaDescarga.Removido == 0,
-                CurvaDescarga.ImportadoRepetido == 0,
-            )
-            .order_by(CurvaDescarga.PeriodoValidadeInicio)
-        )
+    def retorna_resumos_de_descarga(
+        self, codigos: Sequence[int]
+    ) -> dict[int, pd.DataFrame]:
+        """
+        Retorna os resumos de descarga de várias estações, um DataFrame por
+        estação (colunas com os mesmos nomes de ResumoDeDescarga).
+        """
+        return dict(self._itera_por_estacao(seleciona_resumo_de_descarga, codigos))
+
+    def retorna_contagem_de_descargas(
+        self, codigos: Sequence[int], ano_referencia: int
+    ) -> dict[int, tuple[int, int]]:
+        """
+        Retorna, por estação, o total de medições de descarga consistidas e o
+        total de medições até o ano de referência (inclusive).
+        """
+        resultado: dict[int, tuple[int, int]] = {}
+        with self.sessao() as session:
+            for bloco in divide_em_blocos(codigos):
+                query = (
+                    select(
+                        ResumoDescarga.EstacaoCodigo,
+                        func.count(),
+                        func.sum(
+                            case(
+                                (
+                                    extract("year", ResumoDescarga.Data)
+                                    <= ano_referencia,
+                                    1,
+                                ),
+                                else_=0,
+                            )
+                        ),
+                    )
+                    .where(
+                        ResumoDescarga.EstacaoCodigo.in_(bloco),
+                        ResumoDescarga.NivelConsistencia == 2,
+                        ResumoDescarga.Importado == 0,
+                        ResumoDescarga.Temporario == 0,
+                        ResumoDescarga.Removido == 0,
+                        ResumoDescarga.ImportadoRepetido == 0,
+                        ResumoDescarga.Cota.is_not(None),
+                        ResumoDescarga.Vazao.is_not(None),
+                    )
+                    .group_by(ResumoDescarga.EstacaoCodigo)
+                )
+                for codigo, total, total_ate_referencia in session.execute(query):
+                    resultado[codigo] = (total, total_ate_referencia)
+        return resultado
 
-        with Session(self.engine) as session:
+    def retorna_curva_de_descarga(self, codigo: int) -> list[CurvaDeDescarga]:
+        query = seleciona_curva_de_descarga([codigo])
+        with self.sessao() as session:
             response = session.execute(query).all()
             result = [CurvaDeDescarga(**row._mapping) for row in response]
         return result
 
+    def retorna_curvas_de_descarga(
+        self, codigos: Sequence[int]
+    ) -> dict[int, pd.DataFrame]:
+        """
+        Retorna as curvas de descarga de várias estações, um DataFrame por
+        estação (colunas com os mesmos nomes de CurvaDeDescarga).
+        """
+        return dict(self._itera_por_estacao(seleciona_curva_de_descarga, codigos))
+
+    def _itera_por_estacao(
+        self, cria_query: Callable[[Sequence[int]], Select], codigos: Sequence[int]
+    ) -> Iterator[tuple[int, pd.DataFrame]]:
+        # Uma consulta por bloco de códigos; os DataFrames de cada estação são
+        # entregues assim que o bloco correspondente é lido
+        with self.sessao() as session:
+            for bloco in divide_em_blocos(codigos):
+                query = cria_query(bloco)
+                response = session.execute(query).all()
+                dataframe = pd.DataFrame.from_records(
+                    response, columns=list(query.selected_columns.keys())
+                )
+                for codigo, dataframe_estacao in dataframe.groupby(
+                    "codigo", sort=False
+                ):
+                    yield int(codigo), dataframe_estacao.reset_index(drop=True)
+
     def retorna_serie_historica_vazao(self, codigo: int) -> Sequence[PivotVazao]:
         query = select(PivotVazao).where(PivotVazao.EstacaoCodigo == codigo)
-        with Session(self.engine) as session:
+        with self.sessao() as session:
             response = session.scalars(query).all()
         return response
 
-    def retorna_serie_historica_cota(
+    def retorna_registros_serie_historica(
         self,
-        codigo: int,
+        tabela: type[PivotCota] | type[PivotVazao],
+        codigos: Sequence[int],
+        registro_id_minimo: int = 0,
         nivel_consistencia: NivelConsistencia = NivelConsistencia.CONSISTIDO,
-    ) -> Sequence[PivotCota]:
-        query = (
-            select(PivotCota)
-            .where(
-                PivotCota.EstacaoCodigo == codigo,
-                PivotCota.NivelConsistencia == nivel_consistencia.value,
-            )
-            .order_by(PivotCota.Data)
-        )
-        with Session(self.engine) as session:
-            response = session.execute(query).scalars().all()
-        return response
+    ) -> Iterator[tuple[Sequence[int], Sequence[tuple[int, int, date, float | None]]]]:
+        """
+        Retorna, para cada bloco de códigos, os registros (RegistroID,
+        EstacaoCodigo, Data, valor) da série de cotas ou de vazões com
+        RegistroID maior que registro_id_minimo. Usado na sincronização
+        incremental da base local.
+        """
+        coluna_valor = PivotCota.Cota if tabela is PivotCota else PivotVazao.Vazao
+        with self.sessao() as session:
+            for bloco in divide_em_blocos(codigos):
+                query = select(
+                    tabela.RegistroID,
+                    tabela.EstacaoCodigo,
+                    tabela.Data,
+                    coluna_valor,
+                ).where(
+                    tabela.EstacaoCodigo.in_(bloco),
+                    tabela.NivelConsistencia == nivel_consistencia.value,
+                    tabela.RegistroID > registro_id_minimo,
+                )
+                yield bloco, session.execute(query).tuples().all()
+
+    def retorna_data_inicial_serie_cota(
+        self,
+        codigos: Sequence[int],
+        nivel_consistencia: NivelConsistencia = NivelConsistencia.CONSISTIDO,
+    ) -> dict[int, date]:
+        resultado: dict[int, date] = {}
+        with self.sessao() as session:
+            for bloco in divide_em_blocos(codigos):
+                query = (
+                    select(PivotCota.EstacaoCodigo, func.min(PivotCota.Data))
+                    .where(
+                        PivotCota.EstacaoCodigo.in_(bloco),
+                        PivotCota.NivelConsistencia == nivel_consistencia.value,
+                    )
+                    .group_by(PivotCota.EstacaoCodigo)
+                )
+                for codigo, data_inicial in session.execute(query):
+                    resultado[codigo] = data_inicial
+        return resultado
+
+    def retorna_dias_com_cota_por_ano(
+        self,
+        codigos: Sequence[int],
+        nivel_consistencia: NivelConsistencia = NivelConsistencia.CONSISTIDO,
+    ) -> dict[int, dict[int, int]]:
+        """
+        Retorna, por estação, o número de dias com cota em cada ano da série.
+        Estações com registros apenas sem cota aparecem com zero dias por ano.
+        """
+        ano = extract("year", PivotCota.Data)
+        resultado: dict[int, dict[int, int]] = {}
+        with self.sessao() as session:
+            for bloco in divide_em_blocos(codigos):
+                query = (
+                    select(
+                        PivotCota.EstacaoCodigo,
+                        ano,
+                        func.count(
+                            distinct(
+                                case((PivotCota.Cota.is_not(None), PivotCota.Data))
+                            )
+                        ),
+                    )
+                    .where(
+                        PivotCota.EstacaoCodigo.in_(bloco),
+                        PivotCota.NivelConsistencia == nivel_consistencia.value,
+                    )
+                    .group_by(PivotCota.EstacaoCodigo, ano)
+                )
+                for codigo, ano_serie, dias in session.execute(query):
+                    resultado.setdefault(codigo, {})[int(ano_serie)] = dias
+        return resultado
+
+    def retorna_assinaturas_por_estacao(
+        self, origem: OrigemPorEstacao, codigos: Sequence[int]
+    ) -> dict[int, str]:
+        """
+        Assinatura dos registros de cada estação na tabela de origem: total de
+        registros, maior RegistroID e soma de verificação do conteúdo
+        (CHECKSUM_AGG). Estações sem registros não aparecem no resultado.
+        """
+        resultado: dict[int, str] = {}
+        with self.sessao() as session:
+            for bloco in divide_em_blocos(codigos):
+                registros = seleciona_registros_de_origem(origem, bloco).subquery()
+                colunas_conteudo = [
+                    coluna for coluna in registros.c if coluna.name != "codigo"
+                ]
+                query = select(
+                    registros.c.codigo,
+                    func.count(),
+                    func.max(registros.c.registro_id),
+                    func.checksum_agg(func.binary_checksum(*colunas_conteudo)),
+                ).group_by(registros.c.codigo)
+                for codigo, total, registro_maximo, soma in session.execute(query):
+                    resultado[codigo] = f"{total}:{registro_maximo}:{soma}"
+        return resultado
@@ -0,0 +1,135 @@
+import json
+from datetime import datetime, timedelta
+from itertools import batched
+from pathlib import Path
+from typing import Any, Mapping, Protocol, Sequence
+
+from sqlalchemy import Engine, Index, create_engine, delete, event, func, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column
+
+ENGINE_CACHE = create_engine(
+    f"sqlite:///{Path(__file__).parent / 'cache_resultados.db'}"
+)
+
+VALIDADE_PADRAO = timedelta(days=90)
+LIMITE_ENTRADAS_PADRAO = 1_000_000
+
+# Limite de parâmetros por consulta do SQLite
+TAMANHO_BLOCO_CHAVES = 900
+
+
+@event.listens_for(ENGINE_CACHE, "connect")
+def _configura_sqlite(conexao_dbapi, _) -> None:
+    cursor = conexao_dbapi.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA busy_timeout=30000")
+    cursor.close()
+
+
+class BackendCache(Protocol):
+    """
+    Armazenamento chave-valor usado pelo cache de resultados dos critérios.
+    """
+
+    def obtem(self, chaves: Sequence[str]) -> dict[str, Any]: ...
+
+    def grava(self, valores: Mapping[str, Any]) -> None: ...
+
+    def limpa(self) -> None: ...
+
+
+class BaseCache(DeclarativeBase):
+    pass
+
+
+class ResultadoEmCache(BaseCache):
+    __tablename__ = "resultado_cache"
+    __table_args__ = (Index("ix_resultado_cache_gravado_em", "gravado_em"),)
+
+    chave: Mapped[str] = mapped_column(primary_key=True)
+    valor: Mapped[str]
+    gravado_em: Mapped[datetime]
+
+
+class CacheSQLite:
+    """
+    Backend em disco (SQLite) com validade e limite de entradas.
+
+    Valores são gravados em JSON. Entradas mais antigas que a validade são
+    ignoradas na leitura e removidas na gravação seguinte; acima do limite,
+    as entradas mais antigas são descartadas primeiro.
+    """
+
+    def __init__(
+        self,
+        engine: Engine = ENGINE_CACHE,
+        validade: timedelta = VALIDADE_PADRAO,
+        limite_entradas: int = LIMITE_ENTRADAS_PADRAO,
+    ) -> None:
+        self.engine = engine
+        self.validade = validade
+        self.limite_entradas = limite_entradas
+        BaseCache.metadata.create_all(self.engine)
+
+    def obtem(self, chaves: Sequence[str]) -> dict[str, Any]:
+        limite = datetime.now() - self.validade
+        resultado: dict[str, Any] = {}
+        with Session(self.engine) as session:
+            for bloco in batched(chaves, TAMANHO_BLOCO_CHAVES):
+                query = select(ResultadoEmCache.chave, ResultadoEmCache.valor).where(
+                    ResultadoEmCache.chave.in_(bloco),
+                    ResultadoEmCache.gravado_em >= limite,
+                )
+                for chave, valor in session.execute(query):
+                    resultado[chave] = json.loads(valor)
+        return resultado
+
+    def grava(self, valores: Mapping[str, Any]) -> None:
+        if not valores:
+            return
+
+        agora = datetime.now()
+        query = insert(ResultadoEmCache)
+        query = query.on_conflict_do_update(
+            index_elements=["chave"],
+            set_={
+                "valor": query.excluded.valor,
+                "gravado_em": query.excluded.gravado_em,
+            },
+        )
+        with Session(self.engine) as session:
+            session.execute(
+                query,
+                [
+                    {"chave": chave, "valor": json.dumps(valor), "gravado_em": agora}
+                    for chave, valor in valores.items()
+                ],
+            )
+            self._remove_excedentes(session, agora)
+            session.commit()
+
+    def _remove_excedentes(self, session: Session, agora: datetime) -> None:
+        session.execute(
+            delete(ResultadoEmCache).where(
+                ResultadoEmCache.gravado_em < agora - self.validade
+            )
+        )
+        excedentes = (
+            session.scalar(select(func.count()).select_from(ResultadoEmCache))
+            - self.limite_entradas
+        )
+        if excedentes > 0:
+            mais_antigas = (
+                select(ResultadoEmCache.chave)
+                .order_by(ResultadoEmCache.gravado_em)
+                .limit(excedentes)
+            )
+            session.execute(
+                delete(ResultadoEmCache).where(ResultadoEmCache.chave.in_(mais_antigas))
+            )
+
+    def limpa(self) -> None:
+        with Session(self.engine) as session:
+            session.execute(delete(ResultadoEmCache))
+            session.commit()
@@ -1,15 +1,19 @@
-from typing import Literal, Sequence
+from datetime import datetime
+from typing import Literal, Mapping, Sequence
 
 import pandas as pd
-from sqlalchemy import Engine, select, update
+from sqlalchemy import Engine, bindparam, insert, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
 
 from planrehidro_flu.core.models import EstacaoHidro
 from planrehidro_flu.core.parametros_multicriterio import NomeCampo
 from planrehidro_flu.databases.internal.models import (
+    AssinaturaDoCriterio,
     CenarioEstacaoesRHNR,
     CriteriosDaEstacao,
     EstacaoFluPorRH,
+    ExecucaoProcessamento,
     InventarioEstacaoFluAna,
     RegiaoHidrografica,
 )
@@ -35,9 +39,10 @@ def retorna_estacoes_por_rh(engine: Engine) -> list[dict]:
 
 def retorna_estacoes_processadas(engine: Engine) -> list[int]:
     with Session(engine) as session:
-        query = select(CriteriosDaEstacao).order_by(CriteriosDaEstacao.codigo_estacao)
-        response = session.execute(query).scalars().all()
-        return [estacao.codigo_estacao for estacao in response]
+        query = select(CriteriosDaEstacao.codigo_estacao).order_by(
+            CriteriosDaEstacao.codigo_estacao
+        )
+        return list(session.execute(query).scalars().all())
 
 
 def retorna_criterios_das_estacoes(engine: Engine) -> Sequence[CriteriosDaEstacao]:
@@ -46,6 +51,14 @@ def retorna_criterios_das_estacoes(engine: Engine) -> Sequence[CriteriosDaEstaca
         return response
 
 
+def retorna_tabela_criterios(engine: Engine) -> pd.DataFrame:
+    """
+    Tabela valor_criterio lida diretamente em colunas, sem criar objetos do ORM.
+    """
+    with engine.connect() as conexao:
+        return pd.read_sql(select(CriteriosDaEstacao.__table__), conexao)
+
+
 def retorna_criterios_por_rh(engine: Engine) -> Sequence[dict]:
     with Session(engine) as session:
         stmt = select(
@@ -94,6 +107,79 @@ def insere_criterios_da_estacao(
         session.commit()
 
 
+def insere_criterios_das_estacoes(
+    engine: Engine,
+    valores_criterios: Sequence[dict],
+    execucao_id: int | None = None,
+) -> None:
+    """
+    Grava um lote de estações com um único INSERT (executemany) e um único
+    commit. Quando informada, a execução do diário é atualizada na mesma
+    transação.
+    """
+    if not valores_criterios:
+        return
+
+    with Session(engine) as session:
+        session.execute(insert(CriteriosDaEstacao), list(valores_criterios))
+        if execucao_id is not None:
+            session.execute(
+                update(ExecucaoProcessamento)
+                .where(ExecucaoProcessamento.id == execucao_id)
+                .values(
+                    estacoes_gravadas=ExecucaoProcessamento.estacoes_gravadas
+                    + len(valores_criterios),
+                    atualizada_em=datetime.now(),
+                )
+            )
+        session.commit()
+
+
+def inicia_execucao(engine: Engine, operacao: str, estacoes_previstas: int) -> int:
+    """
+    Retorna o id da execução da operação a ser usada no diário: a última
+    execução não finalizada, se houver (retomada), ou uma nova.
+    """
+    with Session(engine) as session:
+        pendente = session.execute(
+            select(ExecucaoProcessamento)
+            .where(
+                ExecucaoProcessamento.operacao == operacao,
+                ExecucaoProcessamento.finalizada_em.is_(None),
+            )
+            .order_by(ExecucaoProcessamento.id.desc())
+        ).scalar()
+        if pendente is not None:
+            print(
+                f"Retomando a execução {pendente.id} de {operacao}: "
+                f"{pendente.estacoes_gravadas} estações já gravadas"
+            )
+            return pendente.id
+
+        agora = datetime.now()
+        execucao = ExecucaoProcessamento(
+            operacao=operacao,
+            iniciada_em=agora,
+            atualizada_em=agora,
+            estacoes_previstas=estacoes_previstas,
+            estacoes_gravadas=0,
+        )
+        session.add(execucao)
+        session.commit()
+        return execucao.id
+
+
+def finaliza_execucao(engine: Engine, execucao_id: int) -> None:
+    with Session(engine) as session:
+        agora = datetime.now()
+        session.execute(
+            update(ExecucaoProcessamento)
+            .where(ExecucaoProcessamento.id == execucao_id)
+            .values(finalizada_em=agora, atualizada_em=agora)
+        )
+        session.commit()
+
+
 def update_criterio_da_estacao(
     engine: Engine,
     codigo_estacao: int,
@@ -109,6 +195,102 @@ def update_criterio_da_estacao(
         session.commit()
 
 
+def atualiza_criterio_das_estacoes(
+    engine: Engine,
+    campo: NomeCampo,
+    valores: Mapping[int, int | float | bool | str | None],
+    execucao_id: int | None = None,
+) -> int:
+    """
+    Atualiza o campo de várias estações em uma única transação, com um UPDATE
+    executado em lote (executemany). Estações cujo valor não mudou não são
+    regravadas. Retorna o número de estações alteradas.
+    """
+    if not valores:
+        return 0
+
+    tabela = CriteriosDaEstacao.__table__
+    coluna = tabela.c[campo]
+    query = (
+        update(tabela)
+        .where(
+            tabela.c.codigo_estacao == bindparam("codigo"),
+            coluna.is_not(bindparam("valor")),
+        )
+        .values({campo: bindparam("valor")})
+    )
+    with Session(engine) as session:
+        resultado = session.connection().execute(
+            query,
+            [{"codigo": codigo, "valor": valor} for codigo, valor in valores.items()],
+        )
+        alteradas = resultado.rowcount
+        if execucao_id is not None:
+            session.execute(
+                update(ExecucaoProcessamento)
+                .where(ExecucaoProcessamento.id == execucao_id)
+                .values(estacoes_gravadas=alteradas, atualizada_em=datetime.now())
+            )
+        session.commit()
+    return alteradas
+
+
+def retorna_assinaturas_do_criterio(
+    engine: Engine, campo: NomeCampo
+) -> dict[tuple[int, str], str]:
+    """
+    Assinaturas gravadas no último cálculo do critério, por (estação, origem).
+    """
+    query = select(
+        AssinaturaDoCriterio.codigo_estacao,
+        AssinaturaDoCriterio.origem,
+        AssinaturaDoCriterio.assinatura,
+    ).where(AssinaturaDoCriterio.nome_campo == campo)
+    with Session(engine) as session:
+        return {
+            (codigo, origem): assinatura
+            for codigo, origem, assinatura in session.execute(query)
+        }
+
+
+def salva_assinaturas_do_criterio(
+    engine: Engine,
+    campo: NomeCampo,
+    assinaturas: Mapping[str, Mapping[int, str]],
+    codigos: Sequence[int],
+) -> None:
+    """
+    Grava (upsert) as assinaturas das origens lidas no cálculo do critério
+    para as estações informadas.
+    """
+    agora = datetime.now()
+    linhas = [
+        {
+            "codigo_estacao": codigo,
+            "nome_campo": campo,
+            "origem": origem,
+            "assinatura": assinaturas_origem.get(codigo, ""),
+            "calculada_em": agora,
+        }
+        for origem, assinaturas_origem in assinaturas.items()
+        for codigo in codigos
+    ]
+    if not linhas:
+        return
+
+    query = sqlite_insert(AssinaturaDoCriterio)
+    query = query.on_conflict_do_update(
+        index_elements=["codigo_estacao", "nome_campo", "origem"],
+        set_={
+            "assinatura": query.excluded.assinatura,
+            "calculada_em": query.excluded.calculada_em,
+        },
+    )
+    with Session(engine) as session:
+        session.execute(query, linhas)
+        session.commit()
+
+
 def retorna_dados_adicionais_estacoes(
     engine: Engine,
 ) -> pd.DataFrame:
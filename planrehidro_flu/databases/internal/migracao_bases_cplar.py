@@ -1,6 +1,6 @@
 from sqlalchemy.orm import Session
 
-from planrehidro_flu.databases.cplar.bd_cplar_reader import PostgresReader
+from planrehidro_flu.core.parametros_calculo import create_cpalar_reader
 from planrehidro_flu.databases.internal.models import (
     ENGINE,
     Base,
@@ -11,7 +11,7 @@ from planrehidro_flu.databases.internal.models import (
 
 def migra_dados_dos_bancos():
     # BD Bases CPLAR
-    postgres_reader = PostgresReader()
+    postgres_reader = create_cpalar_reader()
     # inventario = postgres_reader.retorna_dados_adicionais_estacoes()
     estacoes_cenario1 = postgres_reader.retorna_estacoes_rhnr_cenario1()
     estacoes_cenario2 = postgres_reader.retorna_estacoes_rhnr_cenario2()
@@ -1,10 +1,65 @@
+from contextlib import contextmanager
+from datetime import datetime
 from pathlib import Path
+from threading import Lock
+from typing import Iterator
 
-from sqlalchemy import ForeignKey, create_engine
+from sqlalchemy import Engine, ForeignKey, create_engine, event
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 
 ENGINE = create_engine(f"sqlite:///{Path(__file__).parent / 'database.db'}")
 
+# Execuções de gravação em andamento no processo (modo_de_gravacao aninhado)
+_gravacoes_ativas = 0
+_lock_gravacoes = Lock()
+
+
+@event.listens_for(ENGINE, "connect")
+def _configura_sqlite(conexao_dbapi, _) -> None:
+    # Não altera o arquivo: apenas espera os bloqueios de outra conexão
+    cursor = conexao_dbapi.cursor()
+    cursor.execute("PRAGMA busy_timeout=30000")
+    cursor.close()
+
+
+def _synchronous_normal(conexao_dbapi, *_) -> None:
+    cursor = conexao_dbapi.cursor()
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
+@contextmanager
+def modo_de_gravacao(engine: Engine = ENGINE) -> Iterator[None]:
+    """
+    WAL com synchronous=NORMAL durante uma execução de gravação dos critérios:
+    os commits não forçam fsync do arquivo principal, e a leitura (app) não
+    bloqueia a gravação dos lotes. Ao final, o banco volta ao
+    journal_mode=DELETE, sem os arquivos -wal e -shm; conexões apenas de
+    leitura nunca alteram o modo do arquivo.
+    """
+    global _gravacoes_ativas
+    with _lock_gravacoes:
+        _gravacoes_ativas += 1
+        if _gravacoes_ativas == 1:
+            with engine.connect() as conexao:
+                conexao.exec_driver_sql("PRAGMA journal_mode=WAL")
+            event.listen(engine, "checkout", _synchronous_normal)
+    try:
+        yield
+    finally:
+        with _lock_gravacoes:
+            _gravacoes_ativas -= 1
+            if _gravacoes_ativas == 0:
+                event.remove(engine, "checkout", _synchronous_normal)
+                # Conexões do pool com synchronous=NORMAL são descartadas
+                engine.dispose()
+                try:
+                    with engine.connect() as conexao:
+                        conexao.exec_driver_sql("PRAGMA journal_mode=DELETE")
+                except Exception as e:
+                    print(f"Erro ao restaurar o journal_mode do banco interno: {e}")
+                engine.dispose()
+
 
 class Base(DeclarativeBase):
     def to_dict(self):
@@ -62,6 +117,40 @@ class CriteriosDaEstacao(Base):
     rhnr_c2: Mapped[float] = mapped_column(nullable=True)
 
 
+class ExecucaoProcessamento(Base):
+    """
+    Diário das execuções do processamento de critérios: cada lote gravado
+    atualiza o total de estações na mesma transação dos resultados, e uma
+    execução sem data de finalização é retomada na chamada seguinte.
+    """
+
+    __tablename__ = "execucao_processamento"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    operacao: Mapped[str]
+    iniciada_em: Mapped[datetime]
+    atualizada_em: Mapped[datetime]
+    finalizada_em: Mapped[datetime | None]
+    estacoes_previstas: Mapped[int]
+    estacoes_gravadas: Mapped[int] = mapped_column(default=0)
+
+
+class AssinaturaDoCriterio(Base):
+    """
+    Assinatura de cada tabela de origem lida no último cálculo de um critério
+    para uma estação. Uma assinatura diferente da atual indica que o valor do
+    critério precisa ser recalculado.
+    """
+
+    __tablename__ = "assinatura_criterio"
+
+    codigo_estacao: Mapped[int] = mapped_column(primary_key=True)
+    nome_campo: Mapped[str] = mapped_column(primary_key=True)
+    origem: Mapped[str] = mapped_column(primary_key=True)
+    assinatura: Mapped[str]
+    calculada_em: Mapped[datetime]
+
+
 class Operadora(Base):
     __tablename__ = "operadora"
 
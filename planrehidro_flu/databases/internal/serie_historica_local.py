@@ -0,0 +1,290 @@
+from collections import defaultdict
+from datetime import date, datetime
+from pathlib import Path
+from threading import Lock
+from typing import Literal, Sequence
+
+import pandas as pd
+from sqlalchemy import (
+    Engine,
+    Index,
+    case,
+    create_engine,
+    distinct,
+    event,
+    extract,
+    func,
+    select,
+)
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column
+
+from planrehidro_flu.databases.hidro.enums import NivelConsistencia
+from planrehidro_flu.databases.hidro.hidro_reader import HidroDWReader
+from planrehidro_flu.databases.hidro.models import PivotCota, PivotVazao
+
+ENGINE_SERIES = create_engine(f"sqlite:///{Path(__file__).parent / 'series.db'}")
+
+TipoSerie = Literal["cota", "vazao"]
+
+
+@event.listens_for(ENGINE_SERIES, "connect")
+def _configura_sqlite(conexao_dbapi, _) -> None:
+    cursor = conexao_dbapi.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA busy_timeout=30000")
+    cursor.close()
+
+
+class BaseSeries(DeclarativeBase):
+    pass
+
+
+class SerieCota(BaseSeries):
+    __tablename__ = "serie_cota"
+    __table_args__ = (
+        Index("ix_serie_cota_estacao", "codigo_estacao", "nivel_consistencia", "data"),
+    )
+
+    registro_id: Mapped[int] = mapped_column(primary_key=True)
+    codigo_estacao: Mapped[int]
+    nivel_consistencia: Mapped[int]
+    data: Mapped[date]
+    cota: Mapped[float | None]
+
+
+class SerieVazao(BaseSeries):
+    __tablename__ = "serie_vazao"
+    __table_args__ = (
+        Index("ix_serie_vazao_estacao", "codigo_estacao", "nivel_consistencia", "data"),
+    )
+
+    registro_id: Mapped[int] = mapped_column(primary_key=True)
+    codigo_estacao: Mapped[int]
+    nivel_consistencia: Mapped[int]
+    data: Mapped[date]
+    vazao: Mapped[float | None]
+
+
+class SincronizacaoSerie(BaseSeries):
+    __tablename__ = "sincronizacao_serie"
+
+    tipo_serie: Mapped[str] = mapped_column(primary_key=True)
+    codigo_estacao: Mapped[int] = mapped_column(primary_key=True)
+    nivel_consistencia: Mapped[int] = mapped_column(primary_key=True)
+    registro_id_maximo: Mapped[int]
+    data_maxima: Mapped[date | None]
+    sincronizado_em: Mapped[datetime]
+
+
+TABELAS = {
+    "cota": (SerieCota, PivotCota),
+    "vazao": (SerieVazao, PivotVazao),
+}
+
+
+def _como_data(valor: date) -> date:
+    # O DW pode retornar datetime; a base local guarda apenas a data
+    return valor.date() if isinstance(valor, datetime) else valor
+
+
+class SerieHistoricaLocal:
+    """
+    Cópia local (SQLite) das séries de cota e vazão do Hidro DW.
+
+    A sincronização é incremental: para cada estação é registrado o maior
+    RegistroID já consultado, e apenas os registros posteriores são lidos do
+    DW nas execuções seguintes.
+    """
+
+    def __init__(self, engine: Engine = ENGINE_SERIES) -> None:
+        self.engine = engine
+        BaseSeries.metadata.create_all(self.engine)
+        self._lock_sincronizacao = Lock()
+
+    def sincroniza(
+        self,
+        hidro_reader: HidroDWReader,
+        tipo_serie: TipoSerie,
+        codigos: Sequence[int],
+        nivel_consistencia: NivelConsistencia = NivelConsistencia.CONSISTIDO,
+    ) -> int:
+        """
+        Traz do DW os registros novos das estações e retorna quantos foram lidos.
+        """
+        tabela_local, tabela_dw = TABELAS[tipo_serie]
+        # O lock protege apenas as operações na base local; as consultas ao DW
+        # de threads diferentes correm em paralelo
+        with self._lock_sincronizacao, Session(self.engine) as session:
+            registros_sincronizados = dict(
+                session.execute(
+                    select(
+                        SincronizacaoSerie.codigo_estacao,
+                        SincronizacaoSerie.registro_id_maximo,
+                    ).where(
+                        SincronizacaoSerie.tipo_serie == tipo_serie,
+                        SincronizacaoSerie.nivel_consistencia
+                        == nivel_consistencia.value,
+                        SincronizacaoSerie.codigo_estacao.in_(codigos),
+                    )
+                )
+                .tuples()
+                .all()
+            )
+
+        # Estações sincronizadas juntas compartilham o mesmo RegistroID
+        # máximo, o que mantém poucas consultas ao DW
+        codigos_por_registro: defaultdict[int, list[int]] = defaultdict(list)
+        for codigo in codigos:
+            codigos_por_registro[registros_sincronizados.get(codigo, 0)].append(codigo)
+
+        total_registros = 0
+        agora = datetime.now()
+        for registro_id_minimo, codigos_grupo in codigos_por_registro.items():
+            for bloco, registros in hidro_reader.retorna_registros_serie_historica(
+                tabela=tabela_dw,
+                codigos=codigos_grupo,
+                registro_id_minimo=registro_id_minimo,
+                nivel_consistencia=nivel_consistencia,
+            ):
+                datas_maximas: dict[int, date] = {}
+                linhas = []
+                for registro_id, codigo, data_registro, valor in registros:
+                    data = _como_data(data_registro)
+                    if codigo not in datas_maximas or data > datas_maximas[codigo]:
+                        datas_maximas[codigo] = data
+                    linhas.append(
+                        {
+                            "registro_id": registro_id,
+                            "codigo_estacao": codigo,
+                            "nivel_consistencia": nivel_consistencia.value,
+                            "data": data,
+                            tipo_serie: valor,
+                        }
+                    )
+                total_registros += len(linhas)
+
+                registro_id_maximo = max(
+                    [registro_id_minimo] + [linha["registro_id"] for linha in linhas]
+                )
+                # Uma transação por bloco: uma interrupção preserva o que já foi lido
+                with self._lock_sincronizacao, Session(self.engine) as session:
+                    if linhas:
+                        session.execute(
+                            insert(tabela_local).on_conflict_do_nothing(), linhas
+                        )
+                    self._atualiza_sincronizacao(
+                        session,
+                        [
+                            {
+                                "tipo_serie": tipo_serie,
+                                "codigo_estacao": codigo,
+                                "nivel_consistencia": nivel_consistencia.value,
+                                "registro_id_maximo": registro_id_maximo,
+                                "data_maxima": datas_maximas.get(codigo),
+                                "sincronizado_em": agora,
+                            }
+                            for codigo in bloco
+                        ],
+                    )
+                    session.commit()
+        return total_registros
+
+    def _atualiza_sincronizacao(self, session: Session, linhas: list[dict]) -> None:
+        # Upsert: outro processo pode sincronizar as mesmas estações em paralelo
+        query = insert(SincronizacaoSerie)
+        query = query.on_conflict_do_update(
+            index_elements=["tipo_serie", "codigo_estacao", "nivel_consistencia"],
+            set_={
+                "registro_id_maximo": func.max(
+                    SincronizacaoSerie.registro_id_maximo,
+                    query.excluded.registro_id_maximo,
+                ),
+                "data_maxima": func.coalesce(
+                    func.max(
+                        SincronizacaoSerie.data_maxima, query.excluded.data_maxima
+                    ),
+                    SincronizacaoSerie.data_maxima,
+                    query.excluded.data_maxima,
+                ),
+                "sincronizado_em": query.excluded.sincronizado_em,
+            },
+        )
+        session.execute(query, linhas)
+
+    def retorna_serie_historica_df(
+        self,
+        tipo_serie: TipoSerie,
+        codigo: int,
+        nivel_consistencia: NivelConsistencia = NivelConsistencia.CONSISTIDO,
+    ) -> pd.DataFrame:
+        """
+        Série em formato colunar: índice "data" (datetime64), coluna do valor
+        (float32) e "nivel_consistencia" (int8).
+        """
+        tabela_local, _ = TABELAS[tipo_serie]
+        query = (
+            select(
+                tabela_local.data,
+                getattr(tabela_local, tipo_serie),
+                tabela_local.nivel_consistencia,
+            )
+            .where(
+                tabela_local.codigo_estacao == codigo,
+                tabela_local.nivel_consistencia == nivel_consistencia.value,
+            )
+            .order_by(tabela_local.data)
+        )
+        return pd.read_sql(
+            query,
+            self.engine,
+            index_col="data",
+            parse_dates=["data"],
+            dtype={tipo_serie: "float32", "nivel_consistencia": "int8"},
+        )
+
+    def retorna_data_inicial_serie_cota(
+        self,
+        codigos: Sequence[int],
+        nivel_consistencia: NivelConsistencia = NivelConsistencia.CONSISTIDO,
+    ) -> dict[int, date]:
+        query = (
+            select(SerieCota.codigo_estacao, func.min(SerieCota.data))
+            .where(
+                SerieCota.codigo_estacao.in_(codigos),
+                SerieCota.nivel_consistencia == nivel_consistencia.value,
+            )
+            .group_by(SerieCota.codigo_estacao)
+        )
+        with Session(self.engine) as session:
+            return {codigo: data for codigo, data in session.execute(query)}
+
+    def retorna_dias_com_cota_por_ano(
+        self,
+        codigos: Sequence[int],
+        nivel_consistencia: NivelConsistencia = NivelConsistencia.CONSISTIDO,
+    ) -> dict[int, dict[int, int]]:
+        """
+        Mesmo resultado de HidroDWReader.retorna_dias_com_cota_por_ano, lido
+        da base local.
+        """
+        ano = extract("year", SerieCota.data)
+        query = (
+            select(
+                SerieCota.codigo_estacao,
+                ano,
+                func.count(
+                    distinct(case((SerieCota.cota.is_not(None), SerieCota.data)))
+                ),
+            )
+            .where(
+                SerieCota.codigo_estacao.in_(codigos),
+                SerieCota.nivel_consistencia == nivel_consistencia.value,
+            )
+            .group_by(SerieCota.codigo_estacao, ano)
+        )
+        resultado: dict[int, dict[int, int]] = {}
+        with Session(self.engine) as session:
+            for codigo, ano_serie, dias in session.execute(query):
+                resultado.setdefault(codigo, {})[int(ano_serie)] = dias
+        return resultado
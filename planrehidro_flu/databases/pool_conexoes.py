@@ -0,0 +1,159 @@
+import os
+from contextlib import contextmanager
+from dataclasses import dataclass
+from threading import Lock, local
+from typing import Any, Iterator, Self
+
+from sqlalchemy import Engine, create_engine, event
+from sqlalchemy.engine import URL
+from sqlalchemy.orm import Session
+
+
+@dataclass(frozen=True)
+class ConfiguracaoPool:
+    """
+    Parâmetros do pool de conexões de um banco.
+
+    O tamanho deve cobrir ConfiguracaoProcessamento.conexoes_por_banco: cada
+    tarefa do processamento paralelo usa uma conexão por banco.
+    """
+
+    tamanho: int = 5
+    excedente: int = 5
+    pre_ping: bool = True
+    reciclagem: int = 1800  # segundos
+    espera: int = 30  # segundos
+
+    @classmethod
+    def do_ambiente(cls, prefixo: str) -> Self:
+        """
+        Lê a configuração das variáveis {prefixo}_POOL_SIZE, _MAX_OVERFLOW,
+        _PRE_PING, _RECYCLE e _TIMEOUT, mantendo o padrão das ausentes.
+        """
+        padrao = cls()
+
+        def le_inteiro(nome: str, valor_padrao: int) -> int:
+            return int(os.getenv(f"{prefixo}_{nome}", valor_padrao))
+
+        return cls(
+            tamanho=le_inteiro("POOL_SIZE", padrao.tamanho),
+            excedente=le_inteiro("MAX_OVERFLOW", padrao.excedente),
+            pre_ping=os.getenv(f"{prefixo}_PRE_PING", str(padrao.pre_ping)).lower()
+            in ("1", "true", "sim"),
+            reciclagem=le_inteiro("RECYCLE", padrao.reciclagem),
+            espera=le_inteiro("TIMEOUT", padrao.espera),
+        )
+
+    def argumentos_engine(self) -> dict[str, Any]:
+        return {
+            "pool_size": self.tamanho,
+            "max_overflow": self.excedente,
+            "pool_pre_ping": self.pre_ping,
+            "pool_recycle": self.reciclagem,
+            "pool_timeout": self.espera,
+        }
+
+
+class MonitorPool:
+    """
+    Contadores de uso do pool, para dimensioná-lo em execuções concorrentes.
+    """
+
+    def __init__(self, engine: Engine) -> None:
+        self.engine = engine
+        self.conexoes_abertas = 0
+        self.retiradas = 0
+        self.em_uso = 0
+        self.pico_em_uso = 0
+        self._lock = Lock()
+        event.listen(engine, "connect", self._ao_conectar)
+        event.listen(engine, "checkout", self._ao_retirar)
+        event.listen(engine, "checkin", self._ao_devolver)
+
+    def _ao_conectar(self, *_) -> None:
+        with self._lock:
+            self.conexoes_abertas += 1
+
+    def _ao_retirar(self, *_) -> None:
+        with self._lock:
+            self.retiradas += 1
+            self.em_uso += 1
+            self.pico_em_uso = max(self.pico_em_uso, self.em_uso)
+
+    def _ao_devolver(self, *_) -> None:
+        with self._lock:
+            self.em_uso = max(self.em_uso - 1, 0)
+
+    def estatisticas(self) -> dict[str, int | str]:
+        pool = self.engine.pool
+        with self._lock:
+            return {
+                "tamanho": getattr(pool, "size", lambda: 0)(),
+                "disponiveis": getattr(pool, "checkedin", lambda: 0)(),
+                "em_uso": self.em_uso,
+                "excedente": getattr(pool, "overflow", lambda: 0)(),
+                "pico_em_uso": self.pico_em_uso,
+                "retiradas": self.retiradas,
+                "conexoes_abertas": self.conexoes_abertas,
+            }
+
+
+# Engines compartilhadas pelo processo, por nome do banco
+_monitores: dict[str, MonitorPool] = {}
+_lock_monitores = Lock()
+
+
+def cria_engine(
+    nome: str, url: str | URL, configuracao: ConfiguracaoPool, **argumentos: Any
+) -> Engine:
+    """
+    Cria a engine com o pool configurado e registra o monitor de uso. Deve ser
+    chamada por uma função com @cache, para haver uma engine por processo.
+    """
+    engine = create_engine(url, **configuracao.argumentos_engine(), **argumentos)
+    with _lock_monitores:
+        _monitores[nome] = MonitorPool(engine)
+    return engine
+
+
+def estatisticas_pools() -> dict[str, dict[str, int | str]]:
+    with _lock_monitores:
+        monitores = dict(_monitores)
+    return {nome: monitor.estatisticas() for nome, monitor in monitores.items()}
+
+
+def descarta_conexoes_herdadas() -> None:
+    # Em um processo filho (fork), as conexões do pool pertencem ao processo
+    # pai: descarta as referências sem fechá-las
+    with _lock_monitores:
+        monitores = list(_monitores.values())
+    for monitor in monitores:
+        monitor.engine.dispose(close=False)
+
+
+class SessoesPorThread:
+    """
+    Sessão compartilhada pelas consultas de uma mesma thread.
+
+    Fora de um bloco sessao(), cada consulta abre e fecha a sua sessão, como
+    antes. Dentro dele, as consultas da thread reutilizam a mesma sessão (e a
+    mesma conexão do pool) até o bloco mais externo terminar.
+    """
+
+    def __init__(self, engine: Engine) -> None:
+        self.engine = engine
+        self._local = local()
+
+    @contextmanager
+    def __call__(self) -> Iterator[Session]:
+        session = getattr(self._local, "session", None)
+        if session is not None:
+            yield session
+            return
+
+        with Session(self.engine) as session:
+            self._local.session = session
+            try:
+                yield session
+            finally:
+                self._local.session = None